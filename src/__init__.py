@@ -9,9 +9,21 @@ __version__ = "1.0.0"
 __author__ = "amiiiirsaman"
 __description__ = "Multi-agent system with researcher-reviewer workflow"
 
+import importlib
+
 from .config import validate_config
 from .logger import setup_logging, get_logger
-from .main import run, init_langfuse
+
+# Entry points are resolved on first access so importing the package does not
+# pull in crewai and langfuse
+_LAZY_ATTRS = {"run": ".main", "init_langfuse": ".main"}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        return getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "validate_config",
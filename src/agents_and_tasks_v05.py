@@ -1,78 +1,355 @@
 ﻿"""Agent and task definitions - CrewAI 1.8.0 compatible version"""
 from crewai import Agent, Task, Crew, Process, LLM
-from tools import search_tool, ask_user
-from config import LLM_MODEL, LLM_TEMPERATURE, LLM_MAX_TOKENS, AWS_REGION
+from answer_providers import AutoAnswerProvider, ConsoleAnswerProvider
+from tools import (
+    make_research_search_tools,
+    ask_user,
+    make_ask_user_tool,
+    cassette_tool,
+    LoopGuardTool,
+    TimedTool,
+)
+from config import (
+    LLM_MODEL,
+    LLM_TEMPERATURE,
+    LLM_MAX_TOKENS,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_BYPASS,
+    MULTI_SEARCH_ENABLED,
+    ASK_USER_TIMEOUT_SECONDS,
+    ASK_USER_DEFAULT_ANSWER,
+    BEDROCK_LOAD_CONTROL_ENABLED,
+    BEDROCK_HEDGE_ENABLED,
+    RUN_TIMING_ENABLED,
+)
+from llm_layers import (
+    CachedLLM,
+    ResilientLLM,
+    RoutedLLM,
+    budgeted_llm,
+    cassette_llm,
+    get_llm_cache,
+    timed_llm,
+)
+from llm_profiles import AGENT_ROLES, resolve_profile
+from prefetch import make_search_prefetcher
+from structured_output import RepairingConverter, ResearchOutput, ReviewOutput
+from rate_control import get_bedrock_controller
+from region_router import get_endpoint_router, parse_endpoints
+from run_budget import agent_scope
 from logger import get_logger
 import os
+import threading
 
 logger = get_logger(__name__)
 
+
+def _replace_bedrock_client(llm, endpoint):
+    """Give the Bedrock LLM a boto3 client without botocore's own retries.
+
+    CrewAI's native Bedrock provider retries each request inside botocore and
+    has no endpoint option. Its runtime client is replaced by one that makes
+    a single attempt (``total_max_attempts`` counts the first request, unlike
+    ``max_attempts``), so throttling and errors reach the load controller and
+    the router, and that uses ``endpoint_url`` when the endpoint has one. Only
+    the synchronous client is replaced; agents call the LLM synchronously.
+    """
+    import boto3
+    from botocore.config import Config
+
+    if endpoint.url:
+        # Local stand-ins accept any credentials
+        access_key = os.getenv("AWS_ACCESS_KEY_ID") or "local"
+        secret_key = os.getenv("AWS_SECRET_ACCESS_KEY") or "local"
+    else:
+        access_key = os.getenv("AWS_ACCESS_KEY_ID")
+        secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+    session = boto3.Session(
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        region_name=endpoint.region,
+    )
+    llm._client = session.client(
+        "bedrock-runtime",
+        endpoint_url=endpoint.url,
+        config=Config(read_timeout=300, retries={"total_max_attempts": 1}, tcp_keepalive=True),
+    )
+
+
+def _endpoint_llm(endpoint, settings, stream=False):
+    """Create the Bedrock LLM for one region or endpoint, under its load controller."""
+    llm = LLM(
+        model=settings["model"],
+        temperature=settings["temperature"],
+        max_tokens=settings["max_tokens"],
+        aws_region_name=endpoint.region,
+        region_name=endpoint.region,
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        stream=stream,
+    )
+    if endpoint.url or BEDROCK_LOAD_CONTROL_ENABLED:
+        _replace_bedrock_client(llm, endpoint)
+    if BEDROCK_LOAD_CONTROL_ENABLED:
+        llm = ResilientLLM(llm, get_bedrock_controller(endpoint.name))
+    return llm
+
+
 # LLM Configuration for CrewAI 1.8.0 (uses CrewAI's LLM wrapper with Bedrock)
-def get_llm_config():
+def get_llm_config(stream=False, profile=None):
+    """Configure the Bedrock LLM used by the agents.
+
+    With several BEDROCK_ENDPOINTS, one LLM is created per endpoint and
+    calls are routed between them by observed latency and error rate.
+
+    Args:
+        stream: Generate responses incrementally and emit each chunk on the
+            CrewAI event bus (see streaming.py)
+        profile: Model, temperature and max_tokens to use (see
+            llm_profiles.resolve_profile); defaults to LLM_MODEL,
+            LLM_TEMPERATURE and LLM_MAX_TOKENS
+
+    Returns:
+        LLM: Configured LLM, wrapped in the shared load controller and the
+        response cache when enabled (cache hits skip the load controller),
+        and in the active cassette's record/replay layer (see cassette.py)
+    """
     try:
         # CrewAI 1.8.0 expects LLM configuration with provider details
-        llm = LLM(
-            model=LLM_MODEL,
-            temperature=LLM_TEMPERATURE,
-            max_tokens=LLM_MAX_TOKENS,
-            aws_region_name=AWS_REGION,
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+        settings = profile or {
+            "model": LLM_MODEL, "temperature": LLM_TEMPERATURE, "max_tokens": LLM_MAX_TOKENS,
+        }
+        endpoints = parse_endpoints()
+        if len(endpoints) == 1:
+            llm = _endpoint_llm(endpoints[0], settings, stream=stream)
+        else:
+            llm = RoutedLLM(
+                {
+                    endpoint.name: _endpoint_llm(endpoint, settings, stream=stream)
+                    for endpoint in endpoints
+                },
+                get_endpoint_router(),
+                hedge=BEDROCK_HEDGE_ENABLED,
+            )
+        logger.info(
+            f"LLM configured: {settings['model']} (max_tokens={settings['max_tokens']}, "
+            f"endpoints: {', '.join(e.name for e in endpoints)})"
         )
-        logger.info(f"LLM configured: {LLM_MODEL}")
-        return llm
+        if LLM_CACHE_ENABLED:
+            llm = CachedLLM(llm, get_llm_cache(), bypass=LLM_CACHE_BYPASS)
+            logger.info(f"LLM response cache enabled (bypass={LLM_CACHE_BYPASS})")
+        return cassette_llm(llm)
     except Exception as e:
         logger.error(f"Failed to configure LLM: {e}")
         raise
 
-nova_pro_llm = get_llm_config()
+
+def get_agent_llms(stream=False, overrides=None):
+    """Configure one LLM per agent role from its profile.
+
+    Roles whose resolved profiles are identical share a single LLM.
+
+    Args:
+        stream: Generate responses incrementally (see get_llm_config)
+        overrides: Per-request settings, flat or keyed by role (see llm_profiles)
+
+    Returns:
+        dict: LLM for each role in AGENT_ROLES
+
+    Raises:
+        ValueError: If the overrides are invalid
+    """
+    llms, by_profile = {}, {}
+    for role in AGENT_ROLES:
+        profile = resolve_profile(role, overrides)
+        key = tuple(sorted(profile.items()))
+        if key not in by_profile:
+            by_profile[key] = get_llm_config(stream=stream, profile=profile)
+        llms[role] = by_profile[key]
+    return llms
+
+
+def resolve_llms(llm=None, overrides=None, stream=False):
+    """Return the LLM for each agent role of a run.
+
+    Args:
+        llm: Already configured LLM shared by all roles, or a mapping of
+            role to LLM (e.g. a service worker's warm clients); it is used
+            as-is, so any overrides must already be applied to it
+        overrides: Per-request settings applied when new LLMs are configured
+        stream: Generate responses incrementally when new LLMs are configured
+
+    Returns:
+        dict: LLM for each role in AGENT_ROLES
+    """
+    if llm is None:
+        return get_agent_llms(stream=stream, overrides=overrides)
+    if isinstance(llm, dict):
+        return llm
+    return {role: llm for role in AGENT_ROLES}
+
 
 # Agent Definitions
-researcher = Agent(
-    role="Researcher",
-    goal="Gather evidence from the web and the user, then summarize it.",
-    backstory=(
-        "You are a meticulous researcher who excels at understanding user needs "
-        "and finding relevant information. You use the Serper search tool to find "
-        "web-based evidence and the ask_user tool to clarify requirements. "
-        "You always cite your sources and organize information clearly."
-    ),
-    tools=[ask_user, search_tool],
-    llm=nova_pro_llm,
-    verbose=True,
-    allow_delegation=False
-)
+def _timed(llm, tools=(), role=None):
+    """Wrap an agent's LLM and tools so their calls are recorded in run timelines.
 
-reviewer = Agent(
-    role="Reviewer",
-    goal="Synthesize the researcher's findings into a final answer with proper source attribution.",
-    backstory=(
-        "You are an expert reviewer who evaluates research and produces well-structured answers. "
-        "You ensure all claims are properly sourced and create a clear list of references. "
-        "You organize information logically and highlight the most important findings."
-    ),
-    llm=nova_pro_llm,
-    verbose=True,
-    allow_delegation=False
-)
+    Calls are also counted against the run's loop budget and a budget of the
+    agent's own (see run_budget.py), and tools are recorded to or replayed
+    from the active cassette, if any.
+    """
+    scope = agent_scope(role) if role else None
+    llm = budgeted_llm(llm, scope)
+    tools = [LoopGuardTool.wrap(cassette_tool(tool), scope) for tool in tools]
+    if not RUN_TIMING_ENABLED:
+        return llm, tools
+    return timed_llm(llm), [TimedTool.wrap(tool) for tool in tools]
+
+
+def create_researcher(llm, tools=None):
+    """Create the researcher agent.
+
+    Args:
+        llm: LLM instance the agent runs on
+        tools: Tools available to the agent (defaults to ask_user and the
+            configured search backends)
+
+    Returns:
+        Agent: Researcher agent
+    """
+    llm, tools = _timed(
+        llm, tools if tools is not None else [ask_user, *make_research_search_tools()], "researcher"
+    )
+    return Agent(
+        role="Researcher",
+        goal="Gather evidence from the web and the user, then summarize it.",
+        backstory=(
+            "You are a meticulous researcher who excels at understanding user needs "
+            "and finding relevant information. You use the Serper search tool to find "
+            "web-based evidence and the ask_user tool to clarify requirements. "
+            "You always cite your sources and organize information clearly."
+        ),
+        tools=tools,
+        llm=llm,
+        verbose=True,
+        allow_delegation=False
+    )
+
+
+def create_reviewer(llm):
+    """Create the reviewer agent.
+
+    Args:
+        llm: LLM instance the agent runs on
+
+    Returns:
+        Agent: Reviewer agent
+    """
+    llm, _ = _timed(llm, role="reviewer")
+    return Agent(
+        role="Reviewer",
+        goal="Synthesize the researcher's findings into a final answer with proper source attribution.",
+        backstory=(
+            "You are an expert reviewer who evaluates research and produces well-structured answers. "
+            "You ensure all claims are properly sourced and create a clear list of references. "
+            "You organize information logically and highlight the most important findings."
+        ),
+        llm=llm,
+        verbose=True,
+        allow_delegation=False
+    )
 
-# Task Definitions  
-research_task = Task(
-    description=(
-        "1. Use the ask_user tool to ask: 'What would you like to know?'\n"
-        "2. Based on the user's answer, search the web using search_tool\n"
-        "3. Return JSON with:\n"
-        "   - user_question: the question from step 1\n"
-        "   - search_query: your search query\n"
-        "   - search_results: results from Serper\n"
-        "   - provisional_answer: your draft answer"
-    ),
-    agent=researcher,
-    expected_output="JSON with user_question, search_query, search_results, and provisional_answer"
-)
 
-review_task = Task(
-    description=(
+# Task Definitions
+def _first_step(question=None):
+    """Return the task step that establishes the user's question."""
+    if question is None:
+        return "1. Use the ask_user tool to ask: 'What would you like to know?'\n"
+    return (
+        f"1. The user has already asked: '{question}'. Use it as the user's answer; "
+        "only use the ask_user tool if you need a clarification.\n"
+    )
+
+
+def _search_step(number):
+    """Return the task step that tells the agent how to search."""
+    step = f"{number}. Based on the user's answer, search the web using search_tool\n"
+    if MULTI_SEARCH_ENABLED:
+        step += (
+            "   (to try several queries, pass them together to the multi-query search "
+            "tool in a single call)\n"
+        )
+    return step
+
+
+def create_research_task(agent, question=None):
+    """Create the research task.
+
+    Args:
+        agent: Researcher agent that executes the task
+        question: Pre-supplied user question; when None the agent asks the user
+
+    Returns:
+        Task: Research task whose output is validated as a ResearchOutput
+            (see structured_output.py)
+    """
+    return Task(
+        description=(
+            _first_step(question) +
+            _search_step(2) +
+            "3. Return JSON with:\n"
+            "   - user_question: the question from step 1\n"
+            "   - search_query: your search query\n"
+            "   - search_results: results from Serper\n"
+            "   - provisional_answer: your draft answer"
+        ),
+        agent=agent,
+        expected_output="JSON with user_question, search_query, search_results, and provisional_answer",
+        output_pydantic=ResearchOutput,
+        converter_cls=RepairingConverter,
+    )
+
+
+def create_fast_task(agent, question=None):
+    """Create a single-pass task that researches and writes the final answer.
+
+    Args:
+        agent: Researcher agent that executes the task
+        question: Pre-supplied user question; when None the agent asks the user
+
+    Returns:
+        Task: Task producing the reviewer's final_answer/sources schema directly
+    """
+    return Task(
+        description=(
+            _first_step(question) +
+            _search_step(2) +
+            "3. Synthesize a final answer that addresses the user's question\n"
+            "4. Create a 'sources' list with entries like:\n"
+            "   {\"type\": \"serper\", \"detail\": \"<domain or snippet>\", \"role\": \"<how it contributed>\"}\n"
+            "   {\"type\": \"user\", \"detail\": \"User query\", \"role\": \"Question definition\"}\n"
+            "5. Return JSON with:\n"
+            "   - final_answer: comprehensive answer\n"
+            "   - sources: list of source objects"
+        ),
+        agent=agent,
+        expected_output="JSON with final_answer and sources list",
+        output_pydantic=ReviewOutput,
+        converter_cls=RepairingConverter,
+    )
+
+
+def create_review_task(agent, research_output=None):
+    """Create the review task.
+
+    Args:
+        agent: Reviewer agent that executes the task
+        research_output: Research JSON to review when it does not come from a
+            preceding research task in the same crew
+
+    Returns:
+        Task: Review task whose output is validated as a ReviewOutput
+    """
+    description = (
         "Using the researcher's output:\n"
         "1. Synthesize a final answer that addresses the user's question\n"
         "2. Create a 'sources' list with entries like:\n"
@@ -81,15 +358,135 @@ review_task = Task(
         "3. Return JSON with:\n"
         "   - final_answer: comprehensive answer\n"
         "   - sources: list of source objects"
-    ),
-    agent=reviewer,
-    expected_output="JSON with final_answer and sources list"
-)
+    )
+    if research_output is not None:
+        description += f"\n\nResearcher's output:\n{research_output}"
+    return Task(
+        description=description,
+        agent=agent,
+        expected_output="JSON with final_answer and sources list",
+        output_pydantic=ReviewOutput,
+        converter_cls=RepairingConverter,
+    )
+
 
 # Crew Configuration
-crew = Crew(
-    agents=[researcher, reviewer],
-    tasks=[research_task, review_task],
-    process=Process.sequential,
-    verbose=True
+def resolve_ask_user_tool(question=None, answer_provider=None, prefetcher=None):
+    """Pick the ask_user tool for a run.
+
+    Args:
+        question: Pre-supplied user question, if any
+        answer_provider: Explicit source of answers, if any
+        prefetcher: The run's prefetch.SearchPrefetcher, if any
+
+    Returns:
+        BaseTool: Tool bound to ``answer_provider``; auto-answering with
+        ``question`` when only a question is given; otherwise the console tool
+    """
+    if answer_provider is None and question is not None:
+        answer_provider = AutoAnswerProvider(question)
+    if answer_provider is None and prefetcher is not None:
+        answer_provider = ConsoleAnswerProvider(
+            timeout=ASK_USER_TIMEOUT_SECONDS, default=ASK_USER_DEFAULT_ANSWER
+        )
+    return make_ask_user_tool(answer_provider, prefetcher) if answer_provider else ask_user
+
+
+def make_research_tools(question=None, answer_provider=None):
+    """Create a researcher's ask_user and search tools for one run.
+
+    With SPECULATIVE_SEARCH_ENABLED they share a SearchPrefetcher (see
+    prefetch.py): searches for the question start while ask_user waits.
+
+    Args:
+        question: Pre-supplied user question, if any
+        answer_provider: Explicit source of answers, if any
+
+    Returns:
+        list: ask_user tool followed by the search tools
+    """
+    prefetcher = make_search_prefetcher(question)
+    return [
+        resolve_ask_user_tool(question, answer_provider, prefetcher),
+        *make_research_search_tools(question, prefetcher),
+    ]
+
+
+def build_crew(question=None, answer_provider=None, llm=None, llm_overrides=None):
+    """Build an independent researcher -> reviewer crew.
+
+    Every call creates its own agents and tasks (and, unless one is passed
+    in, its own LLMs), so crews built here can be kicked off concurrently
+    without sharing state.
+
+    Args:
+        question: Pre-supplied user question for headless runs; when None the
+            researcher asks the user interactively
+        answer_provider: Source of ask_user answers; defaults to the console,
+            or to auto-answering with ``question`` when one is supplied
+        llm: Already configured LLM, or mapping of role to LLM, to reuse,
+            e.g. a service worker's warm clients
+        llm_overrides: Per-request model settings, used when ``llm`` is None
+
+    Returns:
+        Crew: Sequential crew ready for kickoff
+    """
+    llms = resolve_llms(llm, llm_overrides)
+    researcher = create_researcher(
+        llms["researcher"],
+        tools=make_research_tools(question, answer_provider),
+    )
+    reviewer = create_reviewer(llms["reviewer"])
+    return Crew(
+        agents=[researcher, reviewer],
+        tasks=[create_research_task(researcher, question), create_review_task(reviewer)],
+        process=Process.sequential,
+        verbose=True
+    )
+
+
+# Default interactive crew, built on first access instead of at import so that
+# importing this module does not configure the LLM or require API keys
+_DEFAULT_CREW_ATTRS = (
+    "nova_pro_llm", "llms", "researcher", "reviewer", "research_task", "review_task", "crew",
 )
+_default_crew = {}
+_default_crew_lock = threading.Lock()
+
+
+def get_default_crew():
+    """Return the module's shared interactive crew, building it on first use.
+
+    Returns:
+        Crew: Sequential researcher -> reviewer crew using the console ask_user tool
+    """
+    with _default_crew_lock:
+        if not _default_crew:
+            llms = get_agent_llms()
+            researcher = create_researcher(llms["researcher"])
+            reviewer = create_reviewer(llms["reviewer"])
+            research_task = create_research_task(researcher)
+            review_task = create_review_task(reviewer)
+            _default_crew.update(
+                nova_pro_llm=llms["reviewer"],
+                llms=llms,
+                researcher=researcher,
+                reviewer=reviewer,
+                research_task=research_task,
+                review_task=review_task,
+                crew=Crew(
+                    agents=[researcher, reviewer],
+                    tasks=[research_task, review_task],
+                    process=Process.sequential,
+                    verbose=True
+                ),
+            )
+        return _default_crew["crew"]
+
+
+def __getattr__(name):
+    """Build the default crew objects (``crew``, ``researcher``, ...) on first access."""
+    if name in _DEFAULT_CREW_ATTRS:
+        get_default_crew()
+        return _default_crew[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
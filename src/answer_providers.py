@@ -0,0 +1,324 @@
+"""Answer providers for the ask_user tool.
+
+An answer provider decides where the reply to an agent's clarifying question
+comes from: the console, a script of pre-supplied answers, a caller that
+fulfils the request later, or the original question itself. Every provider
+accepts a timeout and a default answer so headless runs never block forever.
+"""
+import asyncio
+import itertools
+import os
+import queue
+import select
+import sys
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_ANSWER = "No answer provided"
+
+
+class AnswerProvider(ABC):
+    """Base class for ask_user answer sources.
+
+    Args:
+        timeout: Seconds to wait for an answer; None waits indefinitely
+        default: Answer returned on timeout or when no answer is available
+    """
+
+    def __init__(self, timeout: Optional[float] = None, default: str = DEFAULT_ANSWER):
+        self.timeout = timeout
+        self.default = default
+
+    def ask(self, question: str) -> str:
+        """Return the answer to a question, falling back to the default.
+
+        Args:
+            question: The question asked by the agent
+
+        Returns:
+            str: The answer, or the default if none arrived in time
+        """
+        answer = self._answer(question)
+        if answer is None or not answer.strip():
+            logger.warning(f"No answer received, using default: {self.default}")
+            return self.default
+        return answer
+
+    @abstractmethod
+    def _answer(self, question: str) -> Optional[str]:
+        """Produce an answer, or None if none is available within the timeout."""
+
+
+class ConsoleAnswerProvider(AnswerProvider):
+    """Ask the human user in the console (the original ask_user behavior).
+
+    With a timeout, stdin is polled with ``select`` where the platform allows
+    it, so nothing is left reading the console once the timeout expires. Other
+    platforms, and a stdin without a file descriptor (captured by pytest or
+    an IDE), fall back to reading on a daemon thread.
+    """
+
+    def _answer(self, question: str) -> Optional[str]:
+        print("\n[ENGINE QUESTION]", question)
+        if self.timeout is None:
+            return self._read()
+        if os.name == "posix" and self._stdin_selectable():
+            return self._read_with_select()
+        return self._read_with_thread()
+
+    @staticmethod
+    def _stdin_selectable() -> bool:
+        try:
+            sys.stdin.fileno()
+        except (AttributeError, OSError, ValueError):
+            return False
+        return True
+
+    def _read_with_select(self) -> Optional[str]:
+        print("[YOUR ANSWER] ", end="", flush=True)
+        ready, _, _ = select.select([sys.stdin], [], [], self.timeout)
+        if not ready:
+            print()
+            logger.warning(f"Console answer timed out after {self.timeout}s")
+            return None
+        line = sys.stdin.readline()
+        if not line:
+            logger.error("Input stream closed while waiting for user input")
+            raise EOFError("Cannot read user input: input stream closed")
+        return line.rstrip("\n")
+
+    def _read_with_thread(self) -> Optional[str]:
+        box: Dict[str, Union[str, BaseException]] = {}
+
+        def reader():
+            try:
+                box["answer"] = self._read()
+            except BaseException as e:
+                box["error"] = e
+
+        thread = threading.Thread(target=reader, name="ask-user-console", daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            logger.warning(f"Console answer timed out after {self.timeout}s")
+            return None
+        if "error" in box:
+            raise box["error"]
+        return box.get("answer")
+
+    @staticmethod
+    def _read() -> str:
+        try:
+            return input("[YOUR ANSWER] ")
+        except EOFError as e:
+            logger.error("Input stream closed while waiting for user input")
+            raise EOFError("Cannot read user input: input stream closed") from e
+
+
+class ScriptedAnswerProvider(AnswerProvider):
+    """Serve pre-supplied answers.
+
+    Args:
+        answers: Either a sequence of answers consumed in order, or a mapping
+            from question substrings (case-insensitive) to answers
+        timeout: Accepted for interface symmetry; scripted answers never wait
+        default: Answer used once the script is exhausted or nothing matches
+    """
+
+    def __init__(
+        self,
+        answers: Union[Iterable[str], Dict[str, str]],
+        timeout: Optional[float] = None,
+        default: str = DEFAULT_ANSWER,
+    ):
+        super().__init__(timeout=timeout, default=default)
+        self._lock = threading.Lock()
+        if isinstance(answers, dict):
+            self._mapping = {key.lower(): value for key, value in answers.items()}
+            self._sequence: List[str] = []
+        else:
+            self._mapping = {}
+            self._sequence = list(answers)
+
+    def _answer(self, question: str) -> Optional[str]:
+        if self._mapping:
+            lowered = question.lower()
+            for key, value in self._mapping.items():
+                if key in lowered:
+                    return value
+            return None
+        with self._lock:
+            return self._sequence.pop(0) if self._sequence else None
+
+
+class AnswerRequest:
+    """A pending question waiting to be fulfilled by a DeferredAnswerProvider."""
+
+    def __init__(self, request_id: int, question: str):
+        self.request_id = request_id
+        self.question = question
+        self.answer: Optional[str] = None
+        self._event = threading.Event()
+
+    def fulfil(self, answer: str) -> None:
+        """Record the answer and release the waiting agent."""
+        self.answer = answer
+        self._event.set()
+
+    def wait(self, timeout: Optional[float]) -> Optional[str]:
+        """Block until fulfilled or the timeout expires."""
+        self._event.wait(timeout)
+        return self.answer
+
+
+class DeferredAnswerProvider(AnswerProvider):
+    """Hand questions to a caller and wait for it to supply the answer later.
+
+    Each question becomes an AnswerRequest that is put on ``requests``,
+    passed to ``on_question`` if given, and put on every asyncio queue
+    returned by ``subscribe``. The caller answers it from any thread or
+    coroutine with ``provider.answer(request_id, text)`` or
+    ``request.fulfil(text)``; neither blocks.
+
+    Args:
+        on_question: Optional callback invoked with each new AnswerRequest
+        timeout: Seconds to wait for the caller; None waits indefinitely
+        default: Answer used if the caller does not respond in time
+    """
+
+    def __init__(
+        self,
+        on_question: Optional[Callable[[AnswerRequest], None]] = None,
+        timeout: Optional[float] = None,
+        default: str = DEFAULT_ANSWER,
+    ):
+        super().__init__(timeout=timeout, default=default)
+        self.on_question = on_question
+        self.requests: "queue.Queue[AnswerRequest]" = queue.Queue()
+        self._pending: Dict[int, AnswerRequest] = {}
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> "asyncio.Queue[AnswerRequest]":
+        """Return an asyncio queue that receives every new question.
+
+        Must be called from a coroutine; the queue belongs to the running
+        event loop. Requests already pending are put on it first.
+        """
+        loop = asyncio.get_running_loop()
+        requests: "asyncio.Queue[AnswerRequest]" = asyncio.Queue()
+        with self._lock:
+            for request in self._pending.values():
+                requests.put_nowait(request)
+            self._subscribers.append((loop, requests))
+        return requests
+
+    def _answer(self, question: str) -> Optional[str]:
+        request = AnswerRequest(next(self._ids), question)
+        with self._lock:
+            self._pending[request.request_id] = request
+            subscribers = list(self._subscribers)
+        self.requests.put(request)
+        for loop, requests in subscribers:
+            try:
+                loop.call_soon_threadsafe(requests.put_nowait, request)
+            except RuntimeError:
+                # The subscriber's event loop is closed
+                with self._lock:
+                    if (loop, requests) in self._subscribers:
+                        self._subscribers.remove((loop, requests))
+        if self.on_question is not None:
+            self.on_question(request)
+
+        try:
+            answer = request.wait(self.timeout)
+            if answer is None:
+                logger.warning(
+                    f"Deferred answer {request.request_id} timed out after {self.timeout}s"
+                )
+            return answer
+        finally:
+            with self._lock:
+                self._pending.pop(request.request_id, None)
+
+    def answer(self, request_id: int, answer: str) -> bool:
+        """Fulfil a pending request.
+
+        Args:
+            request_id: ID of the AnswerRequest
+            answer: The answer text
+
+        Returns:
+            bool: True if the request was still pending
+        """
+        with self._lock:
+            request = self._pending.get(request_id)
+        if request is None:
+            return False
+        request.fulfil(answer)
+        return True
+
+    def pending(self) -> List[AnswerRequest]:
+        """Return the requests still waiting for an answer."""
+        with self._lock:
+            return list(self._pending.values())
+
+
+class AutoAnswerProvider(AnswerProvider):
+    """Answer every question with the original user question.
+
+    Fast path for headless runs where the question is known up front and any
+    clarification request should simply restate it.
+
+    Args:
+        original_question: The question the run was started with
+    """
+
+    def __init__(
+        self,
+        original_question: str,
+        timeout: Optional[float] = None,
+        default: str = DEFAULT_ANSWER,
+    ):
+        super().__init__(timeout=timeout, default=default)
+        self.original_question = original_question
+
+    def _answer(self, question: str) -> Optional[str]:
+        return self.original_question
+
+
+class CachedAnswerProvider(AnswerProvider):
+    """Replay answers to questions that were already answered.
+
+    Answers from the wrapped provider are stored in a cache keyed on the
+    whitespace- and case-normalized question, so a resumed run does not ask
+    the user the same question twice.
+
+    Args:
+        inner: Provider asked when no stored answer exists
+        cache: Store for answers (a cache_store.DiskCache)
+    """
+
+    def __init__(self, inner: AnswerProvider, cache):
+        super().__init__(timeout=inner.timeout, default=inner.default)
+        self.inner = inner
+        self.cache = cache
+
+    @staticmethod
+    def cache_key(question: str) -> str:
+        return "ask_user:" + " ".join(question.lower().split())
+
+    def _answer(self, question: str) -> Optional[str]:
+        key = self.cache_key(question)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"Reusing stored answer for: {question}")
+            return cached
+        answer = self.inner.ask(question)
+        self.cache.set(key, answer)
+        return answer
@@ -0,0 +1,154 @@
+"""Concurrent batch execution for the multi-agent system.
+
+Runs many questions at once on a bounded worker pool. Every question gets its
+own crew instance and its own Langfuse trace, and a failing question is
+reported in its result instead of stopping the batch.
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from config import (
+    BATCH_MAX_CONCURRENCY,
+    BEDROCK_ENDPOINTS,
+    BEDROCK_LOAD_CONTROL_ENABLED,
+    RESEARCH_MODE,
+)
+from logger import get_logger
+from main import _log_run_metrics, init_langfuse, run_traced
+from research_modes import build_runner
+
+logger = get_logger(__name__)
+
+
+def read_questions(path: str) -> List[str]:
+    """Read one question per non-empty line from a file or stdin.
+
+    Args:
+        path: File path, or '-' to read from stdin
+
+    Returns:
+        list: Questions in file order
+
+    Raises:
+        ValueError: If the input contains no questions
+    """
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+    questions = [line.strip() for line in lines if line.strip()]
+    if not questions:
+        raise ValueError(f"No questions found in {path}")
+    return questions
+
+
+def run_question(
+    index: int,
+    question: str,
+    langfuse,
+    mode: str = RESEARCH_MODE,
+    llm_overrides: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Run a single question on a fresh crew and capture the outcome.
+
+    Args:
+        index: Position of the question in the batch
+        question: The user question
+        langfuse: Initialized Langfuse client
+        mode: Research mode used to build the crew
+        llm_overrides: Per-request model settings (see llm_profiles)
+
+    Returns:
+        dict: Result record with status, result or error, trace ID and duration
+    """
+    started = time.perf_counter()
+    record = {
+        "index": index,
+        "question": question,
+        "status": "success",
+        "result": None,
+        "error": None,
+        "trace_id": None,
+        "duration_seconds": None,
+    }
+    try:
+        logger.info(f"[batch {index}] Starting question: {question[:100]}")
+        crew = build_runner(mode, question=question, llm_overrides=llm_overrides)
+        result, trace_id = run_traced(crew, langfuse, question=question)
+        record["result"] = str(result)
+        record["trace_id"] = trace_id
+        logger.info(f"[batch {index}] Completed")
+    except Exception as e:
+        logger.error(f"[batch {index}] Failed: {e}", exc_info=True)
+        record["status"] = "error"
+        record["error"] = str(e)
+    finally:
+        record["duration_seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(
+    questions: List[str],
+    max_concurrency: Optional[int] = None,
+    mode: str = RESEARCH_MODE,
+    llm_overrides: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Run many questions concurrently and return their results in order.
+
+    Args:
+        questions: User questions to answer
+        max_concurrency: Maximum questions in flight at once
+            (defaults to BATCH_MAX_CONCURRENCY)
+        mode: Research mode used for every question
+        llm_overrides: Model settings used for every question (see llm_profiles)
+
+    Returns:
+        list: One result record per question, in input order
+
+    Raises:
+        ValueError: If max_concurrency is not positive
+    """
+    max_concurrency = max_concurrency or BATCH_MAX_CONCURRENCY
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    langfuse = init_langfuse()
+    logger.info(
+        f"Starting batch of {len(questions)} questions "
+        f"(concurrency={max_concurrency})"
+    )
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_concurrency, len(questions)) or 1,
+        thread_name_prefix="batch",
+    ) as pool:
+        futures = [
+            pool.submit(run_question, index, question, langfuse, mode, llm_overrides)
+            for index, question in enumerate(questions)
+        ]
+        results = [future.result() for future in futures]
+
+    langfuse.flush()
+    failed = sum(1 for item in results if item["status"] != "success")
+    logger.info(f"Batch finished: {len(results) - failed} succeeded, {failed} failed")
+    if BEDROCK_LOAD_CONTROL_ENABLED:
+        from rate_control import bedrock_metrics
+
+        logger.info(f"Bedrock load control: {bedrock_metrics()}")
+    if len(BEDROCK_ENDPOINTS) > 1:
+        from region_router import get_endpoint_router
+
+        logger.info(f"Bedrock routing: {get_endpoint_router().metrics()}")
+    from trace_spool import trace_spool_metrics
+
+    spool = trace_spool_metrics()
+    if spool is not None:
+        logger.info(f"Trace spool: {spool}")
+    _log_run_metrics()
+    from usage_ledger import usage_totals
+
+    logger.info(f"LLM usage: {usage_totals()}")
+    return results
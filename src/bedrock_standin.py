@@ -0,0 +1,190 @@
+"""Local stand-in for the Bedrock runtime Converse API.
+
+Serves ``POST /model/{model_id}/converse`` with a fixed (or scripted) reply
+after a configurable delay, and fails a configurable share of requests with
+throttling or service-unavailable errors. Listing it in
+``BEDROCK_ENDPOINTS`` (``local=http://127.0.0.1:9100``) exercises routing,
+failover, hedging and load control without AWS access. Streaming
+(``converse-stream``) is not emulated.
+
+Usage:
+    python bedrock_standin.py --port 9100 --latency 0.5 --error-rate 0.1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# Default reply: a final answer the reviewer's task accepts as-is
+DEFAULT_REPLY = (
+    "Thought: I now know the final answer\n"
+    'Final Answer: {"final_answer": "Stand-in answer", "sources": []}'
+)
+
+# A reply is text or a list of Converse content blocks (e.g. a toolUse block)
+Reply = Union[str, List[Dict[str, Any]]]
+
+
+def _content_blocks(reply: Reply) -> List[Dict[str, Any]]:
+    return [{"text": reply}] if isinstance(reply, str) else reply
+
+
+def _estimate_tokens(value: Any) -> int:
+    text = value if isinstance(value, str) else json.dumps(value)
+    return max(1, len(text) // 4)
+
+
+class BedrockStandIn:
+    """Converse API stand-in running on a background thread.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        latency: Seconds to wait before answering
+        jitter: Extra random delay of up to this many seconds
+        error_rate: Share of requests failing with 503 ServiceUnavailableException
+        throttle_rate: Share of requests failing with 429 ThrottlingException
+        reply: Reply to every successful request, or a function of the
+            request body returning the reply (see ``Reply``)
+        seconds_per_token: Extra delay per output token, modelling generation time
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        reply: Union[Reply, Callable[[Dict[str, Any]], Reply]] = DEFAULT_REPLY,
+        seconds_per_token: float = 0.0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.reply = reply
+        self.seconds_per_token = seconds_per_token
+        self.requests = 0
+        # Time spent answering successful requests, i.e. the emulated model latency
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with standin._lock:
+                    standin.requests += 1
+                if not self.path.rstrip("/").endswith("/converse"):
+                    self._send(404, {"message": f"Unsupported path {self.path}"},
+                               "ResourceNotFoundException")
+                    return
+
+                started = time.perf_counter()
+                request = json.loads(body or b"{}")
+                reply = standin.reply(request) if callable(standin.reply) else standin.reply
+                content = _content_blocks(reply)
+                input_tokens = _estimate_tokens(request.get("messages", []))
+                output_tokens = _estimate_tokens(reply)
+                time.sleep(
+                    standin.latency + random.uniform(0, standin.jitter)
+                    + standin.seconds_per_token * output_tokens
+                )
+                draw = random.random()
+                if draw < standin.throttle_rate:
+                    self._send(429, {"message": "Too many requests, please wait."},
+                               "ThrottlingException")
+                    return
+                if draw < standin.throttle_rate + standin.error_rate:
+                    self._send(503, {"message": "Service unavailable"},
+                               "ServiceUnavailableException")
+                    return
+
+                elapsed = time.perf_counter() - started
+                with standin._lock:
+                    standin.busy_seconds += elapsed
+                uses_tool = any("toolUse" in block for block in content)
+                self._send(200, {
+                    "output": {"message": {"role": "assistant", "content": content}},
+                    "stopReason": "tool_use" if uses_tool else "end_turn",
+                    "usage": {
+                        "inputTokens": input_tokens,
+                        "outputTokens": output_tokens,
+                        "totalTokens": input_tokens + output_tokens,
+                    },
+                    "metrics": {"latencyMs": int(elapsed * 1000)},
+                })
+
+            def _send(self, status, payload, error_type=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if error_type:
+                    self.send_header("x-amzn-ErrorType", error_type)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "BedrockStandIn":
+        """Start serving on a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="bedrock-standin", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local Bedrock Converse stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 503 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of 429 responses")
+    parser.add_argument("--reply", default=DEFAULT_REPLY, help="Text of every response")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0,
+                        help="Extra delay per output token")
+    args = parser.parse_args(argv)
+
+    standin = BedrockStandIn(
+        host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, reply=args.reply,
+        seconds_per_token=args.seconds_per_token,
+    ).start()
+    print(f"Bedrock stand-in listening on {standin.url}")
+    try:
+        standin._thread.join()
+    except KeyboardInterrupt:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+"""End-to-end benchmark of the research crew on local stand-ins.
+
+Runs the real researcher -> reviewer crew from ``agents_and_tasks_v05``
+against ``bedrock_standin`` (playing a scripted model with configurable
+latency and output length distribution), ``serper_standin`` and, for traced
+runs, ``langfuse_standin``. Nothing leaves the machine, so the numbers
+reflect our code rather than AWS, Serper or the network. The report covers:
+
+- end-to-end latency percentiles and throughput at each concurrency level
+- framework overhead per LLM call: run time spent outside the model and
+  search stand-ins, divided by the LLM calls made, split into the LLM
+  client stack (layers, boto3, HTTP) and orchestration (CrewAI, prompts,
+  tool handling)
+- tracing overhead: traced runs (``main.run_traced``) against untraced ones
+
+``--output`` writes the report as JSON, stamped with the git commit, and
+``--compare`` prints the change against an earlier report.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --runs 20 --concurrency 1,4,8 --latency 0.2 --output bench.json
+    python benchmark.py --compare bench-main.json --output bench.json
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+from bedrock_standin import BedrockStandIn
+from langfuse_standin import LangfuseStandIn
+from serper_standin import WORDS, SerperStandIn
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PERCENTILES = (50, 90, 95, 99)
+
+TOPICS = (
+    "battery storage costs", "urban heat islands", "remote work productivity",
+    "vertical farming yields", "microplastics in rivers", "open source funding",
+    "container shipping delays", "coral reef recovery", "quantum error correction",
+    "school meal programs", "wind turbine recycling", "sleep and memory",
+)
+
+
+def benchmark_questions(count: int) -> List[str]:
+    """Return ``count`` distinct questions (the same ones on every run)."""
+    return [
+        f"What is known about {TOPICS[index % len(TOPICS)]} (case {index + 1})?"
+        for index in range(count)
+    ]
+
+
+class ScriptedModel:
+    """Reply function for ``BedrockStandIn`` that plays the crew's LLM.
+
+    A conversation that offers a web search tool and has no tool result yet
+    gets a call to that tool; every other request gets a final answer in the
+    task's schema (research or review) whose length is drawn from a normal
+    distribution, through the ``structured_output`` tool when it is offered. Draws are seeded from the
+    conversation, so the same question always gets the same replies.
+
+    Args:
+        output_tokens: Mean final answer length in tokens
+        output_tokens_sd: Standard deviation of the final answer length
+        seed: Changes every draw, for a different but repeatable workload
+    """
+
+    def __init__(self, output_tokens: int = 400, output_tokens_sd: int = 100, seed: int = 0):
+        self.output_tokens = output_tokens
+        self.output_tokens_sd = output_tokens_sd
+        self.seed = seed
+
+    def __call__(self, request: Dict[str, Any]):
+        messages = request.get("messages", [])
+        text = json.dumps(messages)
+        rng = random.Random(hashlib.sha256(f"{self.seed}:{text}".encode("utf-8")).hexdigest())
+        match = re.search(r"already asked: '(.+?)'", text)
+        query = match.group(1) if match else "benchmark query"
+
+        tools = [
+            tool["toolSpec"] for tool in (request.get("toolConfig") or {}).get("tools", [])
+            if "toolSpec" in tool
+        ]
+        search = next(
+            (spec for spec in tools if "search" in spec["name"].lower()
+             and "local" not in spec["name"].lower()),
+            None,
+        )
+        if search is not None and "toolResult" not in text:
+            return [{"toolUse": {
+                "toolUseId": f"tooluse_{rng.getrandbits(48):012x}",
+                "name": search["name"],
+                "input": self._tool_input(search, query),
+            }}]
+
+        tokens = max(1, int(rng.gauss(self.output_tokens, self.output_tokens_sd)))
+        # About four characters per token, as the stand-in counts them
+        filler = []
+        while sum(len(word) + 1 for word in filler) < tokens * 4:
+            filler.append(rng.choice(WORDS))
+        if "final_answer" in text:
+            answer = {
+                "final_answer": f"On {query}: {' '.join(filler)}",
+                "sources": [
+                    {"type": "serper", "detail": f"example{rng.randint(1, 50)}.com",
+                     "role": "evidence"},
+                    {"type": "user", "detail": "User query", "role": "Question definition"},
+                ],
+            }
+        else:
+            answer = {
+                "user_question": query,
+                "search_query": query,
+                "search_results": [f"example{rng.randint(1, 50)}.com: {query}"],
+                "provisional_answer": f"On {query}: {' '.join(filler)}",
+            }
+
+        # Tasks whose agent has no tools are answered through the forced schema tool
+        structured = next((spec for spec in tools if spec["name"] == "structured_output"), None)
+        if structured is not None:
+            return [{"toolUse": {
+                "toolUseId": f"tooluse_{rng.getrandbits(48):012x}",
+                "name": structured["name"],
+                "input": answer,
+            }}]
+        return f"Thought: I now know the final answer\nFinal Answer: {json.dumps(answer)}"
+
+    @staticmethod
+    def _tool_input(spec: Dict[str, Any], query: str) -> Dict[str, Any]:
+        """Fill the tool's required arguments with the query."""
+        schema = (spec.get("inputSchema") or {}).get("json") or {}
+        properties = schema.get("properties", {})
+        arguments = {}
+        for name in schema.get("required", list(properties)):
+            if properties.get(name, {}).get("type") == "array":
+                arguments[name] = [query, f"{query} statistics"]
+            else:
+                arguments[name] = query
+        return arguments
+
+
+def configure_environment(bedrock_url: str, serper_url: str, langfuse_url: str, cache_dir: str):
+    """Point the crew at the stand-ins. Must run before ``config`` is imported."""
+    os.environ.update({
+        "BEDROCK_ENDPOINTS": f"bench={bedrock_url}",
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "SERPER_URL": serper_url,
+        "SERPER_API_KEY": "bench",
+        "LANGFUSE_HOST": langfuse_url,
+        "LANGFUSE_PUBLIC_KEY": "pk-bench",
+        "LANGFUSE_SECRET_KEY": "sk-bench",
+        "CACHE_DIR": cache_dir,
+        # Every run does the same work: no cached searches or responses
+        "SEARCH_CACHE_ENABLED": "false",
+        "LLM_CACHE_ENABLED": "false",
+        "RUN_TIMING_ENABLED": "true",
+        "TRACE_SAMPLE_RATE": "1.0",
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def _percentile(values: Sequence[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+    return ordered[index]
+
+
+def _latency_stats(seconds: Sequence[float]) -> Dict[str, float]:
+    if not seconds:
+        return {}
+    stats = {"mean": round(statistics.mean(seconds), 4)}
+    for percent in PERCENTILES:
+        stats[f"p{percent}"] = round(_percentile(seconds, percent), 4)
+    stats["max"] = round(max(seconds), 4)
+    return stats
+
+
+def _git_commit() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR, capture_output=True, text=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=SRC_DIR, capture_output=True, text=True,
+        ).stdout.strip())
+    except OSError:
+        return {"commit": None, "dirty": None}
+    return {"commit": commit or None, "dirty": dirty}
+
+
+class CrewBenchmark:
+    """Runs benchmark questions on the crew with shared, pre-warmed LLMs."""
+
+    def __init__(self, bedrock: BedrockStandIn, serper: SerperStandIn):
+        from agents_and_tasks_v05 import get_agent_llms
+
+        self.bedrock = bedrock
+        self.serper = serper
+        # Reused by every run, as service workers do, so that runs measure the
+        # crew rather than client construction
+        self.llms = get_agent_llms()
+        self._langfuse = None
+
+    def run_once(self, question: str, traced: bool = False) -> Dict[str, Any]:
+        """Run one question; return its wall time and, if untraced, its timing summary."""
+        from agents_and_tasks_v05 import build_crew
+        from run_timing import record_timeline
+
+        crew = build_crew(question=question, llm=self.llms)
+        started = time.perf_counter()
+        try:
+            if traced:
+                from main import run_traced
+
+                run_traced(crew, self.langfuse, question)
+                return {"seconds": time.perf_counter() - started, "summary": None}
+            with record_timeline() as timeline:
+                crew.kickoff()
+            seconds = time.perf_counter() - started
+            timeline.finish()
+            return {"seconds": seconds, "summary": timeline.summary()}
+        except Exception as e:
+            return {"seconds": time.perf_counter() - started, "error": f"{type(e).__name__}: {e}"}
+
+    @property
+    def langfuse(self):
+        if self._langfuse is None:
+            from main import init_langfuse
+
+            self._langfuse = init_langfuse()
+        return self._langfuse
+
+    def run_level(self, questions: Sequence[str], concurrency: int) -> Dict[str, Any]:
+        """Run all ``questions`` untraced with ``concurrency`` at a time."""
+        model_before, search_before = self.bedrock.busy_seconds, self.serper.busy_seconds
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(self.run_once, questions))
+        elapsed = time.perf_counter() - started
+        model_seconds = self.bedrock.busy_seconds - model_before
+
+        done = [result for result in results if "error" not in result]
+        seconds = [result["seconds"] for result in done]
+        summaries = [result["summary"] for result in done]
+        llm_calls = sum(summary["llm"]["calls"] for summary in summaries)
+        llm_seconds = sum(summary["llm"]["seconds"] for summary in summaries)
+        tool_seconds = sum(summary["tools"]["seconds"] for summary in summaries)
+        outside = sum(seconds) - tool_seconds - model_seconds
+
+        def per_call(total):
+            return round(total / llm_calls * 1000, 2) if llm_calls else None
+
+        return {
+            "concurrency": concurrency,
+            "runs": len(results),
+            "failed": len(results) - len(done),
+            "errors": sorted({result["error"] for result in results if "error" in result})[:3],
+            "latency_seconds": _latency_stats(seconds),
+            "throughput_runs_per_second": round(len(done) / elapsed, 3) if elapsed else None,
+            "llm_calls_per_run": round(llm_calls / len(done), 2) if done else None,
+            "tool_calls_per_run": (
+                round(sum(s["tools"]["calls"] for s in summaries) / len(done), 2) if done else None
+            ),
+            "prompt_tokens_per_run": (
+                round(sum(s["llm"]["prompt_tokens"] for s in summaries) / len(done)) if done else None
+            ),
+            "model_seconds": round(model_seconds, 3),
+            "search_seconds": round(self.serper.busy_seconds - search_before, 3),
+            "framework_overhead_ms_per_llm_call": per_call(outside),
+            "llm_client_ms_per_call": per_call(llm_seconds - model_seconds),
+            "orchestration_ms_per_llm_call": per_call(outside - (llm_seconds - model_seconds)),
+        }
+
+    def run_tracing(self, questions: Sequence[str]) -> Dict[str, Any]:
+        """Compare traced and untraced runs of the same questions, one at a time."""
+        untraced, traced = [], []
+        # Interleaved so that drift affects both sides equally
+        for question in questions:
+            for results, is_traced in ((untraced, False), (traced, True)):
+                result = self.run_once(question, traced=is_traced)
+                if "error" not in result:
+                    results.append(result["seconds"])
+        flush_started = time.perf_counter()
+        self.langfuse.flush()
+        flush_seconds = time.perf_counter() - flush_started
+        if not untraced or not traced:
+            return {"runs": len(questions), "error": "runs failed"}
+        untraced_mean, traced_mean = statistics.mean(untraced), statistics.mean(traced)
+        return {
+            "runs": len(questions),
+            "untraced_mean_seconds": round(untraced_mean, 4),
+            "traced_mean_seconds": round(traced_mean, 4),
+            "overhead_ms_per_run": round((traced_mean - untraced_mean) * 1000, 2),
+            "overhead_percent": round((traced_mean / untraced_mean - 1) * 100, 2),
+            "flush_seconds": round(flush_seconds, 4),
+        }
+
+
+def run_benchmark(
+    runs: int = 10,
+    concurrency: Sequence[int] = (1, 4),
+    latency: float = 0.05,
+    jitter: float = 0.02,
+    seconds_per_token: float = 0.0,
+    output_tokens: int = 400,
+    output_tokens_sd: int = 100,
+    search_latency: float = 0.05,
+    tracing_runs: int = 5,
+    warmup: int = 1,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Start the stand-ins, run every concurrency level and the tracing comparison.
+
+    Args:
+        runs: Questions run at each concurrency level
+        concurrency: Concurrency levels to measure
+        latency: Model stand-in delay per call in seconds
+        jitter: Extra random model delay of up to this many seconds
+        seconds_per_token: Extra model delay per output token
+        output_tokens: Mean final answer length in tokens
+        output_tokens_sd: Standard deviation of the final answer length
+        search_latency: Serper stand-in delay per search in seconds
+        tracing_runs: Traced/untraced pairs for the tracing comparison (0 skips it)
+        warmup: Untraced runs before measuring
+        seed: Seed of the scripted model
+
+    Returns:
+        dict: Settings, git commit and the measurements
+    """
+    settings = {
+        "runs": runs, "concurrency": list(concurrency), "latency": latency, "jitter": jitter,
+        "seconds_per_token": seconds_per_token, "output_tokens": output_tokens,
+        "output_tokens_sd": output_tokens_sd, "search_latency": search_latency,
+        "tracing_runs": tracing_runs, "warmup": warmup, "seed": seed,
+    }
+    bedrock = BedrockStandIn(
+        latency=latency, jitter=jitter, seconds_per_token=seconds_per_token,
+        reply=ScriptedModel(output_tokens, output_tokens_sd, seed),
+    ).start()
+    serper = SerperStandIn(latency=search_latency).start()
+    langfuse = LangfuseStandIn().start()
+    cache_dir = tempfile.mkdtemp(prefix="crew-benchmark-")
+    configure_environment(bedrock.url, serper.url, langfuse.url, cache_dir)
+
+    report = {
+        "benchmark": "crew",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        **_git_commit(),
+        "settings": settings,
+    }
+    # The crew's verbose output and the run banners would drown the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        benchmark = CrewBenchmark(bedrock, serper)
+        for question in benchmark_questions(warmup):
+            benchmark.run_once(f"Warm-up: {question}")
+        report["levels"] = [
+            benchmark.run_level(benchmark_questions(runs), level) for level in concurrency
+        ]
+        if tracing_runs:
+            report["tracing"] = benchmark.run_tracing(benchmark_questions(tracing_runs))
+    for standin in (bedrock, serper, langfuse):
+        standin.stop()
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    settings = report["settings"]
+    commit = report.get("commit") or "unknown"
+    print(
+        f"Crew benchmark at {commit}{' (dirty)' if report.get('dirty') else ''}, "
+        f"Python {report['python']}: model {settings['latency']}s "
+        f"+{settings['jitter']}s jitter, ~{settings['output_tokens']} output tokens, "
+        f"search {settings['search_latency']}s"
+    )
+    print(
+        f"{'conc':>4} {'runs':>5} {'fail':>4} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+        f"{'runs/s':>7} {'LLM/run':>7} {'ovh ms/call':>11} {'client':>7} {'orch':>7}"
+    )
+    for level in report["levels"]:
+        latency = level["latency_seconds"]
+        if not latency:
+            print(f"{level['concurrency']:>4} {level['runs']:>5} {level['failed']:>4}  "
+                  f"{'; '.join(level['errors'])}")
+            continue
+        print(
+            f"{level['concurrency']:>4} {level['runs']:>5} {level['failed']:>4} "
+            f"{latency['p50']:>7.3f} {latency['p95']:>7.3f} {latency['p99']:>7.3f} "
+            f"{level['throughput_runs_per_second']:>7.2f} {level['llm_calls_per_run']:>7.1f} "
+            f"{level['framework_overhead_ms_per_llm_call']:>11.1f} "
+            f"{level['llm_client_ms_per_call']:>7.1f} {level['orchestration_ms_per_llm_call']:>7.1f}"
+        )
+    tracing = report.get("tracing")
+    if tracing and "error" not in tracing:
+        print(
+            f"Tracing: {tracing['overhead_ms_per_run']:+.1f} ms per run "
+            f"({tracing['overhead_percent']:+.1f}%) over {tracing['runs']} runs; "
+            f"flush {tracing['flush_seconds']:.3f}s"
+        )
+    elif tracing:
+        print(f"Tracing: {tracing['error']}")
+
+
+def compare_reports(baseline: Dict[str, Any], report: Dict[str, Any]) -> List[str]:
+    """Describe the change of the main metrics from ``baseline`` to ``report``."""
+
+    def change(old, new, unit):
+        if old is None or new is None:
+            return "n/a"
+        percent = f" ({(new / old - 1) * 100:+.1f}%)" if old else ""
+        return f"{old:.3f} -> {new:.3f}{unit}{percent}"
+
+    lines = [f"Compared with {baseline.get('commit') or 'unknown'} ({baseline.get('created')}):"]
+    if baseline.get("settings") != report.get("settings"):
+        lines.append("  note: settings differ between the two reports")
+    old_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in report.get("levels", []):
+        old = old_levels.get(level["concurrency"])
+        if not old or not old["latency_seconds"] or not level["latency_seconds"]:
+            continue
+        lines.append(
+            f"  concurrency {level['concurrency']}: "
+            f"p50 {change(old['latency_seconds']['p50'], level['latency_seconds']['p50'], 's')}, "
+            f"p95 {change(old['latency_seconds']['p95'], level['latency_seconds']['p95'], 's')}, "
+            f"throughput {change(old['throughput_runs_per_second'], level['throughput_runs_per_second'], '/s')}, "
+            f"overhead {change(old['framework_overhead_ms_per_llm_call'], level['framework_overhead_ms_per_llm_call'], 'ms/call')}"
+        )
+    old_tracing, tracing = baseline.get("tracing") or {}, report.get("tracing") or {}
+    if "overhead_ms_per_run" in old_tracing and "overhead_ms_per_run" in tracing:
+        lines.append(
+            "  tracing overhead "
+            f"{change(old_tracing['overhead_ms_per_run'], tracing['overhead_ms_per_run'], 'ms')}"
+        )
+    return lines
+
+
+def _levels(value: str) -> List[int]:
+    return [max(1, int(level)) for level in value.split(",") if level.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the crew on local stand-ins")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per concurrency level")
+    parser.add_argument("--concurrency", type=_levels, default=[1, 4],
+                        help="Comma-separated concurrency levels")
+    parser.add_argument("--latency", type=float, default=0.05, help="Model delay per call")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Random extra model delay")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0,
+                        help="Extra model delay per output token")
+    parser.add_argument("--output-tokens", type=int, default=400,
+                        help="Mean final answer length in tokens")
+    parser.add_argument("--output-tokens-sd", type=int, default=100,
+                        help="Standard deviation of the final answer length")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Search delay")
+    parser.add_argument("--tracing-runs", type=int, default=5,
+                        help="Traced/untraced pairs for the tracing overhead (0 skips)")
+    parser.add_argument("--warmup", type=int, default=1, help="Runs before measuring")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the scripted model")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        runs=max(1, args.runs), concurrency=args.concurrency, latency=args.latency,
+        jitter=args.jitter, seconds_per_token=args.seconds_per_token,
+        output_tokens=args.output_tokens, output_tokens_sd=args.output_tokens_sd,
+        search_latency=args.search_latency, tracing_runs=max(0, args.tracing_runs),
+        warmup=max(0, args.warmup), seed=args.seed,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print("\n".join(compare_reports(json.load(f), report)))
+    if any(level["failed"] for level in report["levels"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Persistent key-value cache for the multi-agent system.
+
+Provides a small SQLite-backed store with per-entry TTL and size-bounded
+LRU eviction. Values are stored as JSON so the cache can be shared between
+runs and processes.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    last_access REAL NOT NULL
+)
+"""
+
+
+class DiskCache:
+    """On-disk JSON cache with TTL expiry and least-recently-used eviction.
+
+    Args:
+        path: Location of the SQLite database file (directories are created)
+        max_entries: Maximum number of entries kept; 0 disables the limit
+        max_bytes: Maximum total size of stored values; 0 disables the limit
+        default_ttl: Lifetime in seconds for entries set without a TTL;
+            None means entries never expire
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 1000,
+        max_bytes: int = 0,
+        default_ttl: Optional[float] = None,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._writes = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        logger.debug(f"Disk cache opened at {path}")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for key, or default on a miss or expiry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return default
+
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self._expired += 1
+                self._misses += 1
+                return default
+
+            self._conn.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self._hits += 1
+
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a JSON-serializable value, evicting old entries if needed.
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+            ttl: Lifetime in seconds; falls back to the cache default
+        """
+        payload = json.dumps(value, default=str)
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl is not None else None
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, value, size, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, expires_at, now),
+            )
+            self._writes += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        """Remove a single entry if present."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones over the limits."""
+        cursor = self._conn.execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (now,),
+        )
+        self._expired += max(cursor.rowcount, 0)
+
+        if self.max_entries:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY last_access ASC LIMIT ?)",
+                    (excess,),
+                )
+                self._evictions += excess
+
+        if self.max_bytes:
+            (total,) = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            if total > self.max_bytes:
+                doomed = []
+                rows = self._conn.execute(
+                    "SELECT key, size FROM entries ORDER BY last_access ASC"
+                ).fetchall()
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+                self._evictions += len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size of the cache."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "writes": self._writes,
+                "entries": entries,
+                "bytes": size,
+            }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,276 @@
+"""Record/replay cassettes of LLM and tool calls.
+
+In record mode every LLM request and response, search result and ask_user
+answer of a run is written to a cassette file. In replay mode they are
+served back from it: no Bedrock or Serper request is made and nobody is
+asked anything, so a full researcher -> reviewer run completes in well
+under a second and behaves the same every time.
+
+Interactions are matched on a hash of the full request: model, generation
+settings, stop words, tool schemas and messages for LLM calls, tool name
+and arguments for tool calls. Strict matching replays identical requests in
+the order they were recorded and fails on any request that was not. Fuzzy
+matching also accepts a request that differs only in numbers, IDs and
+whitespace, and otherwise falls back to the next unplayed interaction of
+the same kind.
+
+Cassettes are compact JSON, gzip-compressed when the file name ends in
+``.gz``. The active cassette is set with ``use_cassette`` (``main.py
+--record`` / ``--replay``) or ``CASSETTE_MODE`` and ``CASSETTE_PATH``; the
+LLM layer (``llm_layers.CassetteLLM``) and tool wrapper
+(``tools.CassetteTool``) apply it.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, Optional
+from config import CASSETTE_MODE, CASSETTE_PATH, CASSETTE_MATCH
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+CASSETTE_MODES = ("off", "record", "replay")
+MATCH_MODES = ("strict", "fuzzy")
+FORMAT_VERSION = 1
+
+# Replaced by "#" before fuzzy matching: UUIDs, long hex IDs and numbers
+_VOLATILE = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\b[0-9a-f]{12,}\b|\d+(\.\d+)?"
+)
+
+
+class CassetteMismatch(LookupError):
+    """A replayed run made a request that the cassette does not hold."""
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def request_key(kind: str, request: Dict[str, Any]) -> str:
+    """Strict key: a hash of the complete request."""
+    return _digest(kind + json.dumps(request, sort_keys=True, default=str))
+
+
+def fuzzy_key(kind: str, request: Dict[str, Any]) -> str:
+    """Key that ignores numbers, IDs, case and whitespace."""
+    text = json.dumps(request, sort_keys=True, default=str).lower()
+    return _digest(kind + " ".join(_VOLATILE.sub("#", text).split()))
+
+
+def _preview(request: Dict[str, Any], limit: int = 200) -> str:
+    """Short description of a request, stored for humans reading a cassette."""
+    if "messages" in request:
+        messages = request["messages"] or [{}]
+        last = messages[-1]
+        content = last.get("content") if isinstance(last, dict) else last
+        text = f"{request.get('model')}: {content}"
+    else:
+        text = f"{request.get('tool')}: {json.dumps(request.get('args'), default=str)}"
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def encode_response(response: Any) -> Dict[str, Any]:
+    """Store a response as JSON, remembering whether it was text, JSON or a model."""
+    if isinstance(response, str):
+        return {"text": response}
+    if hasattr(response, "model_dump"):
+        return {"model": response.model_dump(mode="json")}
+    return {"json": response}
+
+
+def decode_response(entry: Dict[str, Any], response_model=None) -> Any:
+    """Rebuild a stored response; models are validated against ``response_model``."""
+    if "text" in entry:
+        return entry["text"]
+    if "model" in entry:
+        return response_model.model_validate(entry["model"]) if response_model else entry["model"]
+    return entry["json"]
+
+
+class Cassette:
+    """Recorded interactions of a run, written to or replayed from one file.
+
+    Args:
+        path: Cassette file (``.gz`` for a gzip-compressed one)
+        mode: "record" (start a new cassette) or "replay" (load an existing one)
+        match: "strict" or "fuzzy" request matching when replaying
+
+    Raises:
+        ValueError: If the mode or match is unknown, or the cassette to
+            replay does not exist or has an unsupported format
+    """
+
+    def __init__(self, path: str, mode: str = "replay", match: str = "strict"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}'. Choose from: record, replay")
+        if match not in MATCH_MODES:
+            raise ValueError(f"Unknown cassette match '{match}'. Choose from: {', '.join(MATCH_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.match = match
+        self.interactions = []
+        self._lock = threading.Lock()
+        self._played = set()
+        self._fuzzy_hits = 0
+        self._by_key: Dict[str, deque] = defaultdict(deque)
+        self._by_fuzzy_key: Dict[str, deque] = defaultdict(deque)
+        self._by_kind: Dict[str, deque] = defaultdict(deque)
+
+        if mode == "replay":
+            self._load()
+        else:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._save()
+
+    def _open(self, path: str, write: bool = False):
+        if self.path.endswith(".gz"):
+            return gzip.open(path, "wt" if write else "rt", encoding="utf-8")
+        return open(path, "w" if write else "r", encoding="utf-8")
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.path):
+            raise ValueError(f"Cassette not found: {self.path}")
+        with self._open(self.path) as f:
+            data = json.load(f)
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported cassette format in {self.path}: {data.get('version')}")
+        self.interactions = data["interactions"]
+        for index, interaction in enumerate(self.interactions):
+            self._by_key[interaction["key"]].append(index)
+            self._by_fuzzy_key[interaction["fuzzy_key"]].append(index)
+            self._by_kind[interaction["kind"]].append(index)
+        logger.info(f"Replaying {len(self.interactions)} interactions from {self.path}")
+
+    def _save(self) -> None:
+        temp_path = self.path + ".tmp"
+        data = {"version": FORMAT_VERSION, "recorded_at": time.time(),
+                "interactions": self.interactions}
+        with self._open(temp_path, write=True) as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    def _take(self, queue: deque) -> Optional[int]:
+        while queue and queue[0] in self._played:
+            queue.popleft()
+        return queue.popleft() if queue else None
+
+    def _find(self, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            index = self._take(self._by_key[request_key(kind, request)])
+            if index is None and self.match == "fuzzy":
+                index = self._take(self._by_fuzzy_key[fuzzy_key(kind, request)])
+                if index is None:
+                    index = self._take(self._by_kind[kind])
+                if index is not None:
+                    self._fuzzy_hits += 1
+            if index is None:
+                raise CassetteMismatch(
+                    f"No recorded {kind} interaction in {self.path} matches {_preview(request)}"
+                )
+            self._played.add(index)
+            return self.interactions[index]
+
+    def play(self, kind: str, request: Dict[str, Any], call: Callable[[], Any],
+             response_model=None) -> Any:
+        """Replay the response to ``request``, or make the call and record it.
+
+        Args:
+            kind: "llm" or "tool"
+            request: JSON-serializable description of the call
+            call: Makes the real call (only used when recording)
+            response_model: Model a recorded structured response is rebuilt as
+
+        Raises:
+            CassetteMismatch: If replaying and no recorded interaction matches
+        """
+        if self.mode == "replay":
+            return decode_response(self._find(kind, request)["response"], response_model)
+        response = call()
+        self.record(kind, request, response)
+        return response
+
+    async def aplay(self, kind: str, request: Dict[str, Any], acall, response_model=None) -> Any:
+        """Asynchronous ``play``; ``acall`` returns an awaitable."""
+        if self.mode == "replay":
+            return decode_response(self._find(kind, request)["response"], response_model)
+        response = await acall()
+        self.record(kind, request, response)
+        return response
+
+    def record(self, kind: str, request: Dict[str, Any], response: Any) -> None:
+        """Append an interaction and rewrite the cassette file."""
+        interaction = {
+            "kind": kind,
+            "key": request_key(kind, request),
+            "fuzzy_key": fuzzy_key(kind, request),
+            "request": _preview(request),
+            "response": encode_response(response),
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+            try:
+                # Rewritten every time, so a run that fails still leaves a usable cassette
+                self._save()
+            except Exception as e:
+                logger.warning(f"Failed to write cassette {self.path}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cassette's mode and interaction counters."""
+        with self._lock:
+            stats = {"path": self.path, "mode": self.mode, "interactions": len(self.interactions)}
+            if self.mode == "replay":
+                stats.update(
+                    match=self.match,
+                    played=len(self._played),
+                    unplayed=len(self.interactions) - len(self._played),
+                    fuzzy_matches=self._fuzzy_hits,
+                )
+            return stats
+
+
+_cassette: Optional[Cassette] = None
+_cassette_configured = False
+_cassette_lock = threading.Lock()
+
+
+def use_cassette(path: Optional[str], mode: str = "replay", match: str = "strict") -> Optional[Cassette]:
+    """Set the cassette that LLMs and tools created from now on record to or replay from.
+
+    Args:
+        path: Cassette file; None (or mode "off") turns cassettes off
+        mode: "record", "replay" or "off"
+        match: "strict" or "fuzzy"
+
+    Returns:
+        Cassette or None: The active cassette
+    """
+    global _cassette, _cassette_configured
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f"Unknown cassette mode '{mode}'. Choose from: {', '.join(CASSETTE_MODES)}")
+    with _cassette_lock:
+        _cassette = Cassette(path, mode, match) if path and mode != "off" else None
+        _cassette_configured = True
+        if _cassette is not None:
+            logger.info(f"Cassette {mode} mode ({match} matching): {path}")
+        return _cassette
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Return the active cassette, set up from CASSETTE_MODE/CASSETTE_PATH on first use."""
+    if not _cassette_configured:
+        use_cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_MATCH)
+    return _cassette
+
+
+def replaying() -> bool:
+    """Return True if calls are served from a cassette instead of the network."""
+    cassette = get_cassette()
+    return cassette is not None and cassette.mode == "replay"
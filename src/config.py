@@ -23,6 +23,48 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 LLM_MODEL = "bedrock/amazon.nova-pro-v1:0"
 LLM_TEMPERATURE = 0.2
 LLM_MAX_TOKENS = 4000
+# Auto-sized max_tokens is the expected output length times this, capped at LLM_MAX_TOKENS
+LLM_MAX_TOKENS_HEADROOM = float(os.getenv("LLM_MAX_TOKENS_HEADROOM", "1.5"))
+
+# Per-Agent LLM Profiles (max_tokens of 0 is sized from expected_output_tokens)
+LLM_PROFILES = {
+    "researcher": {
+        "model": os.getenv("RESEARCHER_LLM_MODEL", LLM_MODEL),
+        "temperature": float(os.getenv("RESEARCHER_LLM_TEMPERATURE", str(LLM_TEMPERATURE))),
+        "max_tokens": int(os.getenv("RESEARCHER_LLM_MAX_TOKENS", "0")),
+        "expected_output_tokens": int(os.getenv("RESEARCHER_EXPECTED_OUTPUT_TOKENS", "1600")),
+    },
+    "reviewer": {
+        "model": os.getenv("REVIEWER_LLM_MODEL", LLM_MODEL),
+        "temperature": float(os.getenv("REVIEWER_LLM_TEMPERATURE", str(LLM_TEMPERATURE))),
+        "max_tokens": int(os.getenv("REVIEWER_LLM_MAX_TOKENS", "0")),
+        "expected_output_tokens": int(os.getenv("REVIEWER_EXPECTED_OUTPUT_TOKENS", "1200")),
+    },
+}
+
+# Bedrock Routing: comma-separated regions or name=url endpoints, in order of preference
+BEDROCK_ENDPOINTS = tuple(
+    entry.strip() for entry in os.getenv("BEDROCK_ENDPOINTS", AWS_REGION).split(",") if entry.strip()
+)
+BEDROCK_ROUTING_EWMA_ALPHA = float(os.getenv("BEDROCK_ROUTING_EWMA_ALPHA", "0.3"))
+BEDROCK_ROUTING_ERROR_PENALTY = float(os.getenv("BEDROCK_ROUTING_ERROR_PENALTY", "4"))
+BEDROCK_ROUTING_ERROR_HALF_LIFE_SECONDS = float(os.getenv("BEDROCK_ROUTING_ERROR_HALF_LIFE_SECONDS", "60"))
+BEDROCK_ROUTING_PROBE_SECONDS = float(os.getenv("BEDROCK_ROUTING_PROBE_SECONDS", "30"))
+BEDROCK_HEDGE_ENABLED = os.getenv("BEDROCK_HEDGE_ENABLED", "false").lower() == "true"
+BEDROCK_HEDGE_PERCENTILE = float(os.getenv("BEDROCK_HEDGE_PERCENTILE", "95"))
+BEDROCK_HEDGE_MIN_SAMPLES = int(os.getenv("BEDROCK_HEDGE_MIN_SAMPLES", "20"))
+
+# Bedrock Load Control (rate limits of 0 are disabled; retries back off exponentially)
+BEDROCK_LOAD_CONTROL_ENABLED = os.getenv("BEDROCK_LOAD_CONTROL_ENABLED", "true").lower() == "true"
+BEDROCK_REQUESTS_PER_MINUTE = float(os.getenv("BEDROCK_REQUESTS_PER_MINUTE", "0"))
+BEDROCK_TOKENS_PER_MINUTE = float(os.getenv("BEDROCK_TOKENS_PER_MINUTE", "0"))
+BEDROCK_MAX_RETRIES = int(os.getenv("BEDROCK_MAX_RETRIES", "4"))
+BEDROCK_BACKOFF_BASE_SECONDS = float(os.getenv("BEDROCK_BACKOFF_BASE_SECONDS", "1"))
+BEDROCK_BACKOFF_MAX_SECONDS = float(os.getenv("BEDROCK_BACKOFF_MAX_SECONDS", "30"))
+BEDROCK_MAX_CONCURRENCY = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "8"))
+BEDROCK_MIN_CONCURRENCY = int(os.getenv("BEDROCK_MIN_CONCURRENCY", "1"))
+BEDROCK_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("BEDROCK_CIRCUIT_FAILURE_THRESHOLD", "5"))
+BEDROCK_CIRCUIT_RESET_SECONDS = float(os.getenv("BEDROCK_CIRCUIT_RESET_SECONDS", "30"))
 
 # Langfuse Trace Configuration
 TRACE_NAME = os.getenv("TRACE_NAME", "multi-agent-crewai-run")
@@ -31,11 +73,145 @@ TRACE_SESSION_ID = os.getenv("TRACE_SESSION_ID", "dev-session-1")
 TRACE_PROJECT_NAME = os.getenv("TRACE_PROJECT_NAME", "multi_agent_system")
 TRACE_TAGS = ["crewai", "nova-pro", "multi-agent"]
 
+# Trace Sampling and Export (unsampled runs are still traced if they fail or are slow)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_ALWAYS_ON_ERRORS = os.getenv("TRACE_ALWAYS_ON_ERRORS", "true").lower() == "true"
+TRACE_SLOW_RUN_SECONDS = float(os.getenv("TRACE_SLOW_RUN_SECONDS", "120"))
+TRACE_MAX_PAYLOAD_CHARS = int(os.getenv("TRACE_MAX_PAYLOAD_CHARS", "20000"))
+TRACE_FLUSH_AT = int(os.getenv("TRACE_FLUSH_AT", "512"))
+TRACE_FLUSH_INTERVAL_SECONDS = float(os.getenv("TRACE_FLUSH_INTERVAL_SECONDS", "5"))
+TRACE_EXPORT_COMPRESSION = os.getenv("TRACE_EXPORT_COMPRESSION", "gzip")
+
 # Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
 LOG_FILE = os.path.join(LOG_DIR, "app.log")
 
+# Cache Configuration
+CACHE_DIR = os.getenv(
+    "CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache")
+)
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+SEARCH_CACHE_PATH = os.path.join(CACHE_DIR, "search_cache.sqlite3")
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "86400"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Trace Spool (exports are written to disk and forwarded to LANGFUSE_HOST in the background)
+TRACE_SPOOL_ENABLED = os.getenv("TRACE_SPOOL_ENABLED", "false").lower() == "true"
+TRACE_SPOOL_PATH = os.path.join(CACHE_DIR, "trace_spool.sqlite3")
+TRACE_SPOOL_MAX_BYTES = int(os.getenv("TRACE_SPOOL_MAX_BYTES", str(100 * 1024 * 1024)))
+TRACE_SPOOL_MAX_AGE_SECONDS = float(os.getenv("TRACE_SPOOL_MAX_AGE_SECONDS", "604800"))
+TRACE_SPOOL_BATCH_SIZE = int(os.getenv("TRACE_SPOOL_BATCH_SIZE", "20"))
+TRACE_SPOOL_TIMEOUT_SECONDS = float(os.getenv("TRACE_SPOOL_TIMEOUT_SECONDS", "10"))
+TRACE_SPOOL_BACKOFF_BASE_SECONDS = float(os.getenv("TRACE_SPOOL_BACKOFF_BASE_SECONDS", "1"))
+TRACE_SPOOL_BACKOFF_MAX_SECONDS = float(os.getenv("TRACE_SPOOL_BACKOFF_MAX_SECONDS", "300"))
+
+# Run Timing (per-task, iteration, LLM and tool timings exported as spans and summarized per run)
+RUN_TIMING_ENABLED = os.getenv("RUN_TIMING_ENABLED", "true").lower() == "true"
+RUN_TIMINGS_DIR = os.getenv("RUN_TIMINGS_DIR", os.path.join(CACHE_DIR, "timings"))
+
+# Search Backend Configuration ("serper", "local" or "both")
+SEARCH_BACKENDS = ("serper", "local", "both")
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "serper")
+LOCAL_DOCS_DIR = os.getenv("LOCAL_DOCS_DIR")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(CACHE_DIR, "local_index"))
+LOCAL_INDEX_EXTENSIONS = tuple(
+    os.getenv("LOCAL_INDEX_EXTENSIONS", ".txt,.md,.rst,.html,.htm,.csv,.json").split(",")
+)
+LOCAL_INDEX_PASSAGE_WORDS = int(os.getenv("LOCAL_INDEX_PASSAGE_WORDS", "200"))
+LOCAL_INDEX_MAX_SEGMENTS = int(os.getenv("LOCAL_INDEX_MAX_SEGMENTS", "8"))
+LOCAL_SEARCH_RESULTS = int(os.getenv("LOCAL_SEARCH_RESULTS", "5"))
+
+# Search Result Compaction (opt-in; dedupe, rerank and trim results before the agent sees them)
+SEARCH_COMPACTION_ENABLED = os.getenv("SEARCH_COMPACTION_ENABLED", "false").lower() == "true"
+SEARCH_TOKEN_BUDGET = int(os.getenv("SEARCH_TOKEN_BUDGET", "800"))
+SEARCH_DEDUPE_THRESHOLD = float(os.getenv("SEARCH_DEDUPE_THRESHOLD", "0.85"))
+
+# Multi-Query Search Configuration (opt-in; one tool call runs several Serper queries concurrently)
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev/search")
+SERPER_TIMEOUT_SECONDS = float(os.getenv("SERPER_TIMEOUT_SECONDS", "15"))
+MULTI_SEARCH_ENABLED = os.getenv("MULTI_SEARCH_ENABLED", "false").lower() == "true"
+MULTI_SEARCH_MAX_QUERIES = int(os.getenv("MULTI_SEARCH_MAX_QUERIES", "5"))
+MULTI_SEARCH_CONCURRENCY = int(os.getenv("MULTI_SEARCH_CONCURRENCY", "5"))
+MULTI_SEARCH_RESULTS_PER_QUERY = int(os.getenv("MULTI_SEARCH_RESULTS_PER_QUERY", "10"))
+MULTI_SEARCH_MAX_RESULTS = int(os.getenv("MULTI_SEARCH_MAX_RESULTS", "20"))
+
+# LLM Response Cache Configuration (opt-in; bypass skips lookups but refreshes entries)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "false").lower() == "true"
+LLM_CACHE_PATH = os.path.join(CACHE_DIR, "llm_cache.sqlite3")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "604800"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Ask User Configuration (timeout of 0 waits indefinitely)
+ASK_USER_TIMEOUT_SECONDS = float(os.getenv("ASK_USER_TIMEOUT_SECONDS", "0")) or None
+ASK_USER_DEFAULT_ANSWER = os.getenv("ASK_USER_DEFAULT_ANSWER", "No answer provided")
+
+# Agent Loop Budgets, per run and per agent (opt-in; 0 disables a limit; tokens are estimated)
+RUN_BUDGET_ENABLED = os.getenv("RUN_BUDGET_ENABLED", "false").lower() == "true"
+RUN_MAX_LLM_CALLS = int(os.getenv("RUN_MAX_LLM_CALLS", "30"))
+RUN_MAX_TOOL_CALLS = int(os.getenv("RUN_MAX_TOOL_CALLS", "15"))
+RUN_MAX_TOKENS = int(os.getenv("RUN_MAX_TOKENS", "0"))
+RUN_DEADLINE_SECONDS = float(os.getenv("RUN_DEADLINE_SECONDS", "300"))
+AGENT_BUDGETS = {
+    "researcher": {
+        "max_llm_calls": int(os.getenv("RESEARCHER_MAX_LLM_CALLS", "15")),
+        "max_tool_calls": int(os.getenv("RESEARCHER_MAX_TOOL_CALLS", "10")),
+        "max_tokens": int(os.getenv("RESEARCHER_MAX_TOKENS", "0")),
+        "deadline_seconds": float(os.getenv("RESEARCHER_DEADLINE_SECONDS", "0")),
+    },
+    "reviewer": {
+        "max_llm_calls": int(os.getenv("REVIEWER_MAX_LLM_CALLS", "3")),
+        "max_tool_calls": int(os.getenv("REVIEWER_MAX_TOOL_CALLS", "0")),
+        "max_tokens": int(os.getenv("REVIEWER_MAX_TOKENS", "0")),
+        "deadline_seconds": float(os.getenv("REVIEWER_DEADLINE_SECONDS", "0")),
+    },
+}
+
+# Usage Ledger (tokens and cost per run; prices in USD per million tokens, keyed by model ID)
+LLM_PRICES = {
+    "amazon.nova-premier-v1:0": {"input": 2.50, "output": 12.50},
+    "amazon.nova-pro-v1:0": {"input": 0.80, "output": 3.20},
+    "amazon.nova-lite-v1:0": {"input": 0.06, "output": 0.24},
+    "amazon.nova-micro-v1:0": {"input": 0.035, "output": 0.14},
+}
+# JSON object overriding or adding prices (parsed and checked by usage_ledger)
+LLM_PRICES_OVERRIDES = os.getenv("LLM_PRICES", "")
+USAGE_LEDGER_PATH = os.getenv("USAGE_LEDGER_PATH", os.path.join(CACHE_DIR, "usage.jsonl"))
+# Per-run cost ceiling in USD (0 disables it; enforced with the loop budgets)
+RUN_MAX_COST_USD = float(os.getenv("RUN_MAX_COST_USD", "0"))
+
+# Speculative Search Configuration (search for the known question while ask_user waits)
+SPECULATIVE_SEARCH_ENABLED = os.getenv("SPECULATIVE_SEARCH_ENABLED", "false").lower() == "true"
+
+# Research Mode Configuration ("standard", "map-reduce", "fast" or "adaptive")
+RESEARCH_MODES = ("standard", "map-reduce", "fast", "adaptive")
+RESEARCH_MODE = os.getenv("RESEARCH_MODE", "standard")
+MAP_REDUCE_SUBQUESTIONS = int(os.getenv("MAP_REDUCE_SUBQUESTIONS", "3"))
+MAP_REDUCE_SEARCH_BUDGET = int(os.getenv("MAP_REDUCE_SEARCH_BUDGET", "3"))
+
+# Batch Configuration
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+# HTTP Service Configuration
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "2"))
+SERVICE_QUEUE_SIZE = int(os.getenv("SERVICE_QUEUE_SIZE", "16"))
+SERVICE_SYNC_TIMEOUT_SECONDS = float(os.getenv("SERVICE_SYNC_TIMEOUT_SECONDS", "300"))
+SERVICE_MAX_JOBS = int(os.getenv("SERVICE_MAX_JOBS", "1000"))
+
+# Checkpoint Configuration (opt-in; standard-mode runs are saved per task and resumable)
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "false").lower() == "true"
+RUN_STORE_DIR = os.getenv("RUN_STORE_DIR", os.path.join(CACHE_DIR, "runs"))
+
+# Cassettes (record LLM and tool calls to a file, or replay them without network access)
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH")
+CASSETTE_MATCH = os.getenv("CASSETTE_MATCH", "strict")
+
 # Project Configuration
 PROJECT_NAME = "Multi-Agent LangFuse System"
 VERSION = "1.0.0"
@@ -45,7 +221,8 @@ def validate_config():
     Validate that all required environment variables are set.
     
     Raises:
-        ValueError: If any required environment variable is missing.
+        ValueError: If any required environment variable is missing, or
+            SEARCH_BACKEND is not a known backend.
     """
     required_vars = {
         "SERPER_API_KEY": SERPER_API_KEY,
@@ -60,5 +237,11 @@ def validate_config():
             f"Missing required environment variables: {', '.join(missing_vars)}. "
             "Please check your .env file."
         )
+
+    if SEARCH_BACKEND not in SEARCH_BACKENDS:
+        raise ValueError(
+            f"Invalid SEARCH_BACKEND: {SEARCH_BACKEND!r}. "
+            f"Expected one of: {', '.join(SEARCH_BACKENDS)}."
+        )
     
     return True
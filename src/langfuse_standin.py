@@ -0,0 +1,136 @@
+"""Local stand-in for the Langfuse export endpoints.
+
+Accepts ``POST /api/public/otel/v1/traces`` (OTLP span batches) and
+``POST /api/public/ingestion`` (score batches), keeps every request it
+accepted and can be made slow, flaky or unreachable. Setting
+``LANGFUSE_HOST`` to its URL exercises the trace spool's retries, backoff
+and resume without a Langfuse account.
+
+Usage:
+    python langfuse_standin.py --port 3100 --error-rate 0.2
+"""
+import argparse
+import gzip
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+EXPORT_PATHS = ("/api/public/otel/v1/traces", "/api/public/ingestion")
+
+
+class LangfuseStandIn:
+    """Langfuse export stand-in running on a background thread.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        latency: Seconds to wait before answering
+        error_rate: Share of requests failing with 503
+        available: If False, every request fails with 503 until set back to True
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        available: bool = True,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.available = available
+        self.requests = 0
+        # (path, decompressed body) of every accepted request
+        self.accepted: List[Tuple[str, bytes]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with standin._lock:
+                    standin.requests += 1
+                path = self.path.split("?", 1)[0].rstrip("/")
+                if path not in EXPORT_PATHS:
+                    self._send(404, b'{"message": "Not found"}')
+                    return
+                if not self.headers.get("Authorization", "").startswith("Basic "):
+                    self._send(401, b'{"message": "Missing credentials"}')
+                    return
+
+                time.sleep(standin.latency)
+                if not standin.available or random.random() < standin.error_rate:
+                    self._send(503, b'{"message": "Service unavailable"}')
+                    return
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                with standin._lock:
+                    standin.accepted.append((path, body))
+                if path.endswith("/ingestion"):
+                    self._send(207, b'{"successes": [], "errors": []}')
+                else:
+                    self._send(200, b"")
+
+            def _send(self, status, data):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "LangfuseStandIn":
+        """Start serving on a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="langfuse-standin", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local Langfuse export stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Response delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 503 responses")
+    args = parser.parse_args(argv)
+
+    standin = LangfuseStandIn(
+        host=args.host, port=args.port, latency=args.latency, error_rate=args.error_rate
+    ).start()
+    print(f"Langfuse stand-in listening on {standin.url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{standin.requests} requests, {len(standin.accepted)} accepted")
+    except KeyboardInterrupt:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main()
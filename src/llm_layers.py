@@ -0,0 +1,580 @@
+"""Composable layers around the CrewAI LLM used by the agents.
+
+An LLM layer is itself a CrewAI LLM that forwards every call to the LLM it
+wraps, so layers can be stacked and handed to an Agent like any other LLM.
+This module provides the delegating base class, the response cache layer, the
+load control layer, the multi-endpoint routing layer, the timing layer, the
+loop budget layer and the record/replay cassette layer.
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+from crewai.llms.base_llm import BaseLLM, call_stop_override
+from cache_store import DiskCache
+from cassette import Cassette, get_cassette
+from rate_control import LoadController
+from region_router import EndpointRouter
+from run_budget import FINAL_ANSWER_PROMPT, BudgetExhausted, CostCeilingExceeded, current_budget
+from run_timing import mark, timed
+from usage_ledger import call_cost
+from config import (
+    LLM_MAX_TOKENS,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_MAX_BYTES,
+)
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LLMLayer(BaseLLM):
+    """Base class for LLMs that delegate to a wrapped LLM.
+
+    Mirrors the wrapped LLM's model settings, forwards the per-call stop words
+    the agent executor applies to this layer, and reports the wrapped LLM's
+    token usage and capabilities. Subclasses override ``call``/``acall`` and
+    use ``_forward``/``_aforward`` to reach the wrapped LLM.
+
+    Args:
+        inner: The LLM (or another layer) to delegate to
+    """
+
+    inner: Any = None
+
+    def __init__(self, inner: BaseLLM, **data: Any):
+        data.setdefault("model", inner.model)
+        data.setdefault("provider", getattr(inner, "provider", None))
+        data.setdefault("temperature", inner.temperature)
+        data.setdefault("max_tokens", getattr(inner, "max_tokens", None))
+        data.setdefault("stop", list(getattr(inner, "stop", None) or []))
+        data.setdefault("stream", bool(getattr(inner, "stream", False)))
+        super().__init__(inner=inner, **data)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        return self._forward(
+            messages, tools=tools, callbacks=callbacks,
+            available_functions=available_functions, from_task=from_task,
+            from_agent=from_agent, response_model=response_model,
+        )
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        return await self._aforward(
+            messages, tools=tools, callbacks=callbacks,
+            available_functions=available_functions, from_task=from_task,
+            from_agent=from_agent, response_model=response_model,
+        )
+
+    # The wrapped provider LLM already applies CrewAI's retry policy
+    call._crewai_rate_limit_wrapped = True
+    acall._crewai_rate_limit_wrapped = True
+
+    def _forward(self, messages, **kwargs: Any) -> Any:
+        """Call the wrapped LLM with this layer's active stop words."""
+        with call_stop_override(self.inner, self.stop_sequences):
+            return self.inner.call(messages, **kwargs)
+
+    async def _aforward(self, messages, **kwargs: Any) -> Any:
+        """Asynchronously call the wrapped LLM with this layer's active stop words."""
+        with call_stop_override(self.inner, self.stop_sequences):
+            return await self.inner.acall(messages, **kwargs)
+
+    def describe_request(self, messages, tools=None) -> Dict[str, Any]:
+        """Return everything that determines a response: settings, stop words, tools, messages."""
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "top_p": self.top_p,
+            "stop": sorted(self.stop_sequences),
+            "messages": messages,
+            "tools": tools,
+        }
+
+    def innermost(self) -> BaseLLM:
+        """Return the provider LLM at the bottom of the layer stack."""
+        llm = self.inner
+        while isinstance(llm, LLMLayer):
+            llm = llm.inner
+        return llm
+
+    def supports_function_calling(self) -> bool:
+        return self.inner.supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return self.inner.supports_stop_words()
+
+    def supports_multimodal(self) -> bool:
+        return self.inner.supports_multimodal()
+
+    def get_context_window_size(self) -> int:
+        return self.inner.get_context_window_size()
+
+    def get_token_usage_summary(self):
+        return self.inner.get_token_usage_summary()
+
+
+class CachedLLM(LLMLayer):
+    """LLM layer that serves identical requests from a persistent cache.
+
+    Requests are keyed on a stable hash of the model, generation parameters,
+    stop words, tool schemas and messages. Only plain text and native tool
+    call responses are cached; calls that execute functions inside the LLM
+    or request a structured response model always go to the wrapped LLM.
+
+    Args:
+        inner: The LLM to cache
+        cache: Store used for responses
+        bypass: When True, skip lookups but still refresh stored responses
+    """
+
+    cache: Any = None
+    bypass: bool = False
+
+    def __init__(self, inner: BaseLLM, cache: DiskCache, bypass: bool = False, **data: Any):
+        super().__init__(inner, cache=cache, bypass=bypass, **data)
+
+    def cache_key(self, messages, tools=None) -> str:
+        """Build the stable cache key for a request."""
+        request = self.describe_request(messages, tools)
+        encoded = json.dumps(request, sort_keys=True, default=str)
+        return "llm:" + hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _cacheable(self, available_functions, response_model) -> bool:
+        return not available_functions and response_model is None
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        kwargs = dict(
+            tools=tools, callbacks=callbacks, available_functions=available_functions,
+            from_task=from_task, from_agent=from_agent, response_model=response_model,
+        )
+        if not self._cacheable(available_functions, response_model):
+            return self._forward(messages, **kwargs)
+
+        key = self.cache_key(messages, tools)
+        if not self.bypass:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for {self.model}")
+                mark(cache_hit=True)
+                return cached
+
+        mark(cache_hit=False)
+        response = self._forward(messages, **kwargs)
+        self._store(key, response)
+        return response
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        kwargs = dict(
+            tools=tools, callbacks=callbacks, available_functions=available_functions,
+            from_task=from_task, from_agent=from_agent, response_model=response_model,
+        )
+        if not self._cacheable(available_functions, response_model):
+            return await self._aforward(messages, **kwargs)
+
+        key = self.cache_key(messages, tools)
+        if not self.bypass:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for {self.model}")
+                mark(cache_hit=True)
+                return cached
+
+        mark(cache_hit=False)
+        response = await self._aforward(messages, **kwargs)
+        self._store(key, response)
+        return response
+
+    call._crewai_rate_limit_wrapped = True
+    acall._crewai_rate_limit_wrapped = True
+
+    def _store(self, key: str, response: Any) -> None:
+        if not response or not isinstance(response, (str, list)):
+            return
+        try:
+            self.cache.set(key, response)
+        except Exception as e:
+            # A broken cache must never fail the LLM call itself
+            logger.warning(f"Failed to store LLM response in cache: {e}")
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and hit rate for the response cache."""
+        return self.cache.stats()
+
+
+# Rough characters-per-token ratio used to estimate request size
+CHARS_PER_TOKEN = 4
+
+
+class ResilientLLM(LLMLayer):
+    """LLM layer that applies client-side load control to every call.
+
+    Calls go through a ``rate_control.LoadController``, usually the shared
+    one from ``get_bedrock_controller()``. It applies the request and token
+    rate limits and the AIMD concurrency limit, retries throttled or
+    transient failures with jittered backoff, and fails fast while its
+    circuit is open. Prompt tokens are estimated from the serialized messages
+    and charged before each attempt. Completion tokens are charged once the
+    response arrives.
+
+    Args:
+        inner: The LLM to protect
+        controller: Load controller shared by all LLMs calling the same endpoint
+    """
+
+    controller: Any = None
+
+    def __init__(self, inner: BaseLLM, controller: LoadController, **data: Any):
+        super().__init__(inner, controller=controller, **data)
+
+    @staticmethod
+    def estimate_tokens(value: Any) -> int:
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        return len(text) // CHARS_PER_TOKEN + 1
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        return self.controller.call(
+            lambda: self._forward(
+                messages, tools=tools, callbacks=callbacks,
+                available_functions=available_functions, from_task=from_task,
+                from_agent=from_agent, response_model=response_model,
+            ),
+            estimated_tokens=self.estimate_tokens(messages),
+            completion_tokens=self.estimate_tokens,
+        )
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        return await self.controller.acall(
+            lambda: self._aforward(
+                messages, tools=tools, callbacks=callbacks,
+                available_functions=available_functions, from_task=from_task,
+                from_agent=from_agent, response_model=response_model,
+            ),
+            estimated_tokens=self.estimate_tokens(messages),
+            completion_tokens=self.estimate_tokens,
+        )
+
+    call._crewai_rate_limit_wrapped = True
+    acall._crewai_rate_limit_wrapped = True
+
+    def control_metrics(self) -> Dict[str, Any]:
+        """Return the load controller's counters and limiter, bucket and breaker state."""
+        return self.controller.metrics()
+
+
+class RoutedLLM(LLMLayer):
+    """LLM layer that spreads calls over one LLM per region or endpoint.
+
+    An ``region_router.EndpointRouter`` picks the endpoint for each call from
+    its observed latency and error rate. The router fails over to the next
+    endpoint on transient errors and, when ``hedge`` is set, sends a
+    duplicate request once a call runs past the endpoint's p95 latency. The
+    first routed LLM is used as ``inner`` for the mirrored settings.
+    Hedging is skipped for streaming LLMs, because both requests would emit
+    chunks.
+
+    Args:
+        routes: LLM for each endpoint name known to the router
+        router: Router shared by all LLMs using the same endpoints
+        hedge: Send hedged duplicate requests to slow endpoints
+    """
+
+    routes: Dict[str, Any] = {}
+    router: Any = None
+    hedge: bool = False
+
+    def __init__(self, routes: Dict[str, BaseLLM], router: EndpointRouter,
+                 hedge: bool = False, **data: Any):
+        super().__init__(
+            next(iter(routes.values())), routes=routes, router=router, hedge=hedge, **data
+        )
+
+    def _hedging(self) -> bool:
+        return self.hedge and not self.stream
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        stop = self.stop_sequences
+
+        def request(name):
+            llm = self.routes[name]
+            with call_stop_override(llm, stop):
+                return llm.call(
+                    messages, tools=tools, callbacks=callbacks,
+                    available_functions=available_functions, from_task=from_task,
+                    from_agent=from_agent, response_model=response_model,
+                )
+
+        return self.router.call(request, hedge=self._hedging())
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        stop = self.stop_sequences
+
+        async def request(name):
+            llm = self.routes[name]
+            with call_stop_override(llm, stop):
+                return await llm.acall(
+                    messages, tools=tools, callbacks=callbacks,
+                    available_functions=available_functions, from_task=from_task,
+                    from_agent=from_agent, response_model=response_model,
+                )
+
+        return await self.router.acall(request, hedge=self._hedging())
+
+    call._crewai_rate_limit_wrapped = True
+    acall._crewai_rate_limit_wrapped = True
+
+    def routing_metrics(self) -> Dict[str, Any]:
+        """Return the router's per-endpoint latency, error and hedging metrics."""
+        return self.router.metrics()
+
+
+def _call_context(from_task, from_agent) -> Dict[str, Any]:
+    return {
+        "task_id": str(from_task.id) if from_task is not None else None,
+        "agent": getattr(from_agent, "role", None),
+    }
+
+
+class TimedLLM(LLMLayer):
+    """LLM layer that records each call in the current run's timeline.
+
+    Used as the outermost layer of an agent's LLM, so the recorded time
+    includes load control, routing and cache lookups. Outside
+    ``run_timing.record_timeline`` it only forwards calls.
+
+    Args:
+        inner: The LLM to time
+    """
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        with timed("llm", self.model, **_call_context(from_task, from_agent)):
+            return self._forward(
+                messages, tools=tools, callbacks=callbacks,
+                available_functions=available_functions, from_task=from_task,
+                from_agent=from_agent, response_model=response_model,
+            )
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        with timed("llm", self.model, **_call_context(from_task, from_agent)):
+            return await self._aforward(
+                messages, tools=tools, callbacks=callbacks,
+                available_functions=available_functions, from_task=from_task,
+                from_agent=from_agent, response_model=response_model,
+            )
+
+    call._crewai_rate_limit_wrapped = True
+    acall._crewai_rate_limit_wrapped = True
+
+
+def timed_llm(llm: BaseLLM) -> BaseLLM:
+    """Wrap ``llm`` in a TimedLLM unless it already is one."""
+    return llm if isinstance(llm, TimedLLM) else TimedLLM(llm)
+
+
+class BudgetedLLM(LLMLayer):
+    """LLM layer that counts an agent's calls against the run's loop budget.
+
+    Once the run or the calling agent has exhausted its budget (see
+    run_budget.py), the agent's next call is its last: with tools, it is sent
+    without them and with an instruction to give its final answer, which ends
+    the agent's loop with the best answer it can give; a tool-less agent's
+    call is sent as it is. Calls after that raise
+    ``run_budget.BudgetExhausted``. The same happens when the call could take
+    the run past its cost ceiling, priced as the estimated prompt plus a full
+    ``max_tokens`` completion; once the ceiling has been reached, calls raise
+    ``run_budget.CostCeilingExceeded`` instead of being sent. Outside
+    ``run_budget.enforce_budget`` it only forwards calls.
+
+    Args:
+        inner: The LLM to budget
+        scope: Budget the calls count against (a ``run_budget.agent_scope``);
+            the calling agent's role if None
+    """
+
+    scope: Optional[str] = None
+
+    @staticmethod
+    def without_tool_turns(messages):
+        """Rewrite tool calls and results as plain text turns.
+
+        Some providers (Bedrock) re-declare the tools found in the history,
+        which would let the final call search again.
+        """
+        flattened = []
+        for message in messages:
+            if message.get("tool_calls"):
+                calls = ", ".join(
+                    f"{call['function']['name']}({call['function']['arguments']})"
+                    for call in message["tool_calls"]
+                )
+                message = {
+                    "role": "assistant",
+                    "content": f"{message.get('content') or ''}\nCalled {calls}".strip(),
+                }
+            elif message.get("role") == "tool":
+                message = {
+                    "role": "user",
+                    "content": f"Result of {message.get('name', 'tool')}: {message.get('content')}",
+                }
+            # Consecutive turns of one role are merged (several results in a row)
+            if flattened and flattened[-1]["role"] == message["role"] != "system":
+                merged = f"{flattened[-1].get('content') or ''}\n\n{message.get('content') or ''}"
+                flattened[-1] = {"role": message["role"], "content": merged}
+            else:
+                flattened.append(message)
+        return flattened
+
+    def _budget_call(self, messages, tools, from_agent):
+        """Count the call and, once the budget is exhausted, make it the agent's final one."""
+        budget = current_budget()
+        if budget is None:
+            return None, None, messages, tools
+        role = self.scope or (getattr(from_agent, "role", None) or "").lower() or None
+        budget.bind_agent(getattr(from_agent, "id", None), role)
+        spent = budget.cost_exceeded(role)
+        if spent:
+            raise CostCeilingExceeded(f"Cost ceiling reached ({spent}), no more LLM calls")
+        reason = budget.exhausted(role)
+        if reason is None and tools:
+            next_cost = call_cost(
+                self.model, ResilientLLM.estimate_tokens(messages), self.max_tokens or LLM_MAX_TOKENS
+            )["total"]
+            reason = budget.cost_exceeded(role, next_cost)
+        if reason and budget.final_answer_forced(role):
+            raise BudgetExhausted(f"Loop budget exhausted ({reason}) after the final answer call")
+        if reason:
+            logger.warning(f"Loop budget exhausted ({reason}), asking for the final answer")
+            budget.force_final_answer(role, reason)
+        if reason and tools:
+            if isinstance(messages, str):
+                messages = [{"role": "user", "content": messages}]
+            messages = self.without_tool_turns(
+                [*messages, {"role": "user", "content": FINAL_ANSWER_PROMPT}]
+            )
+            tools = None
+        budget.add_llm_call(role, ResilientLLM.estimate_tokens(messages))
+        return budget, role, messages, tools
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        budget, role, messages, tools = self._budget_call(messages, tools, from_agent)
+        response = self._forward(
+            messages, tools=tools, callbacks=callbacks,
+            available_functions=available_functions, from_task=from_task,
+            from_agent=from_agent, response_model=response_model,
+        )
+        if budget is not None:
+            budget.add_tokens(role, ResilientLLM.estimate_tokens(response))
+        return response
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        budget, role, messages, tools = self._budget_call(messages, tools, from_agent)
+        response = await self._aforward(
+            messages, tools=tools, callbacks=callbacks,
+            available_functions=available_functions, from_task=from_task,
+            from_agent=from_agent, response_model=response_model,
+        )
+        if budget is not None:
+            budget.add_tokens(role, ResilientLLM.estimate_tokens(response))
+        return response
+
+    call._crewai_rate_limit_wrapped = True
+    acall._crewai_rate_limit_wrapped = True
+
+
+def budgeted_llm(llm: BaseLLM, scope: Optional[str] = None) -> BaseLLM:
+    """Wrap ``llm`` in a BudgetedLLM counting against ``scope``, unless it already is one."""
+    if isinstance(llm, BudgetedLLM):
+        if scope is None or llm.scope == scope:
+            return llm
+        llm = llm.inner
+    return BudgetedLLM(llm, scope=scope)
+
+
+class CassetteLLM(LLMLayer):
+    """LLM layer that records calls to a cassette or replays them from it.
+
+    When the cassette is replaying, responses come from the cassette and the
+    wrapped LLM is never called; a request the cassette does not hold raises
+    ``cassette.CassetteMismatch``. Structured responses are rebuilt as the
+    call's ``response_model``. Replayed streaming calls return the whole
+    text at once without emitting chunks.
+
+    Args:
+        inner: The LLM to record
+        cassette: Cassette to record to or replay from
+    """
+
+    cassette: Any = None
+
+    def __init__(self, inner: BaseLLM, cassette: Cassette, **data: Any):
+        super().__init__(inner, cassette=cassette, **data)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        return self.cassette.play(
+            "llm",
+            self.describe_request(messages, tools),
+            lambda: self._forward(
+                messages, tools=tools, callbacks=callbacks,
+                available_functions=available_functions, from_task=from_task,
+                from_agent=from_agent, response_model=response_model,
+            ),
+            response_model=response_model,
+        )
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        return await self.cassette.aplay(
+            "llm",
+            self.describe_request(messages, tools),
+            lambda: self._aforward(
+                messages, tools=tools, callbacks=callbacks,
+                available_functions=available_functions, from_task=from_task,
+                from_agent=from_agent, response_model=response_model,
+            ),
+            response_model=response_model,
+        )
+
+    call._crewai_rate_limit_wrapped = True
+    acall._crewai_rate_limit_wrapped = True
+
+
+def cassette_llm(llm: BaseLLM) -> BaseLLM:
+    """Wrap ``llm`` in a CassetteLLM for the active cassette, if there is one."""
+    cassette = get_cassette()
+    if cassette is None or isinstance(llm, CassetteLLM):
+        return llm
+    return CassetteLLM(llm, cassette)
+
+
+_llm_cache: Optional[DiskCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> DiskCache:
+    """Return the process-wide LLM response cache, opening it on first use."""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = DiskCache(
+                LLM_CACHE_PATH,
+                max_entries=LLM_CACHE_MAX_ENTRIES,
+                max_bytes=LLM_CACHE_MAX_BYTES,
+                default_ttl=LLM_CACHE_TTL_SECONDS,
+            )
+            logger.info(f"LLM response cache opened at {LLM_CACHE_PATH}")
+        return _llm_cache
@@ -0,0 +1,122 @@
+"""Per-agent LLM profiles and per-request overrides.
+
+Each agent role has its own profile (model, temperature, max_tokens), so the
+researcher's many short tool-selection turns can run on a faster model than
+the reviewer's synthesis. A profile without an explicit ``max_tokens`` gets
+one sized from the output length expected for the role.
+
+Overrides passed through the run API are either flat (applied to every
+role) or keyed by role; role-specific values win::
+
+    {"temperature": 0.0, "reviewer": {"model": "bedrock/amazon.nova-premier-v1:0"}}
+"""
+import math
+from typing import Any, Dict, Optional
+from config import LLM_MAX_TOKENS, LLM_MAX_TOKENS_HEADROOM, LLM_PROFILES
+
+AGENT_ROLES = tuple(LLM_PROFILES)
+
+# Settings an override may change, with the type each value is coerced to
+OVERRIDE_KEYS = {
+    "model": str,
+    "temperature": float,
+    "max_tokens": int,
+    "expected_output_tokens": int,
+}
+
+# max_tokens is rounded up to a multiple of this
+MAX_TOKENS_STEP = 256
+
+
+def size_max_tokens(
+    expected_output_tokens: int,
+    headroom: float = LLM_MAX_TOKENS_HEADROOM,
+    cap: int = LLM_MAX_TOKENS,
+) -> int:
+    """Size max_tokens for an expected output length.
+
+    Args:
+        expected_output_tokens: Typical length of the role's longest response
+        headroom: Multiplier leaving room for longer than usual responses
+        cap: Upper limit (the model-wide LLM_MAX_TOKENS)
+
+    Returns:
+        int: ``expected * headroom`` rounded up to a multiple of 256, within ``cap``
+    """
+    wanted = math.ceil(expected_output_tokens * headroom / MAX_TOKENS_STEP) * MAX_TOKENS_STEP
+    return max(MAX_TOKENS_STEP, min(cap, wanted))
+
+
+def _coerce(settings: Dict[str, Any], where: str) -> Dict[str, Any]:
+    coerced = {}
+    for key, value in settings.items():
+        if key not in OVERRIDE_KEYS:
+            raise ValueError(
+                f"Unknown LLM setting '{key}' in {where}. "
+                f"Choose from: {', '.join(OVERRIDE_KEYS)}"
+            )
+        try:
+            coerced[key] = OVERRIDE_KEYS[key](value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for LLM setting '{key}' in {where}: {value!r}")
+    return coerced
+
+
+def normalize_overrides(overrides: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Expand flat and per-role overrides into settings for each role.
+
+    Args:
+        overrides: Flat settings, role-keyed settings, or both
+
+    Returns:
+        dict: Settings for each role that has any (roles without overrides are omitted)
+
+    Raises:
+        ValueError: If a role, setting or value is not recognised
+    """
+    if not overrides:
+        return {}
+    if not isinstance(overrides, dict):
+        raise ValueError("LLM overrides must be a JSON object")
+    shared = _coerce(
+        {key: value for key, value in overrides.items() if key not in AGENT_ROLES}, "overrides"
+    )
+    per_role = {}
+    for role in AGENT_ROLES:
+        settings = overrides.get(role) or {}
+        if not isinstance(settings, dict):
+            raise ValueError(f"LLM overrides for '{role}' must be a JSON object")
+        merged = {**shared, **_coerce(settings, f"'{role}' overrides")}
+        if merged:
+            per_role[role] = merged
+    return per_role
+
+
+def resolve_profile(role: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return the model settings for an agent role.
+
+    Args:
+        role: One of AGENT_ROLES
+        overrides: Run overrides, flat or keyed by role
+
+    Returns:
+        dict: ``model``, ``temperature`` and ``max_tokens``. An explicit
+            max_tokens wins; otherwise it is sized from the expected output length
+
+    Raises:
+        ValueError: If the role is unknown or the overrides are invalid
+    """
+    if role not in LLM_PROFILES:
+        raise ValueError(f"Unknown agent role '{role}'. Choose from: {', '.join(AGENT_ROLES)}")
+    role_overrides = normalize_overrides(overrides).get(role, {})
+    settings = {**LLM_PROFILES[role], **role_overrides}
+    if "expected_output_tokens" in role_overrides and "max_tokens" not in role_overrides:
+        # A new expected length re-sizes max_tokens even if the profile fixes it
+        settings["max_tokens"] = 0
+    return {
+        "model": settings["model"],
+        "temperature": settings["temperature"],
+        "max_tokens": (
+            settings.get("max_tokens") or size_max_tokens(settings["expected_output_tokens"])
+        ),
+    }
@@ -0,0 +1,424 @@
+"""Local offline document search for the multi-agent system.
+
+Builds a BM25 inverted index over a directory of text documents. Documents
+are split into passages, and each incremental build writes the new or changed
+files into an immutable segment whose postings are stored as NumPy arrays and
+memory-mapped at query time, so opening a large index is fast. Replaced or
+deleted files are tombstoned until their segment is merged away.
+
+Usage:
+    python local_index.py build [DOCS_DIR]
+    python local_index.py search "query terms"
+"""
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from config import (
+    LOCAL_DOCS_DIR,
+    LOCAL_INDEX_DIR,
+    LOCAL_INDEX_EXTENSIONS,
+    LOCAL_INDEX_PASSAGE_WORDS,
+    LOCAL_INDEX_MAX_SEGMENTS,
+)
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_FILE = "index.json"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_WORD_PATTERN = re.compile(r"\S+")
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+# Common English words that carry no retrieval signal
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has",
+    "have", "in", "into", "is", "it", "its", "of", "on", "or", "that", "the",
+    "their", "this", "to", "was", "were", "will", "with",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric terms without stopwords."""
+    return [term for term in _TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+def bm25_weights(
+    tfs: np.ndarray,
+    lengths: np.ndarray,
+    avgdl: float,
+    idf: float,
+    k1: float = BM25_K1,
+    b: float = BM25_B,
+) -> np.ndarray:
+    """Vectorized BM25 contribution of one term to each document.
+
+    Args:
+        tfs: Term frequency of the term in each document
+        lengths: Length (in terms) of each document
+        avgdl: Average document length in the collection
+        idf: Inverse document frequency of the term
+
+    Returns:
+        np.ndarray: Per-document score contribution
+    """
+    norm = k1 * (1.0 - b + b * lengths / max(avgdl, 1e-9))
+    return idf * tfs * (k1 + 1.0) / (tfs + norm)
+
+
+def bm25_idf(num_docs: int, df: int) -> float:
+    """BM25 inverse document frequency (always positive)."""
+    return math.log(1.0 + (num_docs - df + 0.5) / (df + 0.5))
+
+
+def split_passages(text: str, words_per_passage: int) -> List[Tuple[int, int]]:
+    """Split text into passages of roughly equal word counts.
+
+    Returns:
+        list: (start, end) character offsets of each passage
+    """
+    words = [match.span() for match in _WORD_PATTERN.finditer(text)]
+    passages = []
+    for i in range(0, len(words), words_per_passage):
+        chunk = words[i:i + words_per_passage]
+        passages.append((chunk[0][0], chunk[-1][1]))
+    return passages
+
+
+def read_document(path: str) -> str:
+    """Read a document as plain text, stripping markup from HTML files."""
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        text = f.read()
+    if path.lower().endswith((".html", ".htm")):
+        text = _TAG_PATTERN.sub(" ", text)
+    return text
+
+
+class Segment:
+    """An immutable, memory-mapped slice of the index.
+
+    Files:
+        terms.json: term -> [offset, count] into the postings arrays
+        postings_docs.npy / postings_tfs.npy: concatenated posting lists
+        lengths.npy: passage lengths in terms
+        passages.json: [path, start, end] for every passage
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, "terms.json"), encoding="utf-8") as f:
+            self.terms: Dict[str, List[int]] = json.load(f)
+        with open(os.path.join(path, "passages.json"), encoding="utf-8") as f:
+            self.passages: List[List[Any]] = json.load(f)
+        self.docs = np.load(os.path.join(path, "postings_docs.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "postings_tfs.npy"), mmap_mode="r")
+        self.lengths = np.load(os.path.join(path, "lengths.npy"))
+        self.deleted = np.zeros(len(self.passages), dtype=bool)
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return live (passage ids, term frequencies) for a term."""
+        entry = self.terms.get(term)
+        if entry is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        offset, count = entry
+        docs = np.asarray(self.docs[offset:offset + count])
+        tfs = np.asarray(self.tfs[offset:offset + count])
+        live = ~self.deleted[docs]
+        return docs[live], tfs[live]
+
+    @staticmethod
+    def write(path: str, passages: List[List[Any]], term_counts: List[Counter]) -> None:
+        """Write a new segment from passages and their term counts."""
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for passage_id, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                postings[term].append((passage_id, tf))
+
+        terms, docs, tfs = {}, [], []
+        for term in sorted(postings):
+            entries = postings[term]
+            terms[term] = [len(docs), len(entries)]
+            docs.extend(passage_id for passage_id, _ in entries)
+            tfs.extend(tf for _, tf in entries)
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "postings_docs.npy"), np.asarray(docs, dtype=np.int32))
+        np.save(os.path.join(path, "postings_tfs.npy"), np.asarray(tfs, dtype=np.float32))
+        np.save(
+            os.path.join(path, "lengths.npy"),
+            np.asarray([sum(counts.values()) for counts in term_counts], dtype=np.int32),
+        )
+        with open(os.path.join(path, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump(terms, f)
+        with open(os.path.join(path, "passages.json"), "w", encoding="utf-8") as f:
+            json.dump(passages, f)
+
+
+class LocalIndex:
+    """Incrementally built BM25 index over a directory of documents.
+
+    Args:
+        index_dir: Directory holding the manifest and segments
+        docs_dir: Directory of documents to index
+        extensions: File extensions to include
+        passage_words: Words per indexed passage
+        max_segments: Segment count above which a build merges all segments
+    """
+
+    def __init__(
+        self,
+        index_dir: str = LOCAL_INDEX_DIR,
+        docs_dir: Optional[str] = LOCAL_DOCS_DIR,
+        extensions: Tuple[str, ...] = LOCAL_INDEX_EXTENSIONS,
+        passage_words: int = LOCAL_INDEX_PASSAGE_WORDS,
+        max_segments: int = LOCAL_INDEX_MAX_SEGMENTS,
+    ):
+        self.index_dir = index_dir
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.passage_words = passage_words
+        self.max_segments = max_segments
+        self._lock = threading.RLock()
+        self._manifest = self._load_manifest()
+        # Searches resolve snippets against the directory the index was built from
+        self.docs_dir = docs_dir or self._manifest.get("docs_dir")
+        self._segments: Dict[str, Segment] = {}
+        self._open_segments()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        path = os.path.join(self.index_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {"version": 1, "next_segment": 1, "segments": [], "files": {}, "deleted": {}}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self) -> None:
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = os.path.join(self.index_dir, MANIFEST_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, path)
+
+    def _open_segments(self) -> None:
+        self._segments = {}
+        for name in self._manifest["segments"]:
+            segment = Segment(os.path.join(self.index_dir, name))
+            deleted = self._manifest["deleted"].get(name, [])
+            if deleted:
+                segment.deleted[np.asarray(deleted, dtype=np.int64)] = True
+            self._segments[name] = segment
+        live = sum(int((~s.deleted).sum()) for s in self._segments.values())
+        logger.debug(f"Opened local index with {len(self._segments)} segments, {live} passages")
+
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        found = {}
+        index_dir = os.path.abspath(self.index_dir)
+        for root, dirs, files in os.walk(self.docs_dir):
+            # Never index the index itself or hidden directories such as .git
+            dirs[:] = [
+                d for d in dirs
+                if not d.startswith(".") and os.path.abspath(os.path.join(root, d)) != index_dir
+            ]
+            for filename in files:
+                if filename.lower().endswith(self.extensions):
+                    path = os.path.join(root, filename)
+                    stat = os.stat(path)
+                    found[os.path.relpath(path, self.docs_dir)] = (stat.st_mtime, stat.st_size)
+        return found
+
+    def _tombstone(self, rel_path: str) -> None:
+        entry = self._manifest["files"].pop(rel_path)
+        start, end = entry["passages"]
+        deleted = self._manifest["deleted"].setdefault(entry["segment"], [])
+        deleted.extend(range(start, end))
+
+    def build(self) -> Dict[str, int]:
+        """Index new and changed documents and tombstone removed ones.
+
+        Returns:
+            dict: Counts of added, updated, removed and unchanged files
+
+        Raises:
+            ValueError: If no documents directory is configured
+        """
+        if not self.docs_dir or not os.path.isdir(self.docs_dir):
+            raise ValueError(f"Local documents directory not found: {self.docs_dir}")
+
+        with self._lock:
+            found = self._scan()
+            known = self._manifest["files"]
+            stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+
+            for rel_path in list(known):
+                if rel_path not in found:
+                    self._tombstone(rel_path)
+                    stats["removed"] += 1
+
+            changed = []
+            for rel_path, (mtime, size) in sorted(found.items()):
+                entry = known.get(rel_path)
+                if entry and entry["mtime"] == mtime and entry["size"] == size:
+                    stats["unchanged"] += 1
+                    continue
+                if entry:
+                    self._tombstone(rel_path)
+                    stats["updated"] += 1
+                else:
+                    stats["added"] += 1
+                changed.append((rel_path, mtime, size))
+
+            self._manifest["docs_dir"] = os.path.abspath(self.docs_dir)
+            if changed:
+                self._write_segment(changed)
+            if len(self._manifest["segments"]) > self.max_segments:
+                self._merge_segments()
+
+            self._save_manifest()
+            self._open_segments()
+            logger.info(f"Local index build complete: {stats}")
+            return stats
+
+    def _write_segment(self, files: List[Tuple[str, float, int]]) -> None:
+        name = f"seg_{self._manifest['next_segment']:06d}"
+        self._manifest["next_segment"] += 1
+
+        passages, term_counts = [], []
+        for rel_path, mtime, size in files:
+            text = read_document(os.path.join(self.docs_dir, rel_path))
+            first = len(passages)
+            for start, end in split_passages(text, self.passage_words):
+                counts = Counter(tokenize(text[start:end]))
+                if counts:
+                    passages.append([rel_path, start, end])
+                    term_counts.append(counts)
+            self._manifest["files"][rel_path] = {
+                "mtime": mtime,
+                "size": size,
+                "segment": name,
+                "passages": [first, len(passages)],
+            }
+
+        Segment.write(os.path.join(self.index_dir, name), passages, term_counts)
+        self._manifest["segments"].append(name)
+        logger.info(f"Wrote segment {name} with {len(passages)} passages from {len(files)} files")
+
+    def _merge_segments(self) -> None:
+        """Re-index every live file into a single segment."""
+        old_segments = list(self._manifest["segments"])
+        live_files = [
+            (rel_path, entry["mtime"], entry["size"])
+            for rel_path, entry in sorted(self._manifest["files"].items())
+        ]
+        self._manifest["segments"] = []
+        self._manifest["deleted"] = {}
+        self._manifest["files"] = {}
+        if live_files:
+            self._write_segment(live_files)
+        self._save_manifest()
+        self._segments = {}
+        for name in old_segments:
+            shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
+        logger.info(f"Merged {len(old_segments)} segments")
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Return the top passages for a query ranked by BM25.
+
+        Args:
+            query: Free-text query
+            top_k: Number of passages to return
+
+        Returns:
+            list: Results with path, score, and passage text as snippet
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            segments = list(self._segments.values())
+        if not terms or not segments:
+            return []
+
+        lengths = [s.lengths[~s.deleted] for s in segments]
+        num_docs = sum(len(seg_lengths) for seg_lengths in lengths)
+        if num_docs == 0:
+            return []
+        avgdl = float(sum(seg_lengths.sum() for seg_lengths in lengths)) / num_docs
+
+        scores = [np.zeros(len(s.passages), dtype=np.float32) for s in segments]
+        for term in terms:
+            postings = [s.postings(term) for s in segments]
+            df = sum(len(docs) for docs, _ in postings)
+            if df == 0:
+                continue
+            idf = bm25_idf(num_docs, df)
+            for segment, seg_scores, (docs, tfs) in zip(segments, scores, postings):
+                if len(docs):
+                    seg_scores[docs] += bm25_weights(tfs, segment.lengths[docs], avgdl, idf)
+
+        candidates = []
+        for segment, seg_scores in zip(segments, scores):
+            k = min(top_k, len(seg_scores))
+            if k == 0:
+                continue
+            top = np.argpartition(-seg_scores, k - 1)[:k]
+            candidates.extend((float(seg_scores[i]), segment, int(i)) for i in top if seg_scores[i] > 0)
+
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        return [self._result(segment, i, score) for score, segment, i in candidates[:top_k]]
+
+    def _result(self, segment: Segment, passage_id: int, score: float) -> Dict[str, Any]:
+        rel_path, start, end = segment.passages[passage_id]
+        try:
+            snippet = read_document(os.path.join(self.docs_dir, rel_path))[start:end]
+        except OSError:
+            snippet = ""
+        return {"path": rel_path, "score": round(score, 4), "snippet": " ".join(snippet.split())}
+
+
+_local_index: Optional[LocalIndex] = None
+_local_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalIndex:
+    """Return the process-wide local index, refreshing it on first use.
+
+    The first call runs an incremental build when LOCAL_DOCS_DIR is set, so
+    only documents added or changed since the last run are indexed.
+    """
+    global _local_index
+    with _local_index_lock:
+        if _local_index is None:
+            index = LocalIndex()
+            if LOCAL_DOCS_DIR:
+                index.build()
+            _local_index = index
+        return _local_index
+
+
+def main(argv=None):
+    """Command-line entry point to build or query the local index."""
+    parser = argparse.ArgumentParser(description="Build or query the local document index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Index new and changed documents")
+    build_parser.add_argument("docs_dir", nargs="?", default=LOCAL_DOCS_DIR)
+    search_parser = subparsers.add_parser("search", help="Query the index")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        print(json.dumps(LocalIndex(docs_dir=args.docs_dir).build(), indent=2))
+    else:
+        print(json.dumps(LocalIndex().search(args.query, top_k=args.top_k), indent=2))
+
+
+if __name__ == "__main__":
+    main()
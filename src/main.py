@@ -2,8 +2,6 @@
 
 Provides the orchestration of the CrewAI workflow with full LangFuse observability.
 """
-from langfuse import get_client
-from agents_and_tasks_v05 import crew
 from config import (
     validate_config,
     TRACE_NAME,
@@ -11,21 +9,50 @@ from config import (
     TRACE_SESSION_ID,
     TRACE_PROJECT_NAME,
     TRACE_TAGS,
+    TRACE_FLUSH_AT,
+    TRACE_FLUSH_INTERVAL_SECONDS,
+    TRACE_EXPORT_COMPRESSION,
+    TRACE_SPOOL_ENABLED,
+    RUN_TIMING_ENABLED,
+    LANGFUSE_PUBLIC_KEY,
+    LANGFUSE_SECRET_KEY,
+    LANGFUSE_HOST,
     PROJECT_NAME,
     VERSION,
+    BATCH_MAX_CONCURRENCY,
+    RESEARCH_MODE,
+    RESEARCH_MODES,
+    CHECKPOINT_ENABLED,
+    SPECULATIVE_SEARCH_ENABLED,
 )
 from logger import setup_logging, get_logger
+import argparse
+import contextlib
+import os
 import sys
 import json
+import time
+
+# crewai and langfuse are imported inside the functions that need them, so
+# `--help`, `--validate` and importing this module stay fast
 
 # Initialize logging
 setup_logging()
 logger = get_logger(__name__)
 
 
+_langfuse = None
+
+
 def init_langfuse():
     """Initialize Langfuse client with configuration validation.
-    
+
+    The client is created once per process with the export settings from
+    config.py (batch size, flush interval, compression) and ``mask_payload``
+    to cap the size of exported inputs and outputs. With the trace spool
+    enabled it exports to the local spool receiver, which forwards to
+    LANGFUSE_HOST in the background.
+
     Returns:
         Langfuse: Configured Langfuse client instance
         
@@ -33,12 +60,34 @@ def init_langfuse():
         ValueError: If required configuration is missing
         Exception: If Langfuse client initialization fails
     """
+    global _langfuse
+    if _langfuse is not None:
+        return _langfuse
     try:
         logger.info("Initializing Langfuse client...")
         validate_config()
-        client = get_client()
+        if TRACE_EXPORT_COMPRESSION and TRACE_EXPORT_COMPRESSION != "none":
+            # Read by the OTLP exporter Langfuse creates
+            os.environ.setdefault("OTEL_EXPORTER_OTLP_TRACES_COMPRESSION", TRACE_EXPORT_COMPRESSION)
+        from langfuse import Langfuse
+        from tracing import mask_payload
+
+        host, headers = LANGFUSE_HOST, None
+        if TRACE_SPOOL_ENABLED:
+            from trace_spool import start_trace_spool
+
+            host, headers = start_trace_spool()
+        _langfuse = Langfuse(
+            public_key=LANGFUSE_PUBLIC_KEY,
+            secret_key=LANGFUSE_SECRET_KEY,
+            host=host,
+            additional_headers=headers,
+            flush_at=TRACE_FLUSH_AT,
+            flush_interval=TRACE_FLUSH_INTERVAL_SECONDS,
+            mask=mask_payload,
+        )
         logger.info("Langfuse client initialized successfully")
-        return client
+        return _langfuse
     except ValueError as e:
         logger.error(f"Configuration validation failed: {e}")
         raise
@@ -47,7 +96,219 @@ def init_langfuse():
         raise
 
 
-def run():
+def _trace_metadata(**extra):
+    return {"project": TRACE_PROJECT_NAME, "version": VERSION, **extra}
+
+
+def _record_timing():
+    """Bind a run timeline for the crew about to run (see run_timing)."""
+    if not RUN_TIMING_ENABLED:
+        return contextlib.nullcontext()
+    from run_timing import record_timeline
+
+    return record_timeline()
+
+
+def _timing_stats(summary):
+    if not summary:
+        return {}
+    return {
+        "llm_seconds": summary["llm"]["seconds"],
+        "llm_calls": summary["llm"]["calls"],
+        "prompt_tokens": summary["llm"]["prompt_tokens"],
+        "completion_tokens": summary["llm"]["completion_tokens"],
+        "tool_seconds": summary["tools"]["seconds"],
+        "tool_calls": summary["tools"]["calls"],
+    }
+
+
+def _budget_stats(budget):
+    """Log the run's loop budget usage and return what is worth keeping on the trace."""
+    if budget is None:
+        return {}
+    summary = budget.summary()
+    logger.info(f"Loop budget usage: {summary}")
+    return {
+        "duplicate_tool_calls": summary["duplicate_tool_calls"],
+        "final_answers_forced": summary["final_answers_forced"],
+    }
+
+
+def _usage_stats(summary):
+    if not summary:
+        return {}
+    return {
+        "cost_usd": summary["cost_usd"],
+        "cost_by_agent": {agent: values["cost_usd"] for agent, values in summary["by_agent"].items()},
+    }
+
+
+def _output_stats(crew, result):
+    stats = dict(getattr(crew, "stats", None) or {})
+    stats["output_chars"] = len(str(result))
+    return stats
+
+
+def run_traced(crew, langfuse, question=None):
+    """Kick off a crew inside its own Langfuse trace.
+
+    Whether the run is traced is decided up front (``TRACE_SAMPLE_RATE``).
+    A run that was not sampled gets no spans; if it fails or is slow it is
+    still recorded afterwards as a summary trace tagged ``unsampled``.
+
+    Args:
+        crew: Crew instance to execute
+        langfuse: Initialized Langfuse client
+        question: Pre-supplied user question recorded on the trace, if any
+
+    Returns:
+        tuple: (crew result, Langfuse trace ID or None if the run was not traced)
+
+    Raises:
+        Exception: Any error raised by the crew, after it is recorded on the span
+    """
+    from tracing import should_sample
+
+    root_input = {"project": TRACE_PROJECT_NAME, "version": VERSION}
+    if question is not None:
+        root_input["question"] = question
+
+    if not should_sample():
+        return _run_unsampled(crew, langfuse, root_input)
+
+    # Create root span for the entire workflow
+    with langfuse.start_as_current_observation(
+        as_type="span",
+        name=TRACE_NAME,
+        input=root_input,
+    ) as root_span:
+        # Set trace-level metadata
+        root_span.update_trace(
+            user_id=TRACE_USER_ID,
+            session_id=TRACE_SESSION_ID,
+            metadata=_trace_metadata(sampled=True),
+            tags=TRACE_TAGS,
+        )
+
+        logger.info(f"Created Langfuse root span: {root_span.id}")
+        # Banners go to stderr so batch output on stdout stays valid JSON
+        print(f"\n{'='*60}", file=sys.stderr)
+        print(f"Starting {PROJECT_NAME}", file=sys.stderr)
+        print(f"Langfuse Trace ID: {root_span.id}", file=sys.stderr)
+        print(f"{'='*60}\n", file=sys.stderr)
+
+        # Create a span for the crew execution
+        with langfuse.start_as_current_observation(
+            as_type="span",
+            name="crew-execution",
+            input={"agents": ["researcher", "reviewer"]},
+        ) as crew_span:
+            from opentelemetry import trace
+            from run_budget import enforce_budget
+            from run_timing import finish_run
+            from usage_ledger import finish_usage, record_usage
+
+            timeline, ledger = None, None
+            try:
+                logger.info("Starting CrewAI workflow...")
+                started = time.perf_counter()
+                with _record_timing() as timeline, enforce_budget() as budget, record_usage() as ledger:
+                    result = crew.kickoff()
+                logger.info("CrewAI workflow completed successfully")
+                timing = finish_run(timeline, trace.get_current_span(), root_span.trace_id)
+                usage = finish_usage(ledger, root_span.trace_id)
+
+                # The output is recorded once, on the root span
+                stats = _output_stats(crew, result)
+                stats["duration_seconds"] = round(time.perf_counter() - started, 3)
+                stats.update(_timing_stats(timing))
+                stats.update(_budget_stats(budget))
+                stats.update(_usage_stats(usage))
+                logger.info(f"Run statistics: {stats}")
+                crew_span.update(metadata=stats)
+
+            except Exception as e:
+                logger.error(f"CrewAI workflow failed: {e}", exc_info=True)
+                finish_run(timeline, trace.get_current_span(), root_span.trace_id)
+                usage = finish_usage(ledger, root_span.trace_id)
+                if usage:
+                    root_span.update(metadata={"usage": usage})
+                crew_span.update(
+                    level="ERROR",
+                    status_message=str(e),
+                )
+                raise
+
+        # Update root span with final output and the run's usage ledger
+        root_span.update(output=str(result), metadata={"usage": usage} if usage else None)
+        logger.info("Workflow completed, updating root span")
+
+        return result, root_span.trace_id
+
+
+def _run_unsampled(crew, langfuse, root_input):
+    """Run a crew without spans, recording a summary trace if it fails or is slow."""
+    from run_budget import enforce_budget
+    from run_timing import finish_run
+    from tracing import keep_unsampled
+    from usage_ledger import finish_usage, record_usage
+
+    print(f"\n{'='*60}", file=sys.stderr)
+    print(f"Starting {PROJECT_NAME} (trace not sampled)", file=sys.stderr)
+    print(f"{'='*60}\n", file=sys.stderr)
+    started = time.perf_counter()
+    result, error, timeline, budget, ledger = None, None, None, None, None
+    try:
+        logger.info("Starting CrewAI workflow...")
+        with _record_timing() as timeline, enforce_budget() as budget, record_usage() as ledger:
+            result = crew.kickoff()
+        logger.info("CrewAI workflow completed successfully")
+    except Exception as e:
+        logger.error(f"CrewAI workflow failed: {e}", exc_info=True)
+        error = e
+    duration = time.perf_counter() - started
+    timing = finish_run(timeline)
+    budget_stats = _budget_stats(budget)
+    usage = finish_usage(ledger)
+
+    reason = keep_unsampled(duration, error)
+    trace_id = None
+    if reason:
+        with langfuse.start_as_current_observation(
+            as_type="span",
+            name=TRACE_NAME,
+            input=root_input,
+        ) as root_span:
+            root_span.update_trace(
+                user_id=TRACE_USER_ID,
+                session_id=TRACE_SESSION_ID,
+                metadata=_trace_metadata(
+                    sampled=False, kept_because=reason, duration_seconds=round(duration, 3)
+                ),
+                tags=[*TRACE_TAGS, "unsampled"],
+            )
+            if error is not None:
+                root_span.update(
+                    level="ERROR", status_message=str(error),
+                    metadata={"usage": usage} if usage else None,
+                )
+            else:
+                root_span.update(
+                    output=str(result),
+                    metadata={
+                        **_output_stats(crew, result), **_timing_stats(timing), **budget_stats,
+                        **_usage_stats(usage), "usage": usage,
+                    },
+                )
+            trace_id = root_span.trace_id
+        logger.info(f"Unsampled run recorded ({reason}): trace {trace_id}")
+
+    if error is not None:
+        raise error
+    return result, trace_id
+
+
+def run(mode=RESEARCH_MODE, resume=None, stream=False, llm_overrides=None):
     """Execute the multi-agent workflow with full observability.
     
     This function:
@@ -57,78 +318,78 @@ def run():
     4. Captures and logs results
     5. Handles errors gracefully
     
+    Args:
+        mode: Research mode, one of research_modes.RESEARCH_MODES
+        resume: ID of a checkpointed run to resume from its first
+            incomplete task
+        stream: Print agent tokens and researcher steps as they are generated
+        llm_overrides: Model settings for this run, flat or keyed by agent
+            role (see llm_profiles); a resumed run keeps its original ones
+
     Returns:
         dict or str: The final crew result
     """
     logger.info(f"Starting {PROJECT_NAME} v{VERSION}")
+    run_id = None
     
     try:
         # Initialize Langfuse
         langfuse = init_langfuse()
 
-        # Create root span for the entire workflow
-        with langfuse.start_as_current_observation(
-            as_type="span",
-            name=TRACE_NAME,
-            input={"project": TRACE_PROJECT_NAME, "version": VERSION},
-        ) as root_span:
-            # Set trace-level metadata
-            root_span.update_trace(
-                user_id=TRACE_USER_ID,
-                session_id=TRACE_SESSION_ID,
-                metadata={
-                    "project": TRACE_PROJECT_NAME,
-                    "version": VERSION,
-                },
-                tags=TRACE_TAGS,
+        from agents_and_tasks_v05 import get_agent_llms
+        from research_modes import CheckpointedResearch, build_runner
+        from run_store import RunStore
+
+        if resume or (mode == "standard" and CHECKPOINT_ENABLED):
+            store = RunStore()
+            record = (
+                store.load(resume) if resume
+                else store.create(mode, llm_overrides=llm_overrides)
+            )
+            run_id = record["run_id"]
+            print(f"Run ID: {run_id}")
+            llm = (
+                get_agent_llms(stream=True, overrides=record.get("llm_overrides"))
+                if stream else None
             )
+            runner = CheckpointedResearch(store, record, llm=llm)
+        elif mode == "standard" and not stream and not llm_overrides:
+            from agents_and_tasks_v05 import get_default_crew
 
-            logger.info(f"Created Langfuse root span: {root_span.id}")
-            print(f"\n{'='*60}")
-            print(f"Starting {PROJECT_NAME}")
-            print(f"Langfuse Trace ID: {root_span.id}")
-            print(f"{'='*60}\n")
-
-            # Create a span for the crew execution
-            with langfuse.start_as_current_observation(
-                as_type="span",
-                name="crew-execution",
-                input={"agents": ["researcher", "reviewer"]},
-            ) as crew_span:
-                try:
-                    logger.info("Starting CrewAI workflow...")
-                    result = crew.kickoff()
-                    logger.info("CrewAI workflow completed successfully")
-                    
-                    # Update crew span with output
-                    crew_span.update(output=str(result))
-                    
-                except Exception as e:
-                    logger.error(f"CrewAI workflow failed: {e}", exc_info=True)
-                    crew_span.update(
-                        level="ERROR",
-                        status_message=str(e),
-                    )
-                    raise
-
-            # Update root span with final output
-            root_span.update(output=str(result))
-            logger.info("Workflow completed, updating root span")
+            runner = get_default_crew()
+        else:
+            llm = get_agent_llms(stream=True, overrides=llm_overrides) if stream else None
+            runner = build_runner(mode, llm=llm, llm_overrides=llm_overrides)
+
+        if stream:
+            from streaming import ConsoleStreamSink, stream_to
+
+            sink = ConsoleStreamSink()
+            with stream_to(sink):
+                result, _ = run_traced(runner, langfuse)
+            if sink.first_token_seconds is not None:
+                logger.info(f"Time to first token: {sink.first_token_seconds:.2f}s")
+        else:
+            result, _ = run_traced(runner, langfuse)
 
         # Display results
         print(f"\n{'='*60}")
         print("FINAL RESULT")
         print(f"{'='*60}")
         
-        # Try to parse and pretty-print JSON if possible
-        try:
-            if isinstance(result, str):
-                result_dict = json.loads(result)
-                print(json.dumps(result_dict, indent=2))
-            else:
+        # Pretty-print the validated output, or JSON if the raw output parses
+        output = getattr(result, "pydantic", None)
+        if output is not None:
+            print(output.model_dump_json(indent=2))
+        else:
+            from research_modes import parse_json_output
+
+            result_dict = parse_json_output(str(result))
+            if result_dict is None:
+                logger.warning("Final result is not valid JSON, showing the raw output")
                 print(result)
-        except (json.JSONDecodeError, AttributeError):
-            print(result)
+            else:
+                print(json.dumps(result_dict, indent=2))
         
         print(f"{'='*60}\n")
         
@@ -143,8 +404,199 @@ def run():
         logger.error(f"Fatal error in workflow: {e}", exc_info=True)
         print(f"\n\nERROR: {e}")
         print("Check logs/app.log for detailed error information.")
+        if run_id:
+            print(f"Completed tasks were saved; resume with: python main.py --resume {run_id}")
+        sys.exit(1)
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments.
+
+    Args:
+        argv: Argument list (defaults to sys.argv[1:])
+
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description=f"{PROJECT_NAME} v{VERSION}")
+    parser.add_argument(
+        "--mode",
+        choices=RESEARCH_MODES,
+        default=RESEARCH_MODE,
+        help=f"Research topology to run (default: {RESEARCH_MODE})",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        help="Resume a failed run from its first incomplete task",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print agent output token by token as it is generated",
+    )
+    parser.add_argument(
+        "--model",
+        help="Model for every agent, e.g. bedrock/amazon.nova-lite-v1:0",
+    )
+    parser.add_argument("--researcher-model", help="Model for the researcher only")
+    parser.add_argument("--reviewer-model", help="Model for the reviewer only")
+    parser.add_argument("--temperature", type=float, help="Sampling temperature for every agent")
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        help="Maximum output tokens for every agent (default: sized per agent profile)",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Check the configuration and exit without running the agents",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Run every question in FILE (one per line, '-' for stdin) concurrently",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=BATCH_MAX_CONCURRENCY,
+        help=f"Maximum questions run at the same time (default: {BATCH_MAX_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="Write batch results as JSON to FILE instead of stdout",
+    )
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument(
+        "--record",
+        metavar="CASSETTE",
+        help="Record every LLM call, search and ask_user answer to CASSETTE",
+    )
+    cassette.add_argument(
+        "--replay",
+        metavar="CASSETTE",
+        help="Serve LLM calls, searches and answers from CASSETTE, without network access",
+    )
+    parser.add_argument(
+        "--fuzzy",
+        action="store_true",
+        help="With --replay, also match requests that differ in numbers, IDs or order",
+    )
+    return parser.parse_args(argv)
+
+
+def _log_cassette():
+    from cassette import get_cassette
+
+    cassette = get_cassette()
+    if cassette is not None:
+        logger.info(f"Cassette: {cassette.stats()}")
+
+
+def _log_run_metrics():
+    from structured_output import structured_output_metrics
+
+    metrics = structured_output_metrics()
+    if metrics["converted"]:
+        logger.info(f"Structured outputs: {metrics}")
+    if SPECULATIVE_SEARCH_ENABLED:
+        from prefetch import prefetch_metrics
+
+        logger.info(f"Speculative searches: {prefetch_metrics()}")
+
+
+def llm_overrides_from_args(args):
+    """Collect the model options given on the command line into LLM overrides.
+
+    Returns:
+        dict or None: Overrides in the llm_profiles format, or None if no option was given
+    """
+    overrides = {
+        key: value
+        for key, value in (
+            ("model", args.model),
+            ("temperature", args.temperature),
+            ("max_tokens", args.max_tokens),
+        )
+        if value is not None
+    }
+    if args.researcher_model:
+        overrides["researcher"] = {"model": args.researcher_model}
+    if args.reviewer_model:
+        overrides["reviewer"] = {"model": args.reviewer_model}
+    return overrides or None
+
+
+def main(argv=None):
+    """Command-line entry point: interactive run or concurrent batch."""
+    args = parse_args(argv)
+    if args.validate:
+        try:
+            validate_config()
+        except ValueError as e:
+            print(f"Configuration invalid: {e}")
+            sys.exit(1)
+        print("Configuration OK")
+        sys.exit(0)
+    if args.record or args.replay:
+        from cassette import use_cassette
+
+        use_cassette(
+            args.record or args.replay,
+            mode="record" if args.record else "replay",
+            match="fuzzy" if args.fuzzy else "strict",
+        )
+    if not args.batch:
+        result = run(
+            mode=args.mode,
+            resume=args.resume,
+            stream=args.stream,
+            llm_overrides=llm_overrides_from_args(args),
+        )
+        _log_cassette()
+        _log_run_metrics()
+        return result
+
+    from batch import read_questions, run_batch
+
+    # Only the JSON results go to stdout; crew output and messages go to stderr
+    try:
+        questions = read_questions(args.batch)
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run_batch(
+                questions,
+                max_concurrency=args.concurrency,
+                mode=args.mode,
+                llm_overrides=llm_overrides_from_args(args),
+            )
+    except KeyboardInterrupt:
+        logger.warning("Batch interrupted by user")
+        print("\n\nBatch interrupted by user.", file=sys.stderr)
+        sys.exit(0)
+    except Exception as e:
+        logger.error(f"Fatal error in batch: {e}", exc_info=True)
+        print(f"\n\nERROR: {e}", file=sys.stderr)
+        print("Check logs/app.log for detailed error information.", file=sys.stderr)
         sys.exit(1)
 
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"Batch results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    _log_cassette()
+    failed = sum(1 for item in results if item["status"] != "success")
+    print(
+        f"\n{len(results) - failed}/{len(results)} questions completed successfully",
+        file=sys.stderr,
+    )
+    sys.exit(1 if failed else 0)
+
 
 if __name__ == "__main__":
-    run()
+    main()
@@ -0,0 +1,174 @@
+"""Speculative web searches while the researcher waits on ask_user.
+
+The research flow is serial: the researcher asks the user, waits, and only
+then searches. When the user's question is already known (it was supplied
+up front, or the user answered a first ask_user call) a search for it can
+run during the wait. ``SearchPrefetcher`` starts one as soon as a
+clarifying question goes out; it runs through the cached research search
+tool, so it also warms the search cache.
+
+After the answer arrives the result is kept only if the answer stays on
+the question's topic. A researcher web search (``tools.PrefetchedSearchTool``)
+whose query is the same after ``tools.normalize_query`` is served from the
+speculative result, waiting for it if it is still in flight. Each result is
+served once; everything else goes to the search backend as before.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from config import SEARCH_BACKEND, SPECULATIVE_SEARCH_ENABLED
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Words that say nothing about a question's topic
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from",
+    "how", "in", "is", "it", "of", "on", "or", "the", "to", "what", "when",
+    "where", "which", "who", "why", "with",
+})
+# Answers made of these only confirm the question instead of changing it
+CONFIRMATIONS = frozenset({
+    "yes", "yeah", "no", "ok", "okay", "sure", "fine", "either", "any", "both",
+    "all", "please", "thanks", "correct", "right", "that", "this", "one",
+})
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+_metrics = {"started": 0, "served": 0, "discarded": 0, "failed": 0}
+_metrics_lock = threading.Lock()
+
+
+def _count(**increments: int) -> None:
+    with _metrics_lock:
+        for key, value in increments.items():
+            _metrics[key] += value
+
+
+def prefetch_metrics() -> Dict[str, int]:
+    """Return process-wide counters of speculative searches.
+
+    Returns:
+        dict: Searches ``started``, researcher searches ``served`` from them,
+            searches ``discarded`` because the answer changed the topic and
+            searches that ``failed``
+    """
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search-prefetch")
+        return _executor
+
+
+def content_terms(text: str) -> List[str]:
+    """Return the words of ``text`` that matter to a search, in order and without repeats.
+
+    Stopwords are dropped and plurals reduced, so "costs" matches "cost".
+    """
+    terms = []
+    for word in text.lower().split():
+        word = word.strip(".,;:!?\"'()[]")
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if word and word not in STOPWORDS and word not in terms:
+            terms.append(word)
+    return terms
+
+
+class SearchPrefetcher:
+    """Speculative searches for one run, shared by its ask_user and web search tools.
+
+    Args:
+        search: Runs one web search for a query
+        question: The user's question, if known before the first ask_user call
+    """
+
+    def __init__(self, search: Callable[[str], Any], question: Optional[str] = None):
+        self.search = search
+        self.question = question
+        # Keyed by normalized query
+        self._searches: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def on_ask(self, clarification: str) -> None:
+        """Start a search for the known question as a clarifying question goes out."""
+        if not self.question:
+            return
+        from tools import normalize_query
+
+        query = " ".join(self.question.split()).rstrip("?")
+        key = normalize_query(query)
+        with self._lock:
+            if key in self._searches:
+                return
+            self._searches[key] = _get_executor().submit(self.search, query)
+        _count(started=1)
+        logger.info(f"Speculative search started while waiting on the user: {query}")
+
+    def on_answer(self, answer: str) -> None:
+        """Keep the speculative searches only if the answer stays on the question's topic.
+
+        An answer that only confirms ("yes", "either") keeps them; one whose
+        terms have nothing in common with the question discards them. In
+        interactive runs the first answer is the question itself.
+        """
+        if not self.question:
+            self.question = answer
+            return
+        answer_terms = set(content_terms(answer)) - CONFIRMATIONS
+        if answer_terms and not answer_terms & set(content_terms(self.question)):
+            with self._lock:
+                discarded = len(self._searches)
+                self._searches.clear()
+            if discarded:
+                _count(discarded=discarded)
+                logger.info(f"Answer changed the topic, discarded {discarded} speculative search(es)")
+            self.question = answer
+
+    def take(self, query: str) -> Optional[Any]:
+        """Return the speculative result for ``query`` and forget it, or None.
+
+        Only a search for the same normalized query is served, and only once,
+        so a repeated search reaches the backend. Waits for the search if it
+        is still running; a failed search returns None.
+        """
+        from tools import normalize_query
+
+        with self._lock:
+            future = self._searches.pop(normalize_query(query), None)
+        if future is None:
+            return None
+        try:
+            result = future.result()
+        except Exception as e:
+            _count(failed=1)
+            logger.warning(f"Speculative search failed for '{query}': {e}")
+            return None
+        _count(served=1)
+        logger.info(f"Serving search '{query}' from a speculative search")
+        return result
+
+
+def make_search_prefetcher(question: Optional[str] = None) -> Optional[SearchPrefetcher]:
+    """Return a prefetcher for one run, or None when speculative search is off.
+
+    It is also off for local-only search and while replaying a cassette,
+    where searches cost nothing to wait for.
+    """
+    if not SPECULATIVE_SEARCH_ENABLED or SEARCH_BACKEND == "local":
+        return None
+    from cassette import replaying
+    from tools import get_research_search_tool
+
+    if replaying():
+        return None
+    search_tool = get_research_search_tool()
+    return SearchPrefetcher(lambda query: search_tool.run(search_query=query), question)
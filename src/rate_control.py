@@ -0,0 +1,518 @@
+"""Client-side load control for Bedrock calls.
+
+Bedrock answers overload with throttling errors. If every crew in a batch
+(or every service worker) keeps calling at full speed, these errors turn into
+failed runs. ``LoadController`` sits in front of each call and combines:
+
+- token buckets limiting requests and tokens per minute,
+- an AIMD concurrency limit that halves on throttling and grows back by one
+  after a run of successes,
+- exponential backoff with full jitter between retries of throttled or
+  transient failures,
+- a circuit breaker that fails fast while the endpoint keeps failing and
+  lets a single probe through once the reset timeout has passed.
+
+Errors are classified by their botocore error code, HTTP status or
+exception type, never by their message text. Throttling does not count
+toward the circuit breaker.
+
+All state is exposed through ``LoadController.metrics()``. The module has no
+CrewAI dependency; ``llm_layers.ResilientLLM`` applies it to the agents' LLM.
+"""
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from config import (
+    AWS_REGION,
+    BEDROCK_REQUESTS_PER_MINUTE,
+    BEDROCK_TOKENS_PER_MINUTE,
+    BEDROCK_MAX_RETRIES,
+    BEDROCK_BACKOFF_BASE_SECONDS,
+    BEDROCK_BACKOFF_MAX_SECONDS,
+    BEDROCK_MAX_CONCURRENCY,
+    BEDROCK_MIN_CONCURRENCY,
+    BEDROCK_CIRCUIT_FAILURE_THRESHOLD,
+    BEDROCK_CIRCUIT_RESET_SECONDS,
+)
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Error codes (botocore, AWS JSON protocol) and HTTP statuses of throttling
+THROTTLING_CODES = frozenset({
+    "ThrottlingException", "Throttling", "TooManyRequestsException",
+    "ServiceQuotaExceededException", "RequestLimitExceeded",
+})
+THROTTLING_STATUSES = frozenset({429})
+# Error codes and HTTP statuses of temporary endpoint failures worth retrying
+TRANSIENT_CODES = frozenset({
+    "ServiceUnavailableException", "ServiceUnavailable", "InternalServerException",
+    "InternalFailure", "ModelNotReadyException", "ModelTimeoutException", "RequestTimeout",
+})
+TRANSIENT_STATUSES = frozenset({408, 500, 502, 503, 504})
+# Exception class names for errors that carry no code or status, matched
+# against the class hierarchy so botocore, urllib3, requests, httpx and
+# LiteLLM need not be imported
+THROTTLING_TYPES = frozenset({"RateLimitError"})
+TRANSIENT_TYPES = frozenset({
+    "EndpointConnectionError", "ConnectionClosedError", "ConnectTimeoutError",
+    "ReadTimeoutError", "ConnectTimeout", "ReadTimeout", "TimeoutException",
+    "APIConnectionError", "APITimeoutError", "Timeout",
+})
+# Successful calls in a row after which the concurrency limit grows by one
+AIMD_INCREASE_AFTER = 5
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the endpoint while the circuit is open."""
+
+
+def _error_chain(error: BaseException) -> List[BaseException]:
+    """The error and the errors it was raised from, outermost first.
+
+    Clients often re-raise provider errors as generic ones (CrewAI's Bedrock
+    provider turns a ``ClientError`` into a ``RuntimeError``), so the code
+    is usually found on a cause.
+    """
+    chain: List[BaseException] = []
+    while error is not None and error not in chain and len(chain) < 10:
+        chain.append(error)
+        error = error.__cause__ or error.__context__
+    return chain
+
+
+def _error_code(error: BaseException) -> Tuple[Optional[str], Optional[int]]:
+    """Return the error code and HTTP status an exception carries, if any."""
+    code = status = None
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    elif response is not None:
+        status = getattr(response, "status_code", None)
+    status = getattr(error, "status_code", None) or status
+    return code, status if isinstance(status, int) else None
+
+
+def _classify(error: BaseException) -> Optional[str]:
+    """Return "throttling", "transient" or None for an error that should not be retried.
+
+    An error code or HTTP status anywhere in the chain decides; only errors
+    without one are classified by their exception type.
+    """
+    chain = _error_chain(error)
+    for e in chain:
+        code, status = _error_code(e)
+        if code in THROTTLING_CODES or status in THROTTLING_STATUSES:
+            return "throttling"
+        if code in TRANSIENT_CODES or status in TRANSIENT_STATUSES:
+            return "transient"
+        if code or status:
+            return None
+    for e in chain:
+        names = {cls.__name__ for cls in type(e).__mro__}
+        if names & THROTTLING_TYPES:
+            return "throttling"
+        if isinstance(e, (TimeoutError, ConnectionError)) or names & TRANSIENT_TYPES:
+            return "transient"
+    return None
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """Return True if an exception signals request or token throttling."""
+    return _classify(error) == "throttling"
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Return True if an exception is a throttling or temporary endpoint failure."""
+    return _classify(error) is not None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Return a full-jitter exponential backoff delay for a retry attempt (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate.
+
+    Args:
+        per_minute: Tokens added per minute, which is also the bucket's capacity
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` tokens and return how long to wait before using them.
+
+        The bucket may go negative, so concurrent callers queue up behind one
+        another instead of racing for the same refill.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited_seconds += wait
+            return wait
+
+    def charge(self, amount: float) -> None:
+        """Take tokens that were used without a reservation (e.g. completion tokens)."""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease.
+
+    Args:
+        initial: Starting limit
+        minimum: Lowest limit after decreases
+        maximum: Highest limit after increases
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: Optional[int] = None):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum or initial)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.in_flight = 0
+        self.decreases = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a free slot; return False if ``timeout`` expired first."""
+        with self._condition:
+            acquired = self._condition.wait_for(lambda: self.in_flight < self.limit, timeout)
+            if acquired:
+                self.in_flight += 1
+            return acquired
+
+    def try_acquire(self) -> bool:
+        """Take a free slot without waiting."""
+        with self._condition:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, throttled: bool = False) -> None:
+        """Free a slot and adjust the limit from the call's outcome."""
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self._successes = 0
+                new_limit = max(self.minimum, self.limit // 2)
+                if new_limit < self.limit:
+                    self.decreases += 1
+                    logger.warning(f"Bedrock concurrency limit lowered to {new_limit}")
+                self.limit = new_limit
+            else:
+                self._successes += 1
+                if self._successes >= AIMD_INCREASE_AFTER and self.limit < self.maximum:
+                    self._successes = 0
+                    self.limit += 1
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """Fail fast after repeated failures until the endpoint recovers.
+
+    Closed: calls pass. After ``failure_threshold`` consecutive failures it
+    opens and rejects calls for ``reset_seconds``. It then half-opens and
+    lets one probe through; a successful probe closes it again, a failed one
+    reopens it.
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit
+        reset_seconds: Time the circuit stays open before a probe
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Check that a call may proceed.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe in flight
+        """
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half-open"
+            if self.state == "closed" or (self.state == "half-open" and not self._probing):
+                self._probing = self.state == "half-open"
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(
+            f"Bedrock circuit is open after {self.failures} consecutive failures; "
+            f"retry in {retry_in:.0f}s"
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Bedrock circuit closed")
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    logger.warning(
+                        f"Bedrock circuit opened after {self.failures} consecutive failures"
+                    )
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """Give up a half-open probe slot without recording an outcome."""
+        with self._lock:
+            self._probing = False
+
+
+class LoadController:
+    """Rate limits, adaptive concurrency, retries and circuit breaking for one endpoint.
+
+    A limit of 0 disables the corresponding token bucket.
+
+    Args:
+        requests_per_minute: Request rate limit
+        tokens_per_minute: Token rate limit (prompt plus completion estimate)
+        max_retries: Retries of throttled or transient failures per call
+        backoff_base: Base delay of the exponential backoff in seconds
+        backoff_max: Maximum backoff delay in seconds
+        max_concurrency: Initial and maximum concurrent calls
+        min_concurrency: Lowest concurrency the limiter backs off to
+        failure_threshold: Consecutive failures that open the circuit
+        reset_seconds: Time the circuit stays open before a probe
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = BEDROCK_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = BEDROCK_TOKENS_PER_MINUTE,
+        max_retries: int = BEDROCK_MAX_RETRIES,
+        backoff_base: float = BEDROCK_BACKOFF_BASE_SECONDS,
+        backoff_max: float = BEDROCK_BACKOFF_MAX_SECONDS,
+        max_concurrency: int = BEDROCK_MAX_CONCURRENCY,
+        min_concurrency: int = BEDROCK_MIN_CONCURRENCY,
+        failure_threshold: int = BEDROCK_CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = BEDROCK_CIRCUIT_RESET_SECONDS,
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = AIMDLimiter(max_concurrency, min_concurrency, max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self._counters = {
+            "calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "throttled": 0,
+        }
+        self._backoff_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        """Reserve rate-limit budget for one attempt and return the wait needed."""
+        wait = self.requests.reserve(1) if self.requests else 0.0
+        if self.tokens and estimated_tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        return wait
+
+    def _retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Record a failed attempt and return the delay before retrying, or None to give up."""
+        throttled = is_throttling_error(error)
+        if throttled:
+            self._count("throttled")
+        if not is_transient_error(error):
+            self.breaker.release_probe()
+            return None
+        if throttled:
+            # The endpoint is up and answering; throttling is handled by the
+            # backoff and the concurrency limit, not by the breaker
+            self.breaker.release_probe()
+        else:
+            self.breaker.record_failure()
+        if attempt >= self.max_retries or self.breaker.state == "open":
+            return None
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+        self._count("retries")
+        with self._lock:
+            self._backoff_seconds += delay
+        logger.warning(
+            f"Bedrock call failed ({type(error).__name__}), "
+            f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+        )
+        return delay
+
+    def call(
+        self,
+        fn: Callable[[], Any],
+        estimated_tokens: int = 0,
+        completion_tokens: Callable[[Any], int] = lambda result: 0,
+    ) -> Any:
+        """Run ``fn`` under the rate limits, concurrency limit, retries and breaker.
+
+        Args:
+            fn: Performs one attempt of the call
+            estimated_tokens: Tokens charged to the token bucket per attempt
+            completion_tokens: Returns the tokens a result used beyond the estimate
+
+        Returns:
+            Any: ``fn``'s result
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            Exception: ``fn``'s last error once retries are exhausted or if it
+                is not retryable
+        """
+        self._count("calls")
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            wait = self._reserve(estimated_tokens)
+            if wait:
+                time.sleep(wait)
+            self.limiter.acquire()
+            throttled = False
+            try:
+                result = fn()
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    self._count("failed")
+                    raise
+            else:
+                self.breaker.record_success()
+                if self.tokens:
+                    self.tokens.charge(completion_tokens(result))
+                self._count("succeeded")
+                return result
+            finally:
+                self.limiter.release(throttled=throttled)
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        estimated_tokens: int = 0,
+        completion_tokens: Callable[[Any], int] = lambda result: 0,
+    ) -> Any:
+        """Asynchronous counterpart of ``call``; waits without blocking the event loop."""
+        self._count("calls")
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            wait = self._reserve(estimated_tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            while not self.limiter.try_acquire():
+                await asyncio.sleep(0.05)
+            throttled = False
+            try:
+                result = await fn()
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    self._count("failed")
+                    raise
+            else:
+                self.breaker.record_success()
+                if self.tokens:
+                    self.tokens.charge(completion_tokens(result))
+                self._count("succeeded")
+                return result
+            finally:
+                self.limiter.release(throttled=throttled)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return call counters and the current limiter, bucket and breaker state."""
+        with self._lock:
+            metrics: Dict[str, Any] = dict(self._counters)
+            metrics["backoff_seconds"] = round(self._backoff_seconds, 3)
+        metrics.update(
+            concurrency_limit=self.limiter.limit,
+            in_flight=self.limiter.in_flight,
+            concurrency_decreases=self.limiter.decreases,
+            circuit_state=self.breaker.state,
+            circuit_opened=self.breaker.times_opened,
+            circuit_rejected=self.breaker.rejected,
+        )
+        if self.requests:
+            metrics["requests_available"] = round(self.requests.available(), 1)
+            metrics["rate_wait_seconds"] = round(self.requests.waited_seconds, 3)
+        if self.tokens:
+            metrics["tokens_available"] = round(self.tokens.available(), 1)
+            metrics["token_wait_seconds"] = round(self.tokens.waited_seconds, 3)
+        return metrics
+
+
+_controllers: Dict[str, LoadController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_bedrock_controller(endpoint: str = AWS_REGION) -> LoadController:
+    """Return the process-wide controller shared by every LLM calling ``endpoint``.
+
+    Args:
+        endpoint: Region or endpoint name; each one is limited independently
+    """
+    with _controllers_lock:
+        if endpoint not in _controllers:
+            _controllers[endpoint] = LoadController()
+            logger.info(
+                f"Bedrock load control enabled for {endpoint} "
+                f"(rpm={BEDROCK_REQUESTS_PER_MINUTE}, tpm={BEDROCK_TOKENS_PER_MINUTE}, "
+                f"max_concurrency={BEDROCK_MAX_CONCURRENCY})"
+            )
+        return _controllers[endpoint]
+
+
+def bedrock_metrics() -> Dict[str, Dict[str, Any]]:
+    """Return the metrics of every controller created so far, keyed by endpoint."""
+    with _controllers_lock:
+        controllers = dict(_controllers)
+    return {endpoint: controller.metrics() for endpoint, controller in controllers.items()}
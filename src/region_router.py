@@ -0,0 +1,425 @@
+"""Latency-aware routing of LLM calls across Bedrock regions and endpoints.
+
+``BEDROCK_ENDPOINTS`` lists the regions (or named endpoint URLs) to use.
+``EndpointRouter`` keeps an exponentially weighted moving average (EWMA) of
+each endpoint's latency and error rate and sends every call to the
+endpoint with the best score. If that call fails with a transient error it
+fails over to the next endpoint. When hedging is enabled and a call is
+still running after the endpoint's p95 latency, a duplicate request goes to
+the next-best endpoint and whichever answers first wins.
+
+Statistics only change when an endpoint is called, so error rates decay
+over time and, periodically, one call probes the endpoint that has gone
+longest without one. A degraded endpoint thus gets back into rotation once
+it recovers.
+
+The module has no CrewAI dependency; ``llm_layers.RoutedLLM`` applies it to
+the agents' LLM, and ``bedrock_standin.py`` provides a local endpoint to
+route to in tests.
+"""
+import asyncio
+import contextvars
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+from config import (
+    AWS_REGION,
+    BEDROCK_ENDPOINTS,
+    BEDROCK_ROUTING_EWMA_ALPHA,
+    BEDROCK_ROUTING_ERROR_PENALTY,
+    BEDROCK_ROUTING_ERROR_HALF_LIFE_SECONDS,
+    BEDROCK_ROUTING_PROBE_SECONDS,
+    BEDROCK_HEDGE_ENABLED,
+    BEDROCK_HEDGE_PERCENTILE,
+    BEDROCK_HEDGE_MIN_SAMPLES,
+)
+from logger import get_logger
+from rate_control import CircuitOpenError, is_transient_error
+
+logger = get_logger(__name__)
+
+_REGION_PATTERN = re.compile(r"^[a-z]{2}(-[a-z]+)+-\d+$")
+# Latency samples kept per endpoint for the hedging percentile
+LATENCY_WINDOW = 200
+# Latency assumed for unmeasured endpoints while no endpoint has been measured
+UNMEASURED_LATENCY = 1.0
+
+
+class Endpoint(NamedTuple):
+    """A routing target: a name, the AWS region it signs for and an optional URL."""
+
+    name: str
+    region: str
+    url: Optional[str] = None
+
+
+def parse_endpoints(entries=BEDROCK_ENDPOINTS) -> List[Endpoint]:
+    """Parse ``BEDROCK_ENDPOINTS`` entries.
+
+    Each entry is either a region (``us-west-2``) or ``name=url``. A named
+    URL signs requests for ``name`` if it is a region, otherwise for
+    ``AWS_REGION``.
+
+    Args:
+        entries: Configured entries, in order of preference
+
+    Returns:
+        list: Endpoints, without duplicate names
+
+    Raises:
+        ValueError: If no endpoint is configured
+    """
+    endpoints: Dict[str, Endpoint] = {}
+    for entry in entries:
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, url = entry.partition("=")
+        name = name.strip()
+        region = name if _REGION_PATTERN.match(name) else AWS_REGION
+        endpoints.setdefault(name, Endpoint(name, region, url.strip() or None))
+    if not endpoints:
+        raise ValueError("BEDROCK_ENDPOINTS does not list any region or endpoint")
+    return list(endpoints.values())
+
+
+class EndpointStats:
+    """EWMA latency and error rate of one endpoint, plus recent latency samples.
+
+    Args:
+        alpha: EWMA smoothing factor (weight of the newest observation)
+        half_life: Seconds over which the error rate halves without calls (0 disables)
+    """
+
+    def __init__(self, alpha: float, half_life: float = 0.0):
+        self.alpha = alpha
+        self.half_life = half_life
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.updated = 0.0
+        self.probed = 0.0
+        self.samples: deque = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def current_error_rate(self, now: float) -> float:
+        """Return the EWMA error rate decayed over the time since the last call."""
+        if self.half_life <= 0 or not self.updated:
+            return self.error_rate
+        return self.error_rate * 0.5 ** ((now - self.updated) / self.half_life)
+
+    def record(self, seconds: float, ok: bool) -> None:
+        now = time.monotonic()
+        self.calls += 1
+        self.error_rate = (
+            self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.current_error_rate(now)
+        )
+        self.updated = now
+        if not ok:
+            self.errors += 1
+            return
+        self.samples.append(seconds)
+        self.latency = (
+            seconds if self.latency is None
+            else self.alpha * seconds + (1 - self.alpha) * self.latency
+        )
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+
+
+class EndpointRouter:
+    """Route calls to the endpoint with the lowest error-weighted EWMA latency.
+
+    Endpoints without a latency sample yet are scored at the average latency
+    of the measured ones; ties keep the configured order. An endpoint that
+    was never called is probed once (tried first by one call). After that,
+    every ``probe_seconds`` at most, the endpoint that has gone longest
+    without a call (if longer than ``probe_seconds``) is probed, so degraded
+    endpoints get measured again.
+
+    Args:
+        names: Endpoint names in order of preference
+        alpha: EWMA smoothing factor (weight of the newest observation)
+        error_penalty: How strongly the error rate inflates an endpoint's score
+        error_half_life: Seconds over which an idle endpoint's error rate halves
+        probe_seconds: Minimum interval between probes (0 disables probing)
+        hedge_percentile: Latency percentile after which a hedged request is sent
+        hedge_min_samples: Samples an endpoint needs before its calls are hedged
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        alpha: float = BEDROCK_ROUTING_EWMA_ALPHA,
+        error_penalty: float = BEDROCK_ROUTING_ERROR_PENALTY,
+        error_half_life: float = BEDROCK_ROUTING_ERROR_HALF_LIFE_SECONDS,
+        probe_seconds: float = BEDROCK_ROUTING_PROBE_SECONDS,
+        hedge_percentile: float = BEDROCK_HEDGE_PERCENTILE,
+        hedge_min_samples: int = BEDROCK_HEDGE_MIN_SAMPLES,
+    ):
+        if not names:
+            raise ValueError("EndpointRouter needs at least one endpoint")
+        self.names = list(names)
+        self.error_penalty = error_penalty
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.probe_seconds = probe_seconds
+        self.stats = {name: EndpointStats(alpha, error_half_life) for name in self.names}
+        self.failovers = 0
+        self.probes = 0
+        self._last_probe = time.monotonic()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=2 * len(self.names) + 2, thread_name_prefix="bedrock-route"
+        )
+
+    def score(self, name: str, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        stats = self.stats[name]
+        latency = stats.latency
+        if latency is None:
+            measured = [s.latency for s in self.stats.values() if s.latency is not None]
+            latency = sum(measured) / len(measured) if measured else UNMEASURED_LATENCY
+        return latency * (1 + self.error_penalty * stats.current_error_rate(now))
+
+    def ranked(self) -> List[str]:
+        """Return endpoint names from best to worst score, with a due probe first."""
+        now = time.monotonic()
+        with self._lock:
+            order = sorted(
+                self.names, key=lambda name: (self.score(name, now), self.names.index(name))
+            )
+            if self.probe_seconds <= 0 or len(order) < 2:
+                return order
+            stale = min(
+                order[1:], key=lambda name: max(self.stats[name].updated, self.stats[name].probed)
+            )
+            stats = self.stats[stale]
+            if stats.calls or stats.probed:
+                idle = now - max(stats.updated, stats.probed)
+                if now - self._last_probe < self.probe_seconds or idle < self.probe_seconds:
+                    return order
+                self._last_probe = now
+            stats.probed = now
+            self.probes += 1
+        logger.info(f"Probing Bedrock endpoint {stale}")
+        order.remove(stale)
+        return [stale] + order
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """Return how long to wait on ``name`` before hedging, or None if not measured enough."""
+        with self._lock:
+            stats = self.stats[name]
+            if len(stats.samples) < self.hedge_min_samples:
+                return None
+            return stats.percentile(self.hedge_percentile)
+
+    def _record(self, name: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.stats[name].record(seconds, ok)
+
+    def _timed(
+        self, name: str, fn: Callable[[str], Any], running: Optional[threading.Event] = None
+    ) -> Any:
+        if running is not None:
+            running.set()
+        started = time.perf_counter()
+        try:
+            result = fn(name)
+        except Exception:
+            self._record(name, time.perf_counter() - started, ok=False)
+            raise
+        self._record(name, time.perf_counter() - started, ok=True)
+        return result
+
+    def _submit(
+        self, name: str, fn: Callable[[str], Any], running: Optional[threading.Event] = None
+    ):
+        # Each request runs in a copy of the caller's context so context
+        # variables (stop-word overrides, stream sinks) follow it
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._timed, name, fn, running)
+
+    def _hedged(
+        self, name: str, remaining: List[str], delay: float, fn: Callable[[str], Any]
+    ) -> Any:
+        """Call ``name``, hedging with the first of ``remaining`` (removed once used).
+
+        The losing request is cancelled if it is still queued. A blocking
+        request already in flight cannot be interrupted; it runs to completion
+        in the background and its answer is discarded.
+        """
+        running = threading.Event()
+        primary = self._submit(name, fn, running)
+        # Time spent queued for a worker thread does not count toward the delay
+        running.wait()
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        backup = remaining.pop(0)
+        logger.info(f"Hedging Bedrock call: {name} exceeded {delay:.2f}s, also trying {backup}")
+        with self._lock:
+            self.stats[name].hedges += 1
+        hedge = self._submit(backup, fn)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is hedge:
+                            with self._lock:
+                                self.stats[backup].hedge_wins += 1
+                        return future.result()
+                    error = future.exception()
+        finally:
+            for future in pending:
+                future.cancel()
+        raise error
+
+    def call(self, fn: Callable[[str], Any], hedge: bool = BEDROCK_HEDGE_ENABLED) -> Any:
+        """Call ``fn(endpoint_name)`` on the best endpoint, failing over on transient errors.
+
+        Args:
+            fn: Performs the request against the named endpoint
+            hedge: Send a duplicate request to the next endpoint when the
+                first one is slower than its hedging percentile
+
+        Returns:
+            Any: Result of the first successful request
+
+        Raises:
+            Exception: The last error if every endpoint failed, or the first
+                error that is not worth retrying elsewhere
+        """
+        remaining = self.ranked()
+        error: Optional[BaseException] = None
+        while remaining:
+            name = remaining.pop(0)
+            delay = self.hedge_delay(name) if hedge and remaining else None
+            try:
+                if delay is None:
+                    return self._timed(name, fn)
+                return self._hedged(name, remaining, delay, fn)
+            except Exception as e:
+                if not (isinstance(e, CircuitOpenError) or is_transient_error(e)):
+                    raise
+                error = e
+                if remaining:
+                    with self._lock:
+                        self.failovers += 1
+                    logger.warning(f"Bedrock endpoint {name} failed ({e}); failing over")
+        raise error
+
+    async def _atimed(self, name: str, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await fn(name)
+        except asyncio.CancelledError:
+            # A hedged request that lost: its latency is at least the time it ran
+            self._record(name, time.perf_counter() - started, ok=True)
+            raise
+        except Exception:
+            self._record(name, time.perf_counter() - started, ok=False)
+            raise
+        self._record(name, time.perf_counter() - started, ok=True)
+        return result
+
+    async def _ahedged(
+        self, name: str, remaining: List[str], delay: float, fn: Callable[[str], Awaitable[Any]]
+    ) -> Any:
+        primary = asyncio.ensure_future(self._atimed(name, fn))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        backup = remaining.pop(0)
+        logger.info(f"Hedging Bedrock call: {name} exceeded {delay:.2f}s, also trying {backup}")
+        with self._lock:
+            self.stats[name].hedges += 1
+        hedge = asyncio.ensure_future(self._atimed(backup, fn))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            with self._lock:
+                                self.stats[backup].hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise error
+
+    async def acall(
+        self, fn: Callable[[str], Awaitable[Any]], hedge: bool = BEDROCK_HEDGE_ENABLED
+    ) -> Any:
+        """Asynchronous counterpart of ``call``; the losing hedged request is cancelled."""
+        remaining = self.ranked()
+        error: Optional[BaseException] = None
+        while remaining:
+            name = remaining.pop(0)
+            delay = self.hedge_delay(name) if hedge and remaining else None
+            try:
+                if delay is None:
+                    return await self._atimed(name, fn)
+                return await self._ahedged(name, remaining, delay, fn)
+            except Exception as e:
+                if not (isinstance(e, CircuitOpenError) or is_transient_error(e)):
+                    raise
+                error = e
+                if remaining:
+                    with self._lock:
+                        self.failovers += 1
+                    logger.warning(f"Bedrock endpoint {name} failed ({e}); failing over")
+        raise error
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return per-endpoint EWMA latency, error rate, p95 and hedging counters."""
+        now = time.monotonic()
+        with self._lock:
+            endpoints = {}
+            for name, stats in self.stats.items():
+                p95 = stats.percentile(95)
+                endpoints[name] = {
+                    "ewma_latency_seconds": (
+                        round(stats.latency, 3) if stats.latency is not None else None
+                    ),
+                    "ewma_error_rate": round(stats.current_error_rate(now), 3),
+                    "p95_seconds": round(p95, 3) if p95 is not None else None,
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "hedges": stats.hedges,
+                    "hedge_wins": stats.hedge_wins,
+                }
+            return {"failovers": self.failovers, "probes": self.probes, "endpoints": endpoints}
+
+
+_router: Optional[EndpointRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_endpoint_router() -> EndpointRouter:
+    """Return the process-wide router over the configured endpoints."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = EndpointRouter([endpoint.name for endpoint in parse_endpoints()])
+            logger.info(f"Bedrock routing across {', '.join(_router.names)}")
+        return _router
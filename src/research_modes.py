@@ -0,0 +1,597 @@
+"""Alternative research topologies for the multi-agent system.
+
+The standard crew runs one researcher followed by the reviewer. The runners
+here expose the same ``kickoff()`` entry point as a Crew, so ``run_traced``
+and the batch runner can execute them interchangeably. Runners that skip
+work publish a ``stats`` dict (LLM calls made and saved) after kickoff.
+"""
+import contextvars
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from crewai import Crew, Process
+from crewai.crews.crew_output import CrewOutput
+from agents_and_tasks_v05 import (
+    build_crew,
+    create_fast_task,
+    create_research_task,
+    create_researcher,
+    create_review_task,
+    create_reviewer,
+    make_research_tools,
+    resolve_llms,
+)
+from answer_providers import AutoAnswerProvider, CachedAnswerProvider, ConsoleAnswerProvider
+from config import (
+    RESEARCH_MODES,
+    ASK_USER_TIMEOUT_SECONDS,
+    ASK_USER_DEFAULT_ANSWER,
+    MAP_REDUCE_SUBQUESTIONS,
+    MAP_REDUCE_SEARCH_BUDGET,
+)
+from llm_layers import CachedLLM, timed_llm
+from logger import get_logger
+from prefetch import make_search_prefetcher
+from structured_output import repair_json
+from tools import (
+    BudgetedSearchTool,
+    CachedSearchTool,
+    make_ask_user_tool,
+    make_research_search_tools,
+)
+
+logger = get_logger(__name__)
+
+# Minimum provisional answer length the adaptive check accepts without review
+MIN_PROVISIONAL_ANSWER_CHARS = 80
+
+# Phrases suggesting the research is unsure, incomplete or contradictory
+_UNCERTAINTY_MARKERS = (
+    "conflicting", "contradict", "inconsistent", "disagree", "unclear",
+    "could not find", "couldn't find", "no information", "not enough information",
+    "unable to", "not sure",
+)
+
+_URL_PATTERN = re.compile(r"https?://[^\s)\]\"']+")
+_BULLET_PREFIX = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+def parse_json_output(text: str) -> Optional[Dict[str, Any]]:
+    """Parse a JSON object from agent output, tolerating code fences and prose.
+
+    Uses the same local repair as structured task outputs
+    (``structured_output.repair_json``).
+
+    Args:
+        text: Raw agent output
+
+    Returns:
+        dict or None: The parsed object, or None if no object could be parsed
+    """
+    return repair_json(text)[0]
+
+
+def _result_items(search_results: Any) -> List[Any]:
+    """Split a researcher's search_results field into individual findings."""
+    if isinstance(search_results, list):
+        return [item for item in search_results if item]
+    if isinstance(search_results, dict):
+        return [search_results]
+    if isinstance(search_results, str):
+        lines = (_BULLET_PREFIX.sub("", line).strip() for line in search_results.splitlines())
+        return [line for line in lines if line]
+    return []
+
+
+def _source_key(item: Any) -> str:
+    """Key used to recognise the same source reported by several researchers."""
+    if isinstance(item, dict):
+        for field in ("link", "url", "source"):
+            if item.get(field):
+                return str(item[field]).rstrip("/").lower()
+        item = json.dumps(item, sort_keys=True)
+    text = str(item)
+    match = _URL_PATTERN.search(text)
+    if match:
+        return match.group(0).rstrip("/.").lower()
+    return " ".join(text.lower().split())
+
+
+def merge_research_outputs(
+    question: str,
+    sub_questions: List[str],
+    outputs: List[Optional[str]],
+) -> Dict[str, Any]:
+    """Merge sub-researcher outputs into one research payload for the reviewer.
+
+    Args:
+        question: The clarified user question
+        sub_questions: Sub-questions, aligned with ``outputs``
+        outputs: Raw output of each sub-researcher (None if it failed)
+
+    Returns:
+        dict: Research JSON with deduplicated search results
+    """
+    queries, results, answers = [], [], []
+    seen = set()
+    for sub_question, output in zip(sub_questions, outputs):
+        if output is None:
+            continue
+        parsed = parse_json_output(output)
+        if parsed is None:
+            # Keep unparseable output as the sub-question's draft answer
+            answers.append(f"{sub_question}: {output.strip()}")
+            continue
+
+        query = parsed.get("search_query") or parsed.get("serper_query")
+        if query:
+            queries.append(str(query))
+        for item in _result_items(parsed.get("search_results") or parsed.get("serper_results")):
+            key = _source_key(item)
+            if key not in seen:
+                seen.add(key)
+                results.append(item)
+        if parsed.get("provisional_answer"):
+            answers.append(f"{sub_question}: {parsed['provisional_answer']}")
+
+    return {
+        "user_question": question,
+        "sub_questions": sub_questions,
+        "search_query": ", ".join(queries),
+        "search_results": results,
+        "provisional_answer": "\n\n".join(answers),
+    }
+
+
+class MapReduceResearch:
+    """Research a question with parallel sub-question researchers.
+
+    The clarified question is split into up to ``num_subquestions``
+    sub-questions, each researched concurrently by its own researcher with a
+    separate search budget. The merged, deduplicated findings are then handed
+    to the standard review task.
+
+    Args:
+        question: Pre-supplied user question; when None it is asked through
+            ``answer_provider``
+        answer_provider: Source of the user's question in interactive runs
+        num_subquestions: Maximum number of parallel researchers
+        search_budget: Searches allowed per researcher
+        llm: Already configured LLM, or mapping of role to LLM, to reuse
+            instead of creating them
+        llm_overrides: Per-request model settings, used when ``llm`` is None
+    """
+
+    def __init__(
+        self,
+        question: Optional[str] = None,
+        answer_provider=None,
+        num_subquestions: int = MAP_REDUCE_SUBQUESTIONS,
+        search_budget: int = MAP_REDUCE_SEARCH_BUDGET,
+        llm=None,
+        llm_overrides: Optional[Dict[str, Any]] = None,
+    ):
+        self.question = question
+        self.answer_provider = answer_provider or ConsoleAnswerProvider(
+            timeout=ASK_USER_TIMEOUT_SECONDS, default=ASK_USER_DEFAULT_ANSWER
+        )
+        self.num_subquestions = max(1, num_subquestions)
+        self.search_budget = search_budget
+        self.llms = resolve_llms(llm, llm_overrides)
+
+    def split_question(self, question: str) -> List[str]:
+        """Ask the LLM to split a question into independent sub-questions.
+
+        Falls back to the original question if the response is unusable.
+        """
+        if self.num_subquestions == 1:
+            return [question]
+        prompt = (
+            f"Split the following research question into at most {self.num_subquestions} "
+            "independent sub-questions that can be researched separately and together "
+            "cover the whole question. Reply with a JSON array of strings only.\n\n"
+            f"Question: {question}"
+        )
+        try:
+            planner = timed_llm(self.llms["researcher"])
+            response = planner.call([{"role": "user", "content": prompt}])
+            match = re.search(r"\[.*\]", str(response), re.DOTALL)
+            sub_questions = json.loads(match.group(0)) if match else []
+        except Exception as e:
+            logger.warning(f"Failed to split question, researching it whole: {e}")
+            return [question]
+
+        sub_questions = [str(sub).strip() for sub in sub_questions if str(sub).strip()]
+        return sub_questions[:self.num_subquestions] or [question]
+
+    def _research(self, sub_question: str) -> str:
+        tools = [
+            BudgetedSearchTool.wrap(search_tool, self.search_budget)
+            for search_tool in make_research_search_tools(sub_question)
+        ]
+        researcher = create_researcher(self.llms["researcher"], tools=tools)
+        crew = Crew(
+            agents=[researcher],
+            tasks=[create_research_task(researcher, sub_question)],
+            process=Process.sequential,
+            verbose=True
+        )
+        return str(crew.kickoff())
+
+    def kickoff(self):
+        """Run the map (parallel research) and reduce (review) phases.
+
+        Returns:
+            CrewOutput: Output of the review crew
+
+        Raises:
+            RuntimeError: If every sub-researcher failed
+        """
+        question = self.question or self.answer_provider.ask("What would you like to know?")
+        sub_questions = self.split_question(question)
+        logger.info(f"Researching {len(sub_questions)} sub-questions in parallel")
+
+        outputs: List[Optional[str]] = []
+        with ThreadPoolExecutor(
+            max_workers=len(sub_questions), thread_name_prefix="researcher"
+        ) as pool:
+            # Copy the context so sub-researchers stay inside the current trace
+            futures = [
+                pool.submit(contextvars.copy_context().run, self._research, sub_question)
+                for sub_question in sub_questions
+            ]
+            for sub_question, future in zip(sub_questions, futures):
+                try:
+                    outputs.append(future.result())
+                except Exception as e:
+                    logger.error(f"Sub-researcher failed for '{sub_question}': {e}")
+                    outputs.append(None)
+
+        if all(output is None for output in outputs):
+            raise RuntimeError("All sub-researchers failed")
+
+        merged = merge_research_outputs(question, sub_questions, outputs)
+        logger.info(
+            f"Merged {len(merged['search_results'])} unique findings "
+            f"from {len(sub_questions)} researchers"
+        )
+
+        reviewer = create_reviewer(self.llms["reviewer"])
+        review_crew = Crew(
+            agents=[reviewer],
+            tasks=[create_review_task(reviewer, json.dumps(merged, indent=2, default=str))],
+            process=Process.sequential,
+            verbose=True
+        )
+        return review_crew.kickoff()
+
+
+def _llm_calls(result) -> int:
+    """Number of LLM requests a crew kickoff made, from its usage metrics."""
+    return int(getattr(getattr(result, "token_usage", None), "successful_requests", 0) or 0)
+
+
+def assess_research(research: Optional[Dict[str, Any]]) -> List[str]:
+    """Cheaply check whether research output can skip the reviewer.
+
+    Args:
+        research: Parsed research JSON, or None if it could not be parsed
+
+    Returns:
+        list: Reasons the output needs review; empty when it looks complete
+    """
+    if research is None:
+        return ["research output is not valid JSON"]
+
+    issues = []
+    answer = str(research.get("provisional_answer") or "").strip()
+    if not answer:
+        issues.append("provisional answer is missing")
+    elif len(answer) < MIN_PROVISIONAL_ANSWER_CHARS:
+        issues.append("provisional answer is too short")
+    if not _result_items(research.get("search_results") or research.get("serper_results")):
+        issues.append("no search results were reported")
+    lowered = answer.lower()
+    if any(marker in lowered for marker in _UNCERTAINTY_MARKERS):
+        issues.append("provisional answer signals missing or contradictory evidence")
+    return issues
+
+
+def local_final_answer(research: Dict[str, Any], max_sources: int = 5) -> Dict[str, Any]:
+    """Turn complete research output into the reviewer's output schema.
+
+    Args:
+        research: Parsed research JSON that passed ``assess_research``
+        max_sources: Maximum number of search findings listed as sources
+
+    Returns:
+        dict: ``{"final_answer", "sources"}`` payload
+    """
+    sources = []
+    for item in _result_items(research.get("search_results") or research.get("serper_results")):
+        if isinstance(item, dict):
+            detail = item.get("link") or item.get("url") or item.get("title") or json.dumps(item)
+        else:
+            detail = str(item)
+        sources.append({"type": "serper", "detail": detail[:200], "role": "Supporting evidence"})
+        if len(sources) >= max_sources:
+            break
+    sources.append({"type": "user", "detail": "User query", "role": "Question definition"})
+    return {"final_answer": str(research["provisional_answer"]).strip(), "sources": sources}
+
+
+class FastResearch:
+    """Answer a question in a single agent pass, without a separate reviewer.
+
+    The researcher runs a task that asks for the reviewer's final
+    ``{final_answer, sources}`` schema directly.
+
+    Args:
+        question: Pre-supplied user question; when None the agent asks the user
+        answer_provider: Source of ask_user answers
+        llm: Already configured LLM, or mapping of role to LLM, to reuse
+            instead of creating them
+        llm_overrides: Per-request model settings, used when ``llm`` is None
+    """
+
+    def __init__(
+        self,
+        question: Optional[str] = None,
+        answer_provider=None,
+        llm=None,
+        llm_overrides: Optional[Dict[str, Any]] = None,
+    ):
+        llms = resolve_llms(llm, llm_overrides)
+        researcher = create_researcher(
+            llms["researcher"],
+            tools=make_research_tools(question, answer_provider),
+        )
+        self.crew = Crew(
+            agents=[researcher],
+            tasks=[create_fast_task(researcher, question)],
+            process=Process.sequential,
+            verbose=True
+        )
+        self.stats: Dict[str, Any] = {}
+
+    def kickoff(self):
+        """Run the single-pass crew.
+
+        Returns:
+            CrewOutput: Output with the final answer and sources
+        """
+        result = self.crew.kickoff()
+        self.stats = {
+            "mode": "fast",
+            "reviewer_invoked": False,
+            "llm_calls": _llm_calls(result),
+            "review_passes_skipped": 1,
+        }
+        logger.info(f"Fast mode made {self.stats['llm_calls']} LLM call(s) without a review pass")
+        return result
+
+
+class AdaptiveResearch:
+    """Run the researcher, and the reviewer only when the research needs it.
+
+    After the research task, ``assess_research`` checks the output without
+    calling the LLM. Complete output is converted to the final schema locally;
+    incomplete or contradictory output goes through the standard review task.
+
+    Args:
+        question: Pre-supplied user question; when None the agent asks the user
+        answer_provider: Source of ask_user answers
+        llm: Already configured LLM, or mapping of role to LLM, to reuse
+            instead of creating them
+        llm_overrides: Per-request model settings, used when ``llm`` is None
+    """
+
+    def __init__(
+        self,
+        question: Optional[str] = None,
+        answer_provider=None,
+        llm=None,
+        llm_overrides: Optional[Dict[str, Any]] = None,
+    ):
+        self.llms = resolve_llms(llm, llm_overrides)
+        researcher = create_researcher(
+            self.llms["researcher"],
+            tools=make_research_tools(question, answer_provider),
+        )
+        self.crew = Crew(
+            agents=[researcher],
+            tasks=[create_research_task(researcher, question)],
+            process=Process.sequential,
+            verbose=True
+        )
+        self.stats: Dict[str, Any] = {}
+
+    def kickoff(self):
+        """Run research, then review only if the cheap check fails.
+
+        Returns:
+            CrewOutput: Output with the final answer and sources
+        """
+        research_result = self.crew.kickoff()
+        research = parse_json_output(str(research_result))
+        issues = assess_research(research)
+        research_calls = _llm_calls(research_result)
+
+        if not issues:
+            final = local_final_answer(research)
+            self.stats = {
+                "mode": "adaptive",
+                "reviewer_invoked": False,
+                "llm_calls": research_calls,
+                "review_passes_skipped": 1,
+            }
+            logger.info(f"Adaptive mode skipped review after {research_calls} LLM call(s)")
+            return CrewOutput(
+                raw=json.dumps(final),
+                json_dict=final,
+                tasks_output=research_result.tasks_output,
+                token_usage=research_result.token_usage,
+            )
+
+        logger.info(f"Adaptive mode invoking reviewer: {'; '.join(issues)}")
+        reviewer = create_reviewer(self.llms["reviewer"])
+        review_crew = Crew(
+            agents=[reviewer],
+            tasks=[create_review_task(reviewer, str(research_result))],
+            process=Process.sequential,
+            verbose=True
+        )
+        result = review_crew.kickoff()
+        self.stats = {
+            "mode": "adaptive",
+            "reviewer_invoked": True,
+            "review_reasons": issues,
+            "llm_calls": research_calls + _llm_calls(result),
+            "review_passes_skipped": 0,
+        }
+        return result
+
+
+class CheckpointedResearch:
+    """Standard researcher -> reviewer run that checkpoints at task boundaries.
+
+    Each task runs in its own crew and its output is saved to the run store
+    as soon as it completes. LLM responses, search results and user answers
+    are cached in the run's own store, so when a failed run is resumed the
+    completed tasks are skipped and the first incomplete one replays the
+    work it had already done before the failure. The cache is deleted when
+    the run completes.
+
+    Args:
+        store: run_store.RunStore holding the run
+        run: Run record created or loaded by the store
+        answer_provider: Source of ask_user answers; defaults to the console,
+            or to auto-answering with the run's question when it has one
+        llm: Already configured LLM, or mapping of role to LLM, to reuse;
+            otherwise LLMs are created with the run's recorded overrides
+    """
+
+    TASKS = ("research", "review")
+
+    def __init__(self, store, run: Dict[str, Any], answer_provider=None, llm=None):
+        self.store = store
+        self.run = run
+        self.question = run.get("question")
+        self.cache = cache = store.tool_cache(run["run_id"])
+        if answer_provider is None:
+            answer_provider = (
+                AutoAnswerProvider(self.question) if self.question is not None
+                else ConsoleAnswerProvider(
+                    timeout=ASK_USER_TIMEOUT_SECONDS, default=ASK_USER_DEFAULT_ANSWER
+                )
+            )
+        self.llms = {
+            role: CachedLLM(role_llm, cache)
+            for role, role_llm in resolve_llms(llm, run.get("llm_overrides")).items()
+        }
+        prefetcher = make_search_prefetcher(self.question)
+        self.tools = [
+            make_ask_user_tool(CachedAnswerProvider(answer_provider, cache), prefetcher),
+            *[
+                CachedSearchTool.wrap(tool, cache)
+                for tool in make_research_search_tools(self.question, prefetcher)
+            ],
+        ]
+        self.stats: Dict[str, Any] = {}
+
+    def _research(self) -> str:
+        researcher = create_researcher(self.llms["researcher"], tools=self.tools)
+        crew = Crew(
+            agents=[researcher],
+            tasks=[create_research_task(researcher, self.question)],
+            process=Process.sequential,
+            verbose=True
+        )
+        return str(crew.kickoff())
+
+    def _review(self, research: str):
+        reviewer = create_reviewer(self.llms["reviewer"])
+        crew = Crew(
+            agents=[reviewer],
+            tasks=[create_review_task(reviewer, research)],
+            process=Process.sequential,
+            verbose=True
+        )
+        return crew.kickoff()
+
+    def kickoff(self):
+        """Run the tasks that have not completed yet.
+
+        Returns:
+            CrewOutput: Output of the review task
+
+        Raises:
+            Exception: The task's error, after the run is marked as failed
+        """
+        run_id = self.run["run_id"]
+        tasks = self.run["tasks"]
+        reused = [name for name in self.TASKS if name in tasks]
+        if reused:
+            logger.info(f"Resuming run {run_id}, reusing completed tasks: {', '.join(reused)}")
+
+        try:
+            if "research" not in tasks:
+                self.store.record_task(self.run, "research", self._research())
+            if "review" in tasks:
+                raw = tasks["review"]["output"]
+                result = CrewOutput(raw=raw, json_dict=parse_json_output(raw), tasks_output=[])
+            else:
+                result = self._review(tasks["research"]["output"])
+                self.store.record_task(self.run, "review", str(result))
+        except Exception as e:
+            self.store.mark(self.run, "failed", str(e))
+            raise
+
+        self.store.mark(self.run, "completed")
+        self.cache.close()
+        self.store.discard_tool_cache(run_id)
+        self.stats = {
+            "mode": "standard",
+            "run_id": run_id,
+            "attempt": self.run["attempts"],
+            "reused_tasks": reused,
+        }
+        return result
+
+
+def build_runner(
+    mode: str = "standard",
+    question: Optional[str] = None,
+    answer_provider=None,
+    llm=None,
+    llm_overrides: Optional[Dict[str, Any]] = None,
+):
+    """Build the crew or runner for a research mode.
+
+    Args:
+        mode: One of RESEARCH_MODES
+        question: Pre-supplied user question for headless runs
+        answer_provider: Source of ask_user answers
+        llm: Already configured LLM, or mapping of role to LLM, to reuse;
+            new ones are created from the agent profiles when None
+        llm_overrides: Per-request model settings, used when ``llm`` is None
+
+    Returns:
+        Crew or runner exposing ``kickoff()``
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    kwargs = dict(
+        question=question, answer_provider=answer_provider, llm=llm, llm_overrides=llm_overrides
+    )
+    if mode == "standard":
+        return build_crew(**kwargs)
+    if mode == "map-reduce":
+        return MapReduceResearch(**kwargs)
+    if mode == "fast":
+        return FastResearch(**kwargs)
+    if mode == "adaptive":
+        return AdaptiveResearch(**kwargs)
+    raise ValueError(f"Unknown research mode '{mode}'. Choose from: {', '.join(RESEARCH_MODES)}")
@@ -0,0 +1,359 @@
+"""Loop budgets for agent runs.
+
+Nothing in CrewAI's agent loop stops a researcher that keeps searching for
+near-identical queries or keeps asking the user. While a run is bound to a
+``RunBudget`` (``enforce_budget``), every agent LLM call (``llm_layers.BudgetedLLM``)
+and tool call (``tools.LoopGuardTool``) is counted against a run-wide budget
+and the calling agent's own budget: LLM calls, tool calls, estimated tokens
+and wall-clock seconds (``RUN_MAX_*`` and ``AGENT_BUDGETS``; 0 disables a
+limit). Budgets are opt-in (``RUN_BUDGET_ENABLED``). Every agent instance has
+its own budget (``agent_scope``), so each map-reduce sub-researcher gets the
+researcher limits to itself. Time spent waiting for the user's answer to
+ask_user (``waiting_for_user``) does not count against the deadlines.
+
+Once either budget is exhausted, tool calls return a notice instead of
+running, and the agent's next LLM call is its last: an agent with tools has
+them removed and is asked for the best final answer from what it already
+has, so the run degrades to that answer instead of failing. A tool-less agent
+such as the reviewer makes that call as it is. Any further LLM call of the
+agent raises ``BudgetExhausted``. Tool calls that repeat an
+earlier call of the run (same tool, same arguments up to case, spacing and
+surrounding punctuation) are answered with the earlier result instead of running again; they still
+count as tool calls, so a loop of repeats runs out of budget too.
+
+The run's spend is also held to ``RUN_MAX_COST_USD``, priced from the usage
+ledger (usage_ledger.py). An agent whose next tool-enabled call could take
+the run past the ceiling (its estimated prompt plus a full ``max_tokens``
+completion) gets its final answer call instead; once the ceiling has been
+reached, further LLM calls raise ``CostCeilingExceeded``.
+"""
+import contextvars
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set
+from config import (
+    AGENT_BUDGETS,
+    RUN_BUDGET_ENABLED,
+    RUN_DEADLINE_SECONDS,
+    RUN_MAX_COST_USD,
+    RUN_MAX_LLM_CALLS,
+    RUN_MAX_TOKENS,
+    RUN_MAX_TOOL_CALLS,
+)
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+_current_budget: contextvars.ContextVar[Optional["RunBudget"]] = contextvars.ContextVar(
+    "run_budget", default=None
+)
+
+FINAL_ANSWER_PROMPT = (
+    "You have used up the budget for this task. Do not call any more tools. "
+    "Give your best final answer now, using only the information you already have, "
+    "in the format the task asks for."
+)
+TOOL_BUDGET_NOTICE = (
+    "Tool budget exhausted ({reason}). Do not call any more tools; "
+    "give your final answer with the information you already have."
+)
+
+
+class CostCeilingExceeded(RuntimeError):
+    """The run has spent its ``RUN_MAX_COST_USD`` and may make no more LLM calls."""
+
+
+class BudgetExhausted(RuntimeError):
+    """An agent whose budget is exhausted made another call after its final one."""
+
+
+class Budget:
+    """Usage of one scope (the run or one agent) against its limits.
+
+    Args:
+        name: Scope name used in exhaustion reasons
+        max_llm_calls: LLM calls allowed (0 for no limit)
+        max_tool_calls: Tool calls allowed (0 for no limit)
+        max_tokens: Estimated prompt plus completion tokens allowed (0 for no limit)
+        deadline_seconds: Seconds from the scope's creation, less time spent
+            waiting for the user (0 for no limit)
+        max_cost_usd: Spend in USD allowed (0 for no limit); enforced by
+            ``RunBudget.cost_exceeded`` rather than ``exhausted``
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_llm_calls: int = 0,
+        max_tool_calls: int = 0,
+        max_tokens: int = 0,
+        deadline_seconds: float = 0,
+        max_cost_usd: float = 0,
+    ):
+        self.name = name
+        self.max_llm_calls = max_llm_calls
+        self.max_tool_calls = max_tool_calls
+        self.max_tokens = max_tokens
+        self.deadline_seconds = deadline_seconds
+        self.max_cost_usd = max_cost_usd
+        self.started = time.monotonic()
+        self.paused = 0.0
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.tokens = 0
+        self.cost_usd = 0.0
+
+    def exhausted(self) -> Optional[str]:
+        """Return why the budget is exhausted, or None if it is not."""
+        if self.max_llm_calls and self.llm_calls >= self.max_llm_calls:
+            return f"{self.name} made {self.llm_calls} LLM calls"
+        if self.max_tool_calls and self.tool_calls >= self.max_tool_calls:
+            return f"{self.name} made {self.tool_calls} tool calls"
+        if self.max_tokens and self.tokens >= self.max_tokens:
+            return f"{self.name} used ~{self.tokens} tokens"
+        elapsed = time.monotonic() - self.started - self.paused
+        if self.deadline_seconds and elapsed >= self.deadline_seconds:
+            return f"{self.name} ran for {elapsed:.0f}s"
+        return None
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "llm_calls": self.llm_calls,
+            "tool_calls": self.tool_calls,
+            "tokens": self.tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "seconds": round(time.monotonic() - self.started, 3),
+        }
+
+
+def tool_call_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    """Key on which repeated tool calls are matched.
+
+    String arguments are reduced with ``tools.normalize_query``, which only
+    evens out case, spacing and surrounding punctuation: a reordered or
+    reworded query is a different search.
+    """
+    from tools import normalize_query
+
+    def normalize(value: Any) -> Any:
+        if isinstance(value, str):
+            return normalize_query(value)
+        if isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        return value
+
+    normalized = {name: normalize(value) for name, value in sorted(arguments.items())}
+    return tool_name + ":" + json.dumps(normalized, sort_keys=True, default=str)
+
+
+def agent_scope(role: str) -> str:
+    """Return a budget scope for one agent instance of ``role``.
+
+    Scopes look like "researcher#1f2e3d4c"; each one gets its own budget
+    with the limits of ``role``.
+    """
+    return f"{role.lower()}#{uuid.uuid4().hex[:8]}"
+
+
+class RunBudget:
+    """Run-wide budget plus one budget per agent, and the run's tool results.
+
+    Agents are identified by a role or by an ``agent_scope`` of one.
+
+    Args:
+        limits: Run-wide limits (``Budget`` keyword arguments)
+        agent_limits: Limits per agent role, e.g. ``{"researcher": {...}}``
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Any]] = None,
+        agent_limits: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        self.run = Budget("run", **(limits or {}))
+        self.agent_limits = agent_limits or {}
+        self.agents: Dict[str, Budget] = {}
+        self._agent_ids: Dict[str, str] = {}
+        self.duplicate_tool_calls = 0
+        self.final_answers_forced: List[Dict[str, Any]] = []
+        self._final_answered: Set[Optional[str]] = set()
+        self._waiting = 0
+        self._wait_started = 0.0
+        self._tool_results: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _agent(self, agent: Optional[str]) -> Optional[Budget]:
+        if not agent:
+            return None
+        agent = agent.lower()
+        if agent not in self.agents:
+            role = agent.split("#")[0]
+            # Named after the role; later instances of the role are numbered
+            count = sum(1 for key in self.agents if key.split("#")[0] == role)
+            name = role if count == 0 else f"{role}-{count + 1}"
+            self.agents[agent] = Budget(name, **self.agent_limits.get(role, {}))
+        return self.agents[agent]
+
+    def bind_agent(self, agent_id: Optional[str], agent: Optional[str]) -> None:
+        """Remember that the CrewAI agent ``agent_id`` is counted under ``agent``."""
+        if agent_id and agent:
+            with self._lock:
+                self._agent_ids[str(agent_id)] = agent
+
+    def agent_for(self, agent_id: Optional[str], role: Optional[str] = None) -> Optional[str]:
+        """Return the budget an event of agent ``agent_id`` counts under (its role if unbound)."""
+        with self._lock:
+            return self._agent_ids.get(str(agent_id)) or ((role or "").lower() or None)
+
+    def exhausted(self, agent: Optional[str] = None) -> Optional[str]:
+        """Return why the run's or the agent's budget is exhausted, or None."""
+        with self._lock:
+            agent = self._agent(agent)
+            return self.run.exhausted() or (agent.exhausted() if agent else None)
+
+    def add_llm_call(self, agent: Optional[str], tokens: int = 0) -> None:
+        with self._lock:
+            for budget in (self.run, self._agent(agent)):
+                if budget is not None:
+                    budget.llm_calls += 1
+                    budget.tokens += tokens
+
+    def add_tokens(self, agent: Optional[str], tokens: int) -> None:
+        with self._lock:
+            for budget in (self.run, self._agent(agent)):
+                if budget is not None:
+                    budget.tokens += tokens
+
+    def add_tool_call(self, agent: Optional[str]) -> None:
+        with self._lock:
+            for budget in (self.run, self._agent(agent)):
+                if budget is not None:
+                    budget.tool_calls += 1
+
+    def add_cost(self, agent: Optional[str], cost_usd: float) -> None:
+        with self._lock:
+            for budget in (self.run, self._agent(agent)):
+                if budget is not None:
+                    budget.cost_usd += cost_usd
+
+    def cost_exceeded(self, agent: Optional[str] = None, next_cost: float = 0.0) -> Optional[str]:
+        """Return why spending ``next_cost`` more would break a cost ceiling, or None.
+
+        With the default ``next_cost`` of 0 this reports a ceiling that has
+        already been reached.
+        """
+        with self._lock:
+            for budget in (self.run, self._agent(agent)):
+                if budget is None or not budget.max_cost_usd:
+                    continue
+                if next_cost and budget.cost_usd + next_cost > budget.max_cost_usd:
+                    return (
+                        f"{budget.name} spent ${budget.cost_usd:.4f} of ${budget.max_cost_usd:.4f}, "
+                        f"next call up to ${next_cost:.4f}"
+                    )
+                if budget.cost_usd >= budget.max_cost_usd:
+                    return f"{budget.name} spent ${budget.cost_usd:.4f} of ${budget.max_cost_usd:.4f}"
+            return None
+
+    def force_final_answer(self, agent: Optional[str], reason: str) -> None:
+        """Record that an agent was asked for its final answer because of ``reason``."""
+        with self._lock:
+            budget = self._agent(agent)
+            self.final_answers_forced.append({"agent": budget.name if budget else None, "reason": reason})
+            self._final_answered.add(agent.lower() if agent else None)
+
+    def final_answer_forced(self, agent: Optional[str]) -> bool:
+        """Return whether the agent has already had its final answer call."""
+        with self._lock:
+            return (agent.lower() if agent else None) in self._final_answered
+
+    @contextmanager
+    def waiting_for_user(self) -> Iterator[None]:
+        """Stop the deadlines while the run waits for the user.
+
+        Overlapping waits are counted once.
+        """
+        with self._lock:
+            if self._waiting == 0:
+                self._wait_started = time.monotonic()
+            self._waiting += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                if self._waiting == 0:
+                    now = time.monotonic()
+                    for budget in (self.run, *self.agents.values()):
+                        budget.paused += now - max(self._wait_started, budget.started)
+
+    def earlier_result(self, key: str) -> Optional[Any]:
+        """Return the result of an earlier tool call with the same key, counting the repeat."""
+        with self._lock:
+            result = self._tool_results.get(key)
+            if result is not None:
+                self.duplicate_tool_calls += 1
+            return result
+
+    def remember(self, key: str, result: Any) -> None:
+        with self._lock:
+            self._tool_results[key] = result
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the usage of the run and of each agent, repeats and forced final answers."""
+        with self._lock:
+            return {
+                "run": self.run.usage(),
+                "agents": {budget.name: budget.usage() for budget in self.agents.values()},
+                "duplicate_tool_calls": self.duplicate_tool_calls,
+                "final_answers_forced": list(self.final_answers_forced),
+            }
+
+
+def current_budget() -> Optional[RunBudget]:
+    """Return the budget bound to the running crew, if any."""
+    return _current_budget.get()
+
+
+@contextmanager
+def waiting_for_user() -> Iterator[None]:
+    """Leave the time spent in the block out of the bound budget's deadlines."""
+    budget = current_budget()
+    if budget is None:
+        yield
+        return
+    with budget.waiting_for_user():
+        yield
+
+
+@contextmanager
+def enforce_budget() -> Iterator[Optional[RunBudget]]:
+    """Bind a new run budget for the crew about to run.
+
+    With budgets disabled the budget only holds the cost ceiling, and nothing
+    is bound (None) if there is no ceiling either.
+    """
+    if RUN_BUDGET_ENABLED:
+        budget = RunBudget(
+            limits={
+                "max_llm_calls": RUN_MAX_LLM_CALLS,
+                "max_tool_calls": RUN_MAX_TOOL_CALLS,
+                "max_tokens": RUN_MAX_TOKENS,
+                "deadline_seconds": RUN_DEADLINE_SECONDS,
+                "max_cost_usd": RUN_MAX_COST_USD,
+            },
+            agent_limits=AGENT_BUDGETS,
+        )
+    elif RUN_MAX_COST_USD:
+        budget = RunBudget(limits={"max_cost_usd": RUN_MAX_COST_USD})
+    else:
+        yield None
+        return
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
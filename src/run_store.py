@@ -0,0 +1,156 @@
+"""Local store of run checkpoints for the multi-agent system.
+
+Every checkpointed run gets a directory under RUN_STORE_DIR named after its
+run ID. ``run.json`` records the run's status and the output of each task
+as it completes, and ``tools.sqlite`` caches the run's LLM responses, search
+results and user answers, so a resumed run restarts at the first incomplete
+task without paying again for the work already done. The cache is deleted
+once the run completes; ``run.json`` is kept as the run's record.
+"""
+import json
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from cache_store import DiskCache
+from config import RUN_STORE_DIR
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+RUN_FILE = "run.json"
+TOOL_CACHE_FILE = "tools.sqlite"
+# Run IDs as generated by ``RunStore.create``
+RUN_ID_PATTERN = re.compile(r"^[0-9a-f]{12}$")
+
+
+class RunStore:
+    """Directory of run records keyed by run ID.
+
+    Args:
+        root: Directory holding one subdirectory per run
+    """
+
+    def __init__(self, root: str = RUN_STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _run_dir(self, run_id: str) -> str:
+        return os.path.join(self.root, run_id)
+
+    def create(
+        self,
+        mode: str,
+        question: Optional[str] = None,
+        llm_overrides: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Create and persist a new run record.
+
+        Args:
+            mode: Research mode the run executes
+            question: Pre-supplied user question, if any
+            llm_overrides: Per-request model settings, reapplied on resume
+
+        Returns:
+            dict: The new run record
+        """
+        now = time.time()
+        run = {
+            "run_id": uuid.uuid4().hex[:12],
+            "mode": mode,
+            "question": question,
+            "llm_overrides": llm_overrides,
+            "status": "running",
+            "attempts": 1,
+            "created_at": now,
+            "updated_at": now,
+            "tasks": {},
+            "error": None,
+        }
+        os.makedirs(self._run_dir(run["run_id"]))
+        self.save(run)
+        logger.info(f"Created run {run['run_id']} in {self.root}")
+        return run
+
+    def load(self, run_id: str) -> Dict[str, Any]:
+        """Load a run record for resumption.
+
+        Args:
+            run_id: ID printed when the run was started
+
+        Returns:
+            dict: The run record, with its attempt counter incremented
+
+        Raises:
+            ValueError: If the ID is malformed or no run with this ID exists
+        """
+        if not RUN_ID_PATTERN.match(run_id or ""):
+            raise ValueError(f"Invalid run ID: {run_id!r}")
+        path = os.path.join(self._run_dir(run_id), RUN_FILE)
+        if not os.path.isfile(path):
+            raise ValueError(f"Unknown run ID: {run_id}")
+        with open(path, encoding="utf-8") as f:
+            run = json.load(f)
+        run["attempts"] = run.get("attempts", 1) + 1
+        run["status"] = "running"
+        run["error"] = None
+        self.save(run)
+        logger.info(f"Loaded run {run_id} with completed tasks: {list(run['tasks'])}")
+        return run
+
+    def save(self, run: Dict[str, Any]) -> None:
+        """Atomically write a run record to disk."""
+        run["updated_at"] = time.time()
+        path = os.path.join(self._run_dir(run["run_id"]), RUN_FILE)
+        temp_path = path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(run, f, indent=2)
+            os.replace(temp_path, path)
+        except BaseException:
+            # Leave the previous record in place and no half-written file behind
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def record_task(self, run: Dict[str, Any], name: str, output: str) -> None:
+        """Checkpoint the output of a completed task."""
+        run["tasks"][name] = {"output": output, "completed_at": time.time()}
+        self.save(run)
+        logger.info(f"Checkpointed task '{name}' of run {run['run_id']}")
+
+    def mark(self, run: Dict[str, Any], status: str, error: Optional[str] = None) -> None:
+        """Record the run's status ("running", "completed" or "failed")."""
+        run["status"] = status
+        run["error"] = error
+        self.save(run)
+
+    def tool_cache(self, run_id: str) -> DiskCache:
+        """Open the run's cache of LLM responses, search results and answers."""
+        path = os.path.join(self._run_dir(run_id), TOOL_CACHE_FILE)
+        return DiskCache(path, max_entries=0)
+
+    def discard_tool_cache(self, run_id: str) -> None:
+        """Delete the run's cache once nothing will resume from it.
+
+        The cache must be closed first. Failing to delete it is logged, not raised.
+        """
+        path = os.path.join(self._run_dir(run_id), TOOL_CACHE_FILE)
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to delete {path + suffix}: {e}")
+
+    def list_runs(self) -> List[Dict[str, Any]]:
+        """Return every stored run record, most recently updated first."""
+        runs = []
+        for run_id in os.listdir(self.root):
+            path = os.path.join(self._run_dir(run_id), RUN_FILE)
+            if os.path.isfile(path):
+                with open(path, encoding="utf-8") as f:
+                    runs.append(json.load(f))
+        return sorted(runs, key=lambda run: run["updated_at"], reverse=True)
@@ -0,0 +1,467 @@
+"""Per-run timing of tasks, agent iterations, LLM calls and tool calls.
+
+While a run is bound to a ``RunTimeline`` (``record_timeline``), every LLM
+call made through a ``TimedLLM`` and every tool call made through a
+``TimedTool`` is timed in the thread that makes it. Cache layers mark the
+call they serve with ``mark(cache_hit=...)``, and token counts are taken
+from CrewAI's LLM completion events. Task boundaries also come from the
+event bus. Agent iterations are derived afterwards: an iteration starts
+with an LLM call and runs until the same task's next LLM call.
+
+At the end of a run the timeline is exported as nested Langfuse
+observations (task > iteration > generation / tool) with their measured
+start and end times, and summarized into a JSON file per run under
+``RUN_TIMINGS_DIR``.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from config import RUN_TIMINGS_DIR
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+_current_timeline: contextvars.ContextVar[Optional["RunTimeline"]] = contextvars.ContextVar(
+    "run_timeline", default=None
+)
+# Records opened by ``timed`` in this context, innermost last
+_open_records: contextvars.ContextVar[tuple] = contextvars.ContextVar(
+    "open_timing_records", default=()
+)
+_handlers_registered = False
+_handlers_lock = threading.Lock()
+
+# Langfuse observation type for each record kind
+OBSERVATION_TYPES = {"llm": "generation", "tool": "tool"}
+
+
+def _usage_tokens(usage: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """Read prompt and completion token counts from a provider usage dict."""
+    usage = usage or {}
+
+    def first(*keys):
+        for key in keys:
+            if usage.get(key) is not None:
+                return int(usage[key])
+        return 0
+
+    return {
+        "prompt_tokens": first("prompt_tokens", "input_tokens", "inputTokens"),
+        "completion_tokens": first("completion_tokens", "output_tokens", "outputTokens"),
+    }
+
+
+class RunTimeline:
+    """Timing records collected during one run."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.ended: Optional[float] = None
+        self.records: List[Dict[str, Any]] = []
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def task_started(self, task_id: str, name: str, agent: Optional[str], at: float) -> None:
+        with self._lock:
+            task = self.tasks.setdefault(task_id, {"id": task_id})
+            task.update(name=name, agent=agent, start=at)
+
+    def task_ended(self, task_id: str, at: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            task = self.tasks.setdefault(task_id, {"id": task_id})
+            task.update(end=at, error=error)
+
+    def finish(self) -> None:
+        """Mark the end of the run and wait briefly for pending event handlers."""
+        try:
+            from crewai.events.event_bus import crewai_event_bus
+
+            crewai_event_bus.flush(timeout=1.0)
+        except Exception:
+            pass
+        self.ended = time.time()
+
+    def structure(self) -> List[Dict[str, Any]]:
+        """Group records into tasks and agent iterations.
+
+        Returns:
+            list: Tasks in start order, each with ``iterations`` (an LLM call
+                and the tool calls made after it on the same thread) and
+                ``children`` for the rare record outside any iteration. A
+                pseudo-task with id None holds records that belong to no task.
+        """
+        with self._lock:
+            records = sorted(self.records, key=lambda record: record["start"])
+            tasks = {task_id: dict(task) for task_id, task in self.tasks.items()}
+        end = self.ended or time.time()
+
+        iterations_by_task = defaultdict(list)
+        last_iteration_on_thread: Dict[int, Dict[str, Any]] = {}
+        loose = defaultdict(list)
+        for record in records:
+            if record["kind"] == "llm":
+                iteration = {"start": record["start"], "llm": record, "tools": []}
+                iterations_by_task[record.get("task_id")].append(iteration)
+                last_iteration_on_thread[record["thread"]] = iteration
+            else:
+                iteration = last_iteration_on_thread.get(record["thread"])
+                if iteration is not None:
+                    iteration["tools"].append(record)
+                else:
+                    loose[record.get("task_id")].append(record)
+
+        for task_id in list(iterations_by_task) + list(loose):
+            if task_id not in tasks:
+                children = iterations_by_task[task_id] + loose[task_id]
+                tasks[task_id] = {"id": task_id, "name": "untracked" if task_id else None}
+                tasks[task_id]["start"] = min(child["start"] for child in children)
+
+        structured = []
+        for task_id, task in tasks.items():
+            iterations = iterations_by_task.get(task_id, [])
+            children = loose.get(task_id, [])
+            task_end = task.get("end") or max(
+                [self._last_end(iteration) for iteration in iterations]
+                + [child["end"] for child in children]
+                + [task.get("start") or end]
+            )
+            for index, iteration in enumerate(iterations):
+                following = iterations[index + 1]["start"] if index + 1 < len(iterations) else None
+                iteration["end"] = max(self._last_end(iteration), following or task_end)
+                iteration["number"] = index + 1
+            structured.append({
+                **task,
+                "start": task.get("start") or self.started,
+                "end": task_end,
+                "iterations": iterations,
+                "children": children,
+            })
+        structured.sort(key=lambda task: task["start"])
+        return structured
+
+    @staticmethod
+    def _last_end(iteration: Dict[str, Any]) -> float:
+        return max([iteration["llm"]["end"]] + [tool["end"] for tool in iteration["tools"]])
+
+    def summary(self) -> Dict[str, Any]:
+        """Summarize where the run's time went.
+
+        Returns:
+            dict: Total wall time; LLM and tool totals (time, calls, tokens,
+                cache hits); the same per model, per tool and per task
+        """
+        total = (self.ended or time.time()) - self.started
+        with self._lock:
+            records = list(self.records)
+
+        def bucket():
+            return {"calls": 0, "seconds": 0.0, "cache_hits": 0}
+
+        totals = {"llm": bucket(), "tool": bucket()}
+        totals["llm"].update(prompt_tokens=0, completion_tokens=0)
+        by_model = defaultdict(bucket)
+        by_tool = defaultdict(bucket)
+        for record in records:
+            seconds = record["end"] - record["start"]
+            groups = [totals[record["kind"]]]
+            groups.append(by_model[record["name"]] if record["kind"] == "llm" else by_tool[record["name"]])
+            for group in groups:
+                group["calls"] += 1
+                group["seconds"] += seconds
+                group["cache_hits"] += int(bool(record.get("cache_hit")))
+                group["cache_hits"] += record.get("cache_hits", 0)
+            if record["kind"] == "llm":
+                totals["llm"]["prompt_tokens"] += record.get("prompt_tokens", 0)
+                totals["llm"]["completion_tokens"] += record.get("completion_tokens", 0)
+
+        tasks = []
+        for task in self.structure():
+            llm_seconds = sum(it["llm"]["end"] - it["llm"]["start"] for it in task["iterations"])
+            tool_seconds = sum(
+                tool["end"] - tool["start"] for it in task["iterations"] for tool in it["tools"]
+            )
+            tasks.append({
+                "task": task.get("name"),
+                "agent": task.get("agent"),
+                "seconds": round(task["end"] - task["start"], 3),
+                "iterations": len(task["iterations"]),
+                "llm_seconds": round(llm_seconds, 3),
+                "tool_seconds": round(tool_seconds, 3),
+                "error": task.get("error"),
+            })
+
+        def rounded(groups):
+            return {name: {**values, "seconds": round(values["seconds"], 3)} for name, values in groups.items()}
+
+        busy = totals["llm"]["seconds"] + totals["tool"]["seconds"]
+        return {
+            "total_seconds": round(total, 3),
+            "llm": {**totals["llm"], "seconds": round(totals["llm"]["seconds"], 3)},
+            "tools": {**totals["tool"], "seconds": round(totals["tool"]["seconds"], 3)},
+            # Framework overhead, prompt building and anything not timed above
+            # (negative when calls overlap, as in map-reduce runs)
+            "other_seconds": round(total - busy, 3),
+            "by_model": rounded(by_model),
+            "by_tool": rounded(by_tool),
+            "tasks": tasks,
+        }
+
+
+@contextmanager
+def record_timeline() -> Iterator[RunTimeline]:
+    """Collect the timing of runs started in this context into a new timeline."""
+    _register_handlers()
+    timeline = RunTimeline()
+    token = _current_timeline.set(timeline)
+    try:
+        yield timeline
+    finally:
+        _current_timeline.reset(token)
+
+
+@contextmanager
+def timed(kind: str, name: str, **attrs: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    """Time the enclosed call as a ``kind`` record named ``name``.
+
+    Yields the record so the caller can add attributes, or None when no
+    timeline is being recorded. A record for a call that raised gets ``error``.
+    """
+    timeline = _current_timeline.get()
+    if timeline is None:
+        yield None
+        return
+    record = {"kind": kind, "name": name, "thread": threading.get_ident(), **attrs}
+    token = _open_records.set(_open_records.get() + (record,))
+    record["start"] = time.time()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["end"] = time.time()
+        _open_records.reset(token)
+        timeline.add(record)
+
+
+def mark(**attrs: Any) -> None:
+    """Add attributes (e.g. ``cache_hit=True``) to the innermost timed call, if any."""
+    records = _open_records.get()
+    if records:
+        records[-1].update(attrs)
+
+
+def _register_handlers() -> None:
+    """Subscribe to CrewAI's task and LLM completion events (once per process)."""
+    global _handlers_registered
+    with _handlers_lock:
+        if _handlers_registered:
+            return
+        from crewai.events.event_bus import crewai_event_bus
+        from crewai.events.types.llm_events import LLMCallCompletedEvent
+        from crewai.events.types.task_events import (
+            TaskCompletedEvent,
+            TaskFailedEvent,
+            TaskStartedEvent,
+        )
+
+        # Handlers run with a copy of the emitting context, so the timeline
+        # and the open LLM record are those of the run that made the call
+
+        @crewai_event_bus.on(TaskStartedEvent)
+        def on_task_start(source, event):
+            timeline = _current_timeline.get()
+            task = event.task
+            if timeline is None or task is None:
+                return
+            timeline.task_started(
+                str(task.id),
+                getattr(task, "name", None) or (getattr(task, "description", "") or "")[:80],
+                getattr(getattr(task, "agent", None), "role", None),
+                event.timestamp.timestamp(),
+            )
+
+        @crewai_event_bus.on(TaskCompletedEvent)
+        def on_task_end(source, event):
+            timeline = _current_timeline.get()
+            if timeline is not None and event.task is not None:
+                timeline.task_ended(str(event.task.id), event.timestamp.timestamp())
+
+        @crewai_event_bus.on(TaskFailedEvent)
+        def on_task_failed(source, event):
+            timeline = _current_timeline.get()
+            if timeline is not None and event.task is not None:
+                timeline.task_ended(str(event.task.id), event.timestamp.timestamp(), event.error)
+
+        @crewai_event_bus.on(LLMCallCompletedEvent)
+        def on_llm_end(source, event):
+            for record in reversed(_open_records.get()):
+                if record["kind"] == "llm":
+                    # Hedged requests both complete; both are billed
+                    for key, value in _usage_tokens(event.usage).items():
+                        record[key] = record.get(key, 0) + value
+                    return
+
+        _handlers_registered = True
+
+
+def _ns(seconds: float) -> int:
+    return int(seconds * 1_000_000_000)
+
+
+def export_to_trace(timeline: RunTimeline, parent_span) -> int:
+    """Write the timeline as child observations of ``parent_span``.
+
+    Spans are created through OpenTelemetry with the recorded start and end
+    times and Langfuse's observation attributes (generations carry their
+    token usage and cost), so they are exported by the Langfuse client
+    alongside its own spans.
+
+    Args:
+        timeline: Finished timeline
+        parent_span: OpenTelemetry span to nest the observations under
+
+    Returns:
+        int: Number of observations written
+    """
+    from opentelemetry import trace
+    from tracing import truncate_text
+    from usage_ledger import call_cost
+
+    tracer = trace.get_tracer("multi-agent-langfuse")
+    written = 0
+
+    def start(name, begin, parent, observation_type="span", **metadata):
+        span = tracer.start_span(
+            name, context=trace.set_span_in_context(parent), start_time=_ns(begin)
+        )
+        span.set_attribute("langfuse.observation.type", observation_type)
+        for key, value in metadata.items():
+            if value is not None:
+                span.set_attribute(
+                    f"langfuse.observation.metadata.{key}",
+                    value if isinstance(value, (bool, int, float)) else truncate_text(str(value)),
+                )
+        return span
+
+    def finish(span, record):
+        if record.get("error"):
+            span.set_attribute("langfuse.observation.level", "ERROR")
+            span.set_attribute("langfuse.observation.status_message", truncate_text(record["error"]))
+        span.end(end_time=_ns(record["end"]))
+
+    def write_record(record, parent):
+        nonlocal written
+        seconds = round(record["end"] - record["start"], 3)
+        if record["kind"] == "llm":
+            span = start(
+                record["name"], record["start"], parent, "generation",
+                agent=record.get("agent"), latency_seconds=seconds,
+                cache_hit=record.get("cache_hit"),
+            )
+            span.set_attribute("langfuse.observation.model.name", record["name"])
+            span.set_attribute("langfuse.observation.usage_details", json.dumps({
+                "input": record.get("prompt_tokens", 0),
+                "output": record.get("completion_tokens", 0),
+            }))
+            span.set_attribute("langfuse.observation.cost_details", json.dumps(call_cost(
+                record["name"], record.get("prompt_tokens", 0), record.get("completion_tokens", 0)
+            )))
+        else:
+            span = start(
+                f"tool: {record['name']}", record["start"], parent, "tool",
+                seconds=seconds, cache_hit=record.get("cache_hit"),
+                cache_hits=record.get("cache_hits"), cache_misses=record.get("cache_misses"),
+            )
+        finish(span, record)
+        written += 1
+
+    for task in timeline.structure():
+        task_span = parent_span
+        if task.get("id") is not None:
+            task_span = start(
+                f"task: {task.get('name')}", task["start"], parent_span,
+                agent=task.get("agent"), iterations=len(task["iterations"]),
+            )
+        for iteration in task["iterations"]:
+            iteration_span = start(
+                f"iteration {iteration['number']}", iteration["start"], task_span,
+                agent=iteration["llm"].get("agent"), tool_calls=len(iteration["tools"]),
+            )
+            write_record(iteration["llm"], iteration_span)
+            for tool in iteration["tools"]:
+                write_record(tool, iteration_span)
+            iteration_span.end(end_time=_ns(iteration["end"]))
+            written += 1
+        for record in task["children"]:
+            write_record(record, task_span)
+        if task_span is not parent_span:
+            finish(task_span, task)
+            written += 1
+    return written
+
+
+def write_summary(summary: Dict[str, Any], run_label: Optional[str] = None, directory: str = RUN_TIMINGS_DIR) -> str:
+    """Write a run's timing summary as JSON.
+
+    Args:
+        summary: Output of ``RunTimeline.summary``
+        run_label: Trace or run ID used in the file name (a new ID if None)
+        directory: Where summaries are written
+
+    Returns:
+        str: Path of the written file
+    """
+    os.makedirs(directory, exist_ok=True)
+    label = run_label or uuid.uuid4().hex[:12]
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{label}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return path
+
+
+def finish_run(
+    timeline: Optional[RunTimeline], parent_span=None, run_label: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Close a run's timeline, export it under ``parent_span`` and write its summary.
+
+    Timing must never fail a run, so errors are logged and swallowed.
+
+    Args:
+        timeline: Timeline bound by ``record_timeline`` (None if timing is disabled)
+        parent_span: OpenTelemetry span to nest observations under, or None
+            for a run that is not traced
+        run_label: Trace or run ID used in the summary's file name
+
+    Returns:
+        dict or None: The timing summary
+    """
+    if timeline is None:
+        return None
+    try:
+        timeline.finish()
+        if parent_span is not None:
+            export_to_trace(timeline, parent_span)
+        summary = timeline.summary()
+        path = write_summary(summary, run_label)
+    except Exception as e:
+        logger.warning(f"Failed to record run timing: {e}")
+        return None
+    llm, tools = summary["llm"], summary["tools"]
+    logger.info(
+        f"Run timing: {summary['total_seconds']}s total; LLM {llm['seconds']}s "
+        f"({llm['calls']} calls, {llm['prompt_tokens']}+{llm['completion_tokens']} tokens, "
+        f"{llm['cache_hits']} cached); tools {tools['seconds']}s ({tools['calls']} calls, "
+        f"{tools['cache_hits']} cached); other {summary['other_seconds']}s. Summary: {path}"
+    )
+    return summary
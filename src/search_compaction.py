@@ -0,0 +1,216 @@
+"""Post-processing of search results before they reach an agent's prompt.
+
+Search tools return verbose payloads (sitelinks, image URLs, related
+searches, near-duplicate snippets) that end up in the researcher's context
+and, through its output, in the reviewer's. This module flattens a result
+payload into snippets, drops near-duplicates, reranks the rest against the
+query with a vectorized BM25 scorer and trims them to a token budget.
+"""
+import json
+import math
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from local_index import bm25_idf, bm25_weights, tokenize
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Rough characters-per-token ratio used to estimate prompt size
+CHARS_PER_TOKEN = 4
+# Snippets are only truncated to fit the budget if at least this many tokens remain
+MIN_SNIPPET_TOKENS = 16
+
+
+def estimate_tokens(value: Any) -> int:
+    """Estimate the prompt tokens a value occupies once serialized."""
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def extract_items(results: Any) -> Optional[List[Dict[str, str]]]:
+    """Flatten a Serper-style payload into title/link/snippet items.
+
+    Answer boxes and knowledge graph descriptions come first, followed by
+    organic results, news and "people also ask" entries, in the order the
+    search engine ranked them. Related searches, image URLs and sitelinks
+    are dropped.
+
+    Args:
+        results: Search tool output, as a dict or JSON string
+
+    Returns:
+        list: Items with title, link and snippet, or None if the payload is
+            not a recognised search result
+    """
+    if isinstance(results, str):
+        try:
+            results = json.loads(results)
+        except ValueError:
+            return None
+    if not isinstance(results, dict):
+        return None
+
+    items = []
+    answer_box = results.get("answerBox")
+    if isinstance(answer_box, dict):
+        items.append({
+            "title": answer_box.get("title", ""),
+            "link": answer_box.get("link", ""),
+            "snippet": answer_box.get("answer") or answer_box.get("snippet", ""),
+        })
+    graph = results.get("knowledgeGraph")
+    if isinstance(graph, dict) and graph.get("description"):
+        items.append({
+            "title": graph.get("title", ""),
+            "link": graph.get("descriptionLink") or graph.get("website", ""),
+            "snippet": graph["description"],
+        })
+    for section in ("organic", "news"):
+        for result in results.get(section) or []:
+            items.append({
+                "title": result.get("title", ""),
+                "link": result.get("link", ""),
+                "snippet": result.get("snippet", ""),
+            })
+    for result in results.get("peopleAlsoAsk") or []:
+        items.append({
+            "title": result.get("question") or result.get("title", ""),
+            "link": result.get("link", ""),
+            "snippet": result.get("snippet", ""),
+        })
+
+    if not items and not any(key in results for key in ("organic", "news", "peopleAlsoAsk")):
+        return None
+    return [item for item in items if item["snippet"] or item["title"]]
+
+
+def _term_matrix(docs: List[List[str]]) -> Tuple[np.ndarray, Dict[str, int]]:
+    """Build a dense term-frequency matrix (documents x vocabulary)."""
+    vocabulary: Dict[str, int] = {}
+    rows, cols = [], []
+    for row, terms in enumerate(docs):
+        for term in terms:
+            rows.append(row)
+            cols.append(vocabulary.setdefault(term, len(vocabulary)))
+    matrix = np.zeros((len(docs), max(len(vocabulary), 1)), dtype=np.float32)
+    np.add.at(matrix, (rows, cols), 1.0)
+    return matrix, vocabulary
+
+
+def near_duplicates(tfs: np.ndarray, threshold: float) -> np.ndarray:
+    """Mark items whose TF-IDF cosine similarity to an earlier item reaches threshold.
+
+    Args:
+        tfs: Term-frequency matrix (items x vocabulary)
+        threshold: Similarity at or above which an item is a duplicate
+
+    Returns:
+        np.ndarray: Boolean mask of duplicates; the first of each group is kept
+    """
+    num_docs = tfs.shape[0]
+    df = np.count_nonzero(tfs, axis=0)
+    vectors = tfs * np.log((1.0 + num_docs) / (1.0 + df) + 1.0)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    similarity = np.triu(vectors @ vectors.T, k=1)
+    duplicate = np.zeros(num_docs, dtype=bool)
+    for i in range(num_docs):
+        if duplicate[i]:
+            continue
+        duplicate |= similarity[i] >= threshold
+    return duplicate
+
+
+def bm25_scores(query: str, tfs: np.ndarray, vocabulary: Dict[str, int]) -> np.ndarray:
+    """Score every item against the query with BM25."""
+    lengths = tfs.sum(axis=1)
+    avgdl = float(lengths.mean()) if len(lengths) else 0.0
+    scores = np.zeros(tfs.shape[0], dtype=np.float32)
+    for term in set(tokenize(query)):
+        column = vocabulary.get(term)
+        if column is None:
+            continue
+        term_tfs = tfs[:, column]
+        idf = bm25_idf(tfs.shape[0], int(np.count_nonzero(term_tfs)))
+        scores += bm25_weights(term_tfs, lengths, avgdl, idf)
+    return scores
+
+
+def compact_results(
+    results: Any,
+    query: str,
+    token_budget: int,
+    dedupe_threshold: float = 0.85,
+    context: Optional[str] = None,
+) -> Tuple[Any, Dict[str, int]]:
+    """Deduplicate, rerank and trim search results to a token budget.
+
+    Args:
+        results: Search tool output
+        query: The search query the results were returned for
+        token_budget: Maximum estimated tokens of the compacted output;
+            0 disables trimming
+        dedupe_threshold: TF-IDF cosine similarity treated as a duplicate
+        context: Extra text to rank against, such as the clarified question
+
+    Returns:
+        tuple: The compacted ``{"query", "organic"}`` payload (or the input
+            unchanged if it is not a search result) and compaction stats
+    """
+    original_tokens = estimate_tokens(results)
+    items = extract_items(results)
+    if items is None:
+        return results, {
+            "original_tokens": original_tokens,
+            "compacted_tokens": original_tokens,
+            "tokens_removed": 0,
+            "items_in": 0,
+            "duplicates_removed": 0,
+            "items_kept": 0,
+        }
+
+    seen_links = set()
+    unique = []
+    for item in items:
+        link = item["link"].rstrip("/").lower()
+        if link and link in seen_links:
+            continue
+        seen_links.add(link)
+        unique.append(item)
+
+    ranked: List[Dict[str, str]] = []
+    if unique:
+        tfs, vocabulary = _term_matrix(
+            [tokenize(f"{item['title']} {item['snippet']}") for item in unique]
+        )
+        keep = ~near_duplicates(tfs, dedupe_threshold)
+        scores = bm25_scores(f"{query} {context or ''}", tfs, vocabulary)
+        # Stable sort keeps the search engine's order among equal scores
+        order = np.argsort(-scores, kind="stable")
+        ranked = [unique[i] for i in order if keep[i]]
+    duplicates = len(items) - len(ranked)
+
+    compacted = {"query": query, "organic": []}
+    used = estimate_tokens(compacted)
+    for item in ranked:
+        cost = estimate_tokens(item) + 1
+        if token_budget and used + cost > token_budget:
+            remaining = token_budget - used - (cost - estimate_tokens(item["snippet"]))
+            if remaining >= MIN_SNIPPET_TOKENS:
+                item = dict(item, snippet=item["snippet"][:remaining * CHARS_PER_TOKEN].rstrip() + "...")
+                compacted["organic"].append(item)
+                used += estimate_tokens(item) + 1
+            break
+        compacted["organic"].append(item)
+        used += cost
+
+    compacted_tokens = estimate_tokens(compacted)
+    stats = {
+        "original_tokens": original_tokens,
+        "compacted_tokens": compacted_tokens,
+        "tokens_removed": max(original_tokens - compacted_tokens, 0),
+        "items_in": len(items),
+        "duplicates_removed": duplicates,
+        "items_kept": len(compacted["organic"]),
+    }
+    return compacted, stats
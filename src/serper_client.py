@@ -0,0 +1,217 @@
+"""Pooled Serper API client for running several searches at once.
+
+The researcher usually needs a handful of queries to cover a question. Run
+one at a time through SerperDevTool, every search costs a separate agent
+turn and a fresh HTTPS handshake. ``SerperClient`` keeps one keep-alive
+connection pool and runs a list of queries concurrently on it, then merges
+the results into a single Serper-shaped payload.
+
+The endpoint is configurable (``SERPER_URL``) so the client can be pointed
+at a local stub server.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from config import (
+    SERPER_API_KEY,
+    SERPER_URL,
+    SERPER_TIMEOUT_SECONDS,
+    MULTI_SEARCH_CONCURRENCY,
+)
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Serper sections whose entries are merged across queries, in output order
+MERGED_SECTIONS = ("organic", "news", "peopleAlsoAsk")
+
+
+def _link_key(item: Dict[str, Any]) -> str:
+    """Key used to recognise the same result returned for several queries."""
+    link = item.get("link") or ""
+    if link:
+        return link.split("#", 1)[0].rstrip("/").lower()
+    title = item.get("title") or item.get("question") or ""
+    return " ".join(f"{title} {item.get('snippet', '')}".lower().split())
+
+
+def unique_queries(queries: List[str]) -> List[str]:
+    """Strip queries and drop empty and repeated ones, keeping their order."""
+    return list(dict.fromkeys(query.strip() for query in queries if query and query.strip()))
+
+
+def merge_search_results(
+    queries: List[str],
+    payloads: List[Optional[Dict[str, Any]]],
+    max_results: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Merge per-query Serper payloads into one deduplicated payload.
+
+    Results are interleaved by rank (every query's first result, then every
+    query's second, ...) so the top hits of each query survive a later
+    token budget. A result returned by several queries is kept once, tagged
+    with the first query that found it.
+
+    Args:
+        queries: Queries that were searched, aligned with ``payloads``
+        payloads: Serper response for each query (None if it failed)
+        max_results: Maximum merged results per section
+
+    Returns:
+        dict: Serper-style payload with merged sections and the answer box
+            and knowledge graph of the first query that had one
+    """
+    merged: Dict[str, Any] = {
+        "searchParameters": {"q": " | ".join(queries), "type": "multi", "queries": queries},
+    }
+    for key in ("answerBox", "knowledgeGraph"):
+        for payload in payloads:
+            if payload and isinstance(payload.get(key), dict):
+                merged[key] = payload[key]
+                break
+
+    for section in MERGED_SECTIONS:
+        columns = [
+            (query, (payload or {}).get(section) or [])
+            for query, payload in zip(queries, payloads)
+        ]
+        seen, items = set(), []
+        for rank in range(max((len(results) for _, results in columns), default=0)):
+            for query, results in columns:
+                if rank >= len(results) or not isinstance(results[rank], dict):
+                    continue
+                key = _link_key(results[rank])
+                if key in seen:
+                    continue
+                seen.add(key)
+                items.append({**results[rank], "query": query, "position": len(items) + 1})
+        if items:
+            merged[section] = items[:max_results] if max_results else items
+    return merged
+
+
+class SerperClient:
+    """Thread-safe Serper client sharing one keep-alive connection pool.
+
+    Args:
+        api_key: Serper API key
+        url: Search endpoint (override to target a stub server)
+        timeout: Per-request timeout in seconds
+        concurrency: Maximum simultaneous requests and pooled connections
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = SERPER_API_KEY,
+        url: str = SERPER_URL,
+        timeout: float = SERPER_TIMEOUT_SECONDS,
+        concurrency: int = MULTI_SEARCH_CONCURRENCY,
+    ):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        if not api_key:
+            raise ValueError("SERPER_API_KEY not found in environment variables")
+        self.url = url
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.session = requests.Session()
+        self.session.headers.update({"X-API-KEY": api_key, "Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="serper"
+        )
+
+    def search(self, query: str, num_results: int = 10, **params: Any) -> Dict[str, Any]:
+        """Run a single search.
+
+        Args:
+            query: Search query
+            num_results: Results requested from Serper
+            **params: Extra Serper parameters (gl, hl, location, ...)
+
+        Returns:
+            dict: Serper response
+
+        Raises:
+            requests.RequestException: If the request fails or returns an error status
+        """
+        response = self.session.post(
+            self.url,
+            json={"q": query, "num": num_results, **params},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def search_each(
+        self, queries: List[str], num_results: int = 10, **params: Any
+    ) -> Tuple[List[Optional[Dict[str, Any]]], Dict[str, str]]:
+        """Run several searches concurrently.
+
+        Args:
+            queries: Search queries
+            num_results: Results requested per query
+            **params: Extra Serper parameters applied to every query
+
+        Returns:
+            tuple: Response for each query (None if it failed) and the error
+                message of each failed query
+        """
+        futures = [
+            self._executor.submit(self.search, query, num_results, **params)
+            for query in queries
+        ]
+        payloads, errors = [], {}
+        for query, future in zip(queries, futures):
+            try:
+                payloads.append(future.result())
+            except Exception as e:
+                logger.warning(f"Search failed for {query!r}: {e}")
+                errors[query] = str(e)
+                payloads.append(None)
+        return payloads, errors
+
+    def search_many(
+        self, queries: List[str], num_results: int = 10, **params: Any
+    ) -> Dict[str, Any]:
+        """Run several searches concurrently and merge their results.
+
+        A failing query is reported under ``errors`` instead of failing the
+        other searches.
+
+        Args:
+            queries: Search queries; duplicates are searched once
+            num_results: Results requested per query
+            **params: Extra Serper parameters applied to every query
+
+        Returns:
+            dict: Merged payload (see ``merge_search_results``)
+        """
+        queries = unique_queries(queries)
+        payloads, errors = self.search_each(queries, num_results, **params)
+        merged = merge_search_results(queries, payloads)
+        if errors:
+            merged["errors"] = errors
+        return merged
+
+    def close(self) -> None:
+        """Shut down the worker threads and close pooled connections."""
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+_client: Optional[SerperClient] = None
+_client_lock = threading.Lock()
+
+
+def get_serper_client() -> SerperClient:
+    """Return the process-wide Serper client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = SerperClient()
+            logger.info(f"Serper client initialized for {SERPER_URL}")
+        return _client
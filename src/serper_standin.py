@@ -0,0 +1,155 @@
+"""Local stand-in for the Serper search API.
+
+Serves ``POST /search`` with deterministic organic results generated from
+the query after a configurable delay, so the search tools can run without
+a Serper account or network access. Point ``SERPER_URL`` at
+``http://127.0.0.1:9200/search`` to use it; any ``SERPER_API_KEY`` is accepted.
+
+Usage:
+    python serper_standin.py --port 9200 --latency 0.3
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+# Filler vocabulary for generated titles and snippets
+WORDS = (
+    "analysis benchmark cache cloud cost data design energy evidence growth impact "
+    "latency market model network policy research risk scale study survey system trend"
+).split()
+
+
+def fake_results(query: str, num: int = 10) -> Dict[str, Any]:
+    """Return a Serper-shaped payload that depends only on ``query`` and ``num``."""
+    rng = random.Random(hashlib.sha256(query.encode("utf-8")).hexdigest())
+    slug = "-".join(query.lower().split())[:40] or "query"
+    organic = []
+    for position in range(1, num + 1):
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(18, 40)))
+        organic.append({
+            "title": f"{query} - {rng.choice(WORDS).title()} {position}",
+            "link": f"https://example{rng.randint(1, 50)}.com/{slug}/{position}",
+            "snippet": f"{query}: {words}.",
+            "position": position,
+        })
+    return {"searchParameters": {"q": query, "num": num}, "organic": organic}
+
+
+class SerperStandIn:
+    """Serper API stand-in running on a background thread.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        latency: Seconds to wait before answering
+        jitter: Extra random delay of up to this many seconds
+        error_rate: Share of requests failing with 500
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        # Time spent answering requests, i.e. the emulated search latency
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Value for ``SERPER_URL``."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/search"
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with standin._lock:
+                    standin.requests += 1
+                if self.path.split("?", 1)[0].rstrip("/") != "/search":
+                    self._send(404, {"message": "Not found"})
+                    return
+                if not self.headers.get("X-API-KEY"):
+                    self._send(403, {"message": "Missing API key"})
+                    return
+
+                started = time.perf_counter()
+                time.sleep(standin.latency + random.uniform(0, standin.jitter))
+                if random.random() < standin.error_rate:
+                    self._send(500, {"message": "Internal error"})
+                    return
+                request = json.loads(body or b"{}")
+                payload = fake_results(str(request.get("q", "")), int(request.get("num") or 10))
+                with standin._lock:
+                    standin.busy_seconds += time.perf_counter() - started
+                self._send(200, payload)
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "SerperStandIn":
+        """Start serving on a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="serper-standin", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local Serper API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--latency", type=float, default=0.0, help="Response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 500 responses")
+    args = parser.parse_args(argv)
+
+    standin = SerperStandIn(
+        host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate,
+    ).start()
+    print(f"Serper stand-in listening on {standin.url}")
+    try:
+        standin._thread.join()
+    except KeyboardInterrupt:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+"""Long-running HTTP service for the multi-agent system.
+
+Exposes research as an ASGI application. Questions are queued in a bounded
+job queue and executed by a pool of worker threads that are warmed up at
+startup: each worker holds its own configured LLM clients, and the search
+tools and Langfuse client are created once for the whole process. When the
+queue is full new jobs are rejected with ``429 Too Many Requests`` so
+callers back off instead of piling up work.
+
+Endpoints:
+    POST /jobs          {"question": "...", "mode": "fast", "wait": true,
+                         "llm": {"reviewer": {"model": "..."}}}
+                        202 with a job ID, or 200 with the result when
+                        ``wait`` is set and the job finishes in time
+    GET  /jobs/{id}     Job status and, once finished, its result
+    GET  /health        Worker, queue and job counters, and Bedrock load
+                        control and routing state
+
+Usage:
+    python service.py --host 127.0.0.1 --port 8000 --workers 2
+"""
+import argparse
+import asyncio
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+from config import (
+    RESEARCH_MODE,
+    RESEARCH_MODES,
+    SERVICE_HOST,
+    SERVICE_PORT,
+    SERVICE_WORKERS,
+    SERVICE_QUEUE_SIZE,
+    SERVICE_SYNC_TIMEOUT_SECONDS,
+    SERVICE_MAX_JOBS,
+    BEDROCK_LOAD_CONTROL_ENABLED,
+    BEDROCK_ENDPOINTS,
+    SPECULATIVE_SEARCH_ENABLED,
+)
+from llm_profiles import normalize_overrides
+from logger import setup_logging, get_logger
+
+logger = get_logger(__name__)
+
+# Maximum accepted request body size
+MAX_BODY_BYTES = 64 * 1024
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+def parse_wait(wait: Any, limit: float = SERVICE_SYNC_TIMEOUT_SECONDS) -> Optional[float]:
+    """Return how long a request waits for its job, or None to return at once.
+
+    Args:
+        wait: The request's ``wait``: true, false/null, or a number of seconds
+        limit: Longest wait allowed
+
+    Raises:
+        ValueError: If ``wait`` is not a boolean or a non-negative number
+    """
+    if wait is None or wait is False:
+        return None
+    if wait is True:
+        return limit
+    if not isinstance(wait, (int, float)) or wait != wait or wait < 0:
+        raise ValueError("wait must be true, false or a non-negative number of seconds")
+    return min(float(wait), limit) if wait else None
+
+
+class Job:
+    """A research question submitted to the service."""
+
+    def __init__(self, question: str, mode: str, llm_overrides: Optional[Dict[str, Any]] = None):
+        self.job_id = uuid.uuid4().hex
+        self.question = question
+        self.mode = mode
+        self.llm_overrides = llm_overrides
+        self.status = "queued"
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.trace_id: Optional[str] = None
+        self.worker: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Future = Future()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the job for API responses."""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "question": self.question,
+            "mode": self.mode,
+            "llm": self.llm_overrides,
+            "result": self.result,
+            "error": self.error,
+            "trace_id": self.trace_id,
+            "worker": self.worker,
+            "queued_seconds": round((self.started_at or time.time()) - self.created_at, 3),
+            "run_seconds": (
+                round((self.finished_at or time.time()) - self.started_at, 3)
+                if self.started_at else None
+            ),
+        }
+
+
+class ResearchService:
+    """Bounded job queue drained by a pool of pre-warmed workers.
+
+    Args:
+        workers: Number of worker threads (jobs run concurrently)
+        queue_size: Maximum jobs waiting for a worker
+        max_jobs: Finished jobs kept for polling before the oldest are dropped
+    """
+
+    def __init__(
+        self,
+        workers: int = SERVICE_WORKERS,
+        queue_size: int = SERVICE_QUEUE_SIZE,
+        max_jobs: int = SERVICE_MAX_JOBS,
+    ):
+        self.num_workers = max(1, workers)
+        self.max_jobs = max_jobs
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max(1, queue_size))
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._ready = threading.Event()
+        self._warm = 0
+        self._warmup_errors: List[str] = []
+        self._busy = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self.langfuse = None
+
+    def start(self) -> None:
+        """Initialize shared clients and start the worker pool."""
+        from main import init_langfuse
+        from tools import make_research_search_tools
+
+        self.langfuse = init_langfuse()
+        # Build the search tools once so workers reuse the imported modules and
+        # the process-wide Serper tool, search cache and local index
+        make_research_search_tools()
+        for index in range(self.num_workers):
+            thread = threading.Thread(
+                target=self._worker,
+                args=(f"worker-{index}",),
+                name=f"service-worker-{index}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Research service started with {self.num_workers} workers")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers after their current job and flush traces."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self.langfuse is not None:
+            self.langfuse.flush()
+        logger.info("Research service stopped")
+
+    def submit(
+        self,
+        question: str,
+        mode: str = RESEARCH_MODE,
+        llm_overrides: Optional[Dict[str, Any]] = None,
+    ) -> Job:
+        """Queue a question for research.
+
+        Args:
+            question: The user question
+            mode: Research mode, one of RESEARCH_MODES
+            llm_overrides: Model settings for this job (see llm_profiles); jobs
+                with overrides get fresh LLMs instead of the worker's warm ones
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            ValueError: If the question is empty, the mode unknown or the
+                overrides invalid
+            QueueFullError: If the queue is at capacity
+        """
+        if not question or not question.strip():
+            raise ValueError("question must be a non-empty string")
+        if mode not in RESEARCH_MODES:
+            raise ValueError(
+                f"Unknown research mode '{mode}'. Choose from: {', '.join(RESEARCH_MODES)}"
+            )
+
+        normalize_overrides(llm_overrides)
+        job = Job(question.strip(), mode, llm_overrides or None)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                del self._jobs[job.job_id]
+                self._rejected += 1
+                raise QueueFullError(f"Job queue is full ({self._queue.maxsize} waiting)")
+            self._prune()
+        logger.info(f"Queued job {job.job_id} ({mode}): {job.question[:100]}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by ID, or None if unknown or already pruned."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        """Drop the oldest finished jobs once more than max_jobs are kept."""
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        finished = [job_id for job_id, job in self._jobs.items() if job.future.done()]
+        for job_id in finished[:excess]:
+            del self._jobs[job_id]
+
+    def health(self) -> Dict[str, Any]:
+        """Return worker, queue and job counters, Bedrock load control and routing metrics,
+        the trace spool backlog, structured output conversions, speculative searches
+        and the LLM tokens and cost of the runs served."""
+        with self._lock:
+            if not self._ready.is_set():
+                status = "starting"
+            elif not self._warmup_errors:
+                status = "ok"
+            else:
+                status = "failed" if self._warm == 0 else "degraded"
+            health = {
+                "status": status,
+                "workers": self.num_workers,
+                "warm_workers": self._warm,
+                "busy_workers": self._busy,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "jobs_completed": self._completed,
+                "jobs_failed": self._failed,
+                "jobs_rejected": self._rejected,
+            }
+            if self._warmup_errors:
+                health["warmup_errors"] = list(self._warmup_errors)
+        if BEDROCK_LOAD_CONTROL_ENABLED:
+            from rate_control import bedrock_metrics
+
+            health["bedrock"] = bedrock_metrics()
+        if len(BEDROCK_ENDPOINTS) > 1:
+            from region_router import get_endpoint_router
+
+            health["bedrock_routing"] = get_endpoint_router().metrics()
+        from trace_spool import trace_spool_metrics
+
+        spool = trace_spool_metrics()
+        if spool is not None:
+            health["trace_spool"] = spool
+        from structured_output import structured_output_metrics
+
+        health["structured_outputs"] = structured_output_metrics()
+        if SPECULATIVE_SEARCH_ENABLED:
+            from prefetch import prefetch_metrics
+
+            health["speculative_search"] = prefetch_metrics()
+        from usage_ledger import usage_totals
+
+        health["usage"] = usage_totals()
+        return health
+
+    def _worker(self, name: str) -> None:
+        from agents_and_tasks_v05 import get_agent_llms
+        from main import run_traced
+        from research_modes import build_runner
+
+        # Warm-up: each worker owns configured LLM clients (one per agent
+        # profile) for all its jobs. A worker that fails to warm up fails
+        # its jobs instead of leaving them queued forever.
+        llms, warmup_error = None, None
+        try:
+            llms = get_agent_llms()
+        except Exception as e:
+            warmup_error = f"Worker warm-up failed: {e}"
+            logger.error(f"Service {name}: {warmup_error}", exc_info=True)
+        with self._lock:
+            if warmup_error is None:
+                self._warm += 1
+            else:
+                self._warmup_errors.append(f"{name}: {warmup_error}")
+            if self._warm + len(self._warmup_errors) == self.num_workers:
+                self._ready.set()
+        if warmup_error is None:
+            logger.info(f"Service {name} warmed up")
+
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self._busy += 1
+            job.status = "running"
+            job.worker = name
+            job.started_at = time.time()
+            try:
+                if warmup_error is not None:
+                    raise RuntimeError(warmup_error)
+                runner = build_runner(
+                    job.mode,
+                    question=job.question,
+                    llm=None if job.llm_overrides else llms,
+                    llm_overrides=job.llm_overrides,
+                )
+                result, job.trace_id = run_traced(runner, self.langfuse, question=job.question)
+                job.result = str(result)
+                job.status = "succeeded"
+            except Exception as e:
+                logger.error(f"Job {job.job_id} failed: {e}", exc_info=True)
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    self._busy -= 1
+                    if job.status == "succeeded":
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+                job.future.set_result(job)
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        if not message.get("more_body"):
+            return body
+
+
+async def _respond(send, status: int, payload: Dict[str, Any], headers=None) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    raw_headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    raw_headers += [(key.encode(), str(value).encode()) for key, value in (headers or {}).items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_app(service: Optional[ResearchService] = None):
+    """Create the ASGI application around a research service.
+
+    The service is started on ASGI lifespan startup (or on the first request
+    if the server does not send lifespan events) and stopped on shutdown.
+
+    Args:
+        service: Service to expose; a default-configured one is created if None
+
+    Returns:
+        callable: ASGI application
+    """
+    service = service or ResearchService()
+    started = threading.Event()
+    start_lock = threading.Lock()
+
+    def ensure_started():
+        with start_lock:
+            if not started.is_set():
+                service.start()
+                started.set()
+
+    async def create_job(receive, send):
+        try:
+            payload = json.loads(await _read_body(receive) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("Request body must be a JSON object")
+            timeout = parse_wait(payload.get("wait"))
+            job = service.submit(
+                str(payload.get("question") or ""),
+                payload.get("mode") or RESEARCH_MODE,
+                payload.get("llm"),
+            )
+        except QueueFullError as e:
+            await _respond(send, 429, {"error": str(e)}, {"retry-after": 5})
+            return
+        except ValueError as e:
+            await _respond(send, 400, {"error": str(e)})
+            return
+
+        if timeout is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), timeout)
+            except asyncio.TimeoutError:
+                pass
+        await _respond(send, 200 if job.future.done() else 202, job.to_dict())
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    try:
+                        await asyncio.to_thread(ensure_started)
+                    except Exception as e:
+                        await send({"type": "lifespan.startup.failed", "message": str(e)})
+                        return
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await asyncio.to_thread(service.stop, 30)
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+        if not started.is_set():
+            await asyncio.to_thread(ensure_started)
+
+        method, path = scope["method"], scope["path"].rstrip("/")
+        if path == "/health" and method == "GET":
+            await _respond(send, 200, service.health())
+        elif path == "/jobs" and method == "POST":
+            await create_job(receive, send)
+        elif path.startswith("/jobs/") and method == "GET":
+            job = service.get(path[len("/jobs/"):])
+            if job is None:
+                await _respond(send, 404, {"error": "Unknown job ID"})
+            else:
+                await _respond(send, 200, job.to_dict())
+        else:
+            await _respond(send, 404, {"error": f"No route for {method} {path}"})
+
+    app.service = service
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the multi-agent system over HTTP")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument(
+        "--workers", type=int, default=SERVICE_WORKERS, help="Warm worker threads"
+    )
+    parser.add_argument(
+        "--queue-size", type=int, default=SERVICE_QUEUE_SIZE, help="Maximum queued jobs"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("The HTTP service requires uvicorn: pip install uvicorn")
+
+    setup_logging()
+    app = create_app(ResearchService(workers=args.workers, queue_size=args.queue_size))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Startup benchmark for the multi-agent system.
+
+Measures how long each module takes to import in a fresh interpreter, so
+regressions in cold-start time (heavy imports moved back to module level,
+objects built at import) show up before they reach short-lived jobs and
+autoscaled containers. Each module is imported ``--repeat`` times in a new
+process with ``python -X importtime``; the report lists the median wall
+time, the module's own cumulative import time and its heaviest direct
+imports.
+
+Usage:
+    python startup_benchmark.py
+    python startup_benchmark.py tools main --repeat 10 --json
+    python startup_benchmark.py --budget 0.5 config logger main
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MODULES = (
+    "config",
+    "logger",
+    "main",
+    "tools",
+    "agents_and_tasks_v05",
+    "research_modes",
+)
+
+# Commands timed end to end in addition to plain imports
+DEFAULT_COMMANDS = {
+    "main.py --help": ["main.py", "--help"],
+}
+
+
+def _parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse ``-X importtime`` output into name/depth/cumulative_us records."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative_us, name = parts[1], parts[2]
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        records.append({
+            "name": name.strip(),
+            "depth": depth,
+            "cumulative_us": int(cumulative_us),
+        })
+    return records
+
+
+def _run(args: Sequence[str], importtime: bool = False) -> Dict[str, Any]:
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + list(args)
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=SRC_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "returncode": completed.returncode, "stderr": completed.stderr}
+
+
+def measure_module(module: str, repeat: int = 5, top: int = 5) -> Dict[str, Any]:
+    """Measure the cold import time of one module.
+
+    Args:
+        module: Module name importable from the src directory
+        repeat: Number of fresh interpreters to average over
+        top: Number of heaviest direct imports to report
+
+    Returns:
+        dict: Wall and import timings in seconds plus the heaviest imports
+    """
+    walls, cumulative, heaviest = [], [], {}
+    error = None
+    for _ in range(repeat):
+        result = _run(["-c", f"import {module}"], importtime=True)
+        if result["returncode"] != 0:
+            error = result["stderr"].strip().splitlines()[-1] if result["stderr"] else "failed"
+            break
+        walls.append(result["seconds"])
+        # importtime lists a module after its imports, so the module's direct
+        # imports are the depth-1 records since the previous top-level record
+        children: List[Dict[str, Any]] = []
+        for record in _parse_importtime(result["stderr"]):
+            if record["depth"] == 1:
+                children.append(record)
+            elif record["depth"] == 0:
+                if record["name"] == module:
+                    cumulative.append(record["cumulative_us"] / 1e6)
+                    for child in children:
+                        heaviest.setdefault(child["name"], []).append(child["cumulative_us"] / 1e6)
+                children = []
+
+    if error:
+        return {"module": module, "error": error}
+    ranked = sorted(
+        ((name, statistics.median(times)) for name, times in heaviest.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    return {
+        "module": module,
+        "wall_seconds": round(statistics.median(walls), 4),
+        "wall_seconds_min": round(min(walls), 4),
+        "import_seconds": round(statistics.median(cumulative), 4),
+        "heaviest_imports": [
+            {"module": name, "seconds": round(seconds, 4)} for name, seconds in ranked[:top]
+        ],
+    }
+
+
+def measure_command(name: str, args: Sequence[str], repeat: int = 5) -> Dict[str, Any]:
+    """Measure the wall time of a command run in a fresh interpreter."""
+    walls = []
+    for _ in range(repeat):
+        result = _run(args)
+        if result["returncode"] != 0:
+            return {"command": name, "error": result["stderr"].strip().splitlines()[-1]}
+        walls.append(result["seconds"])
+    return {
+        "command": name,
+        "wall_seconds": round(statistics.median(walls), 4),
+        "wall_seconds_min": round(min(walls), 4),
+    }
+
+
+def run_benchmark(modules: Sequence[str], repeat: int = 5) -> Dict[str, Any]:
+    """Measure every module and the default commands."""
+    return {
+        "python": sys.version.split()[0],
+        "repeat": repeat,
+        "modules": [measure_module(module, repeat) for module in modules],
+        "commands": [
+            measure_command(name, args, repeat) for name, args in DEFAULT_COMMANDS.items()
+        ],
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"Cold import times (median of {report['repeat']} runs, Python {report['python']})")
+    print(f"{'module':<24} {'wall s':>8} {'import s':>9}  heaviest imports")
+    for row in report["modules"]:
+        if "error" in row:
+            print(f"{row['module']:<24} {'ERROR':>8}  {row['error']}")
+            continue
+        heaviest = ", ".join(
+            f"{item['module']} {item['seconds']:.3f}" for item in row["heaviest_imports"][:3]
+        )
+        print(
+            f"{row['module']:<24} {row['wall_seconds']:>8.3f} "
+            f"{row['import_seconds']:>9.3f}  {heaviest}"
+        )
+    for row in report["commands"]:
+        if "error" in row:
+            print(f"{row['command']:<24} {'ERROR':>8}  {row['error']}")
+        else:
+            print(f"{row['command']:<24} {row['wall_seconds']:>8.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import times")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="Fail if any module's median wall time exceeds this many seconds",
+    )
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.modules, repeat=max(1, args.repeat))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.budget is not None:
+        over = [
+            row["module"] for row in report["modules"]
+            if "error" in row or row["wall_seconds"] > args.budget
+        ]
+        if over:
+            print(f"Import-time budget of {args.budget}s exceeded by: {', '.join(over)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Streaming of agent output while a run is in progress.
+
+With streaming enabled the LLM emits every generated chunk on CrewAI's event
+bus, alongside tool and task events. This module subscribes to those events
+once and forwards them, as plain dicts, to the sink registered for the
+current run. Sinks are bound with a context variable, so concurrent runs in
+the batch runner or the HTTP service each see only their own events.
+
+Event dicts:
+    {"type": "task_start", "agent": ..., "task": ...}
+    {"type": "token", "agent": ..., "text": ...}
+    {"type": "tool_start", "agent": ..., "tool": ..., "args": ...}
+    {"type": "tool_end", "agent": ..., "tool": ..., "from_cache": ...}
+    {"type": "task_end", "agent": ..., "text": ...}
+"""
+import asyncio
+import contextvars
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+StreamSink = Callable[[Dict[str, Any]], None]
+
+_current_sink: contextvars.ContextVar[Optional[StreamSink]] = contextvars.ContextVar(
+    "stream_sink", default=None
+)
+_handlers_registered = False
+_handlers_lock = threading.Lock()
+
+
+def _emit(event: Dict[str, Any]) -> None:
+    sink = _current_sink.get()
+    if sink is None:
+        return
+    try:
+        sink(event)
+    except Exception as e:
+        # A failing consumer must never break the run it is watching
+        logger.warning(f"Stream sink failed: {e}")
+
+
+def _register_handlers() -> None:
+    """Subscribe to CrewAI's event bus (once per process)."""
+    global _handlers_registered
+    with _handlers_lock:
+        if _handlers_registered:
+            return
+        from crewai.events.event_bus import crewai_event_bus
+        from crewai.events.types.llm_events import LLMStreamChunkEvent
+        from crewai.events.types.task_events import TaskCompletedEvent, TaskStartedEvent
+        from crewai.events.types.tool_usage_events import (
+            ToolUsageFinishedEvent,
+            ToolUsageStartedEvent,
+        )
+
+        # Chunk handlers run synchronously in the emitting thread and the
+        # others on the bus executor with a copy of the emitter's context, so
+        # _current_sink resolves to the sink of the run that produced the event
+
+        @crewai_event_bus.on(LLMStreamChunkEvent)
+        def on_chunk(source, event):
+            if event.chunk and event.tool_call is None:
+                _emit({"type": "token", "agent": event.agent_role, "text": event.chunk})
+
+        @crewai_event_bus.on(ToolUsageStartedEvent)
+        def on_tool_start(source, event):
+            _emit({
+                "type": "tool_start",
+                "agent": event.agent_role,
+                "tool": event.tool_name,
+                "args": event.tool_args,
+            })
+
+        @crewai_event_bus.on(ToolUsageFinishedEvent)
+        def on_tool_end(source, event):
+            _emit({
+                "type": "tool_end",
+                "agent": event.agent_role,
+                "tool": event.tool_name,
+                "from_cache": event.from_cache,
+            })
+
+        @crewai_event_bus.on(TaskStartedEvent)
+        def on_task_start(source, event):
+            task = event.task
+            _emit({
+                "type": "task_start",
+                "agent": getattr(getattr(task, "agent", None), "role", None),
+                "task": getattr(task, "name", None) or getattr(task, "description", "")[:80],
+            })
+
+        @crewai_event_bus.on(TaskCompletedEvent)
+        def on_task_end(source, event):
+            _emit({"type": "task_end", "agent": event.output.agent, "text": event.output.raw})
+
+        _handlers_registered = True
+
+
+@contextmanager
+def stream_to(sink: StreamSink):
+    """Send the stream events of runs started in this context to ``sink``.
+
+    The LLMs must be created with streaming enabled
+    (``get_agent_llms(stream=True)``) for token events to be produced.
+
+    Args:
+        sink: Callable receiving each event dict; called from worker threads
+    """
+    _register_handlers()
+    token = _current_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _current_sink.reset(token)
+
+
+class ConsoleStreamSink:
+    """Print tokens and researcher steps to the console as they arrive.
+
+    Also records the time to the first token, which is logged by ``main``.
+    """
+
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+        self.started = time.perf_counter()
+        self.first_token_seconds: Optional[float] = None
+        self._agent: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _header(self, agent: Optional[str]) -> None:
+        if agent and agent != self._agent:
+            self._agent = agent
+            self.out.write(f"\n\n[{agent}]\n")
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            kind = event["type"]
+            if kind == "token":
+                if self.first_token_seconds is None:
+                    self.first_token_seconds = time.perf_counter() - self.started
+                self._header(event.get("agent"))
+                self.out.write(event["text"])
+            elif kind == "tool_start":
+                self._header(event.get("agent"))
+                self.out.write(f"\n  -> {event['tool']}: {event['args']}\n")
+            elif kind == "tool_end" and event.get("from_cache"):
+                self.out.write(f"  <- {event['tool']} (cached)\n")
+            elif kind == "task_start":
+                self._header(event.get("agent"))
+            self.out.flush()
+
+
+async def astream_run(run: Callable[[], Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Run a blocking workflow in a thread and yield its events as they arrive.
+
+    Example:
+        async for event in astream_run(lambda: runner.kickoff()):
+            if event["type"] == "token":
+                ...
+
+    Args:
+        run: Callable that executes the workflow, e.g. ``runner.kickoff``
+
+    Yields:
+        dict: Stream events, ending with ``{"type": "result", "result": ...}``
+
+    Raises:
+        Exception: Any error raised by ``run``, after the events before it
+    """
+    loop = asyncio.get_running_loop()
+    events: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+
+    def sink(event: Dict[str, Any]) -> None:
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def target():
+        with stream_to(sink):
+            return run()
+
+    future = loop.run_in_executor(None, contextvars.copy_context().run, target)
+    # Scheduled after every event the run queued, so nothing is cut off
+    future.add_done_callback(lambda _: events.put_nowait(None))
+    while True:
+        event = await events.get()
+        if event is None:
+            break
+        yield event
+    yield {"type": "result", "result": await future}
@@ -0,0 +1,254 @@
+"""Typed task outputs and local JSON repair.
+
+The research and review tasks declare their output models
+(``ResearchOutput``, ``ReviewOutput``) as structured output. When an agent
+answers in prose around its JSON, CrewAI's default is to ask the LLM again
+to convert the text. ``RepairingConverter`` first tries a local repair
+pass (``repair_json``): strip code fences, parse, extract the first
+balanced object, drop trailing commas, and finally read Python-style
+literals. Only output that still fails to validate is re-prompted.
+
+Every conversion is counted (``structured_output_metrics``): outputs that
+were valid as returned, repaired locally, re-prompted, and failed.
+"""
+import ast
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+from crewai.utilities.converter import Converter, ConverterError
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*(.*?)\s*```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+class StructuredOutput(BaseModel):
+    """Base for task output models; ``str()`` gives compact JSON like the raw output did."""
+
+    def __str__(self) -> str:
+        return self.model_dump_json()
+
+
+class Source(BaseModel):
+    """One source behind the final answer."""
+
+    type: str = Field(description='Where it came from: "serper", "local" or "user"')
+    detail: str = Field(description="Domain, document or snippet")
+    role: str = Field(default="", description="How it contributed to the answer")
+
+
+class ResearchOutput(StructuredOutput):
+    """Output of the research task."""
+
+    user_question: str = Field(description="The question the user asked")
+    search_query: Union[str, List[str]] = Field(
+        default="", description="The search query or queries used"
+    )
+    search_results: Union[List[Any], Dict[str, Any], str] = Field(
+        default_factory=list, description="Relevant results from the searches"
+    )
+    provisional_answer: str = Field(description="Draft answer to the question")
+
+
+class ReviewOutput(StructuredOutput):
+    """Output of the review task (and of the single-pass fast task)."""
+
+    final_answer: str = Field(description="Comprehensive answer to the user's question")
+    sources: List[Source] = Field(default_factory=list, description="Sources of the answer")
+
+    @field_validator("sources", mode="before")
+    @classmethod
+    def _sources_from_strings(cls, value: Any) -> Any:
+        # Models sometimes list sources as plain strings
+        if isinstance(value, list):
+            return [
+                {"type": "other", "detail": item} if isinstance(item, str) else item
+                for item in value
+            ]
+        return value
+
+
+def _balanced_object(text: str) -> Optional[str]:
+    """Return the first balanced ``{...}`` in ``text``, ignoring braces inside strings."""
+    start = text.find("{")
+    while start != -1:
+        depth, in_string, escaped = 0, False, False
+        for index in range(start, len(text)):
+            char = text[index]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[start:index + 1]
+        start = text.find("{", start + 1)
+    return None
+
+
+def _loads(text: str) -> Optional[Any]:
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        return None
+
+
+def repair_json(text: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """Parse a JSON object from model output, repairing common defects locally.
+
+    Args:
+        text: Raw agent output
+
+    Returns:
+        tuple: The parsed object (None if it could not be recovered) and the
+            repairs that were needed (empty if the text was valid JSON)
+    """
+    steps: List[str] = []
+    text = text.strip()
+    parsed = _loads(text)
+    if isinstance(parsed, dict):
+        return parsed, steps
+
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+        steps.append("strip_fences")
+        parsed = _loads(text)
+        if isinstance(parsed, dict):
+            return parsed, steps
+
+    candidate = _balanced_object(text)
+    if candidate is None:
+        return None, steps
+    if candidate != text:
+        steps.append("extract_object")
+        parsed = _loads(candidate)
+        if isinstance(parsed, dict):
+            return parsed, steps
+
+    uncommaed = _TRAILING_COMMA.sub(r"\1", candidate)
+    if uncommaed != candidate:
+        steps.append("trailing_commas")
+        parsed = _loads(uncommaed)
+        if isinstance(parsed, dict):
+            return parsed, steps
+
+    # Single quotes, True/False/None: a Python dict literal
+    try:
+        parsed = ast.literal_eval(uncommaed)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None, steps
+    if isinstance(parsed, dict):
+        steps.append("python_literal")
+        return json.loads(json.dumps(parsed, default=str)), steps
+    return None, steps
+
+
+_metrics = {"converted": 0, "valid": 0, "repaired": 0, "invalid_json": 0, "reprompts": 0, "failed": 0}
+_metrics_lock = threading.Lock()
+
+
+def _count(**increments: int) -> None:
+    with _metrics_lock:
+        for key, value in increments.items():
+            _metrics[key] += value
+
+
+def structured_output_metrics() -> Dict[str, int]:
+    """Return process-wide counters of structured output conversions.
+
+    Returns:
+        dict: ``converted`` outputs, of which ``valid`` as returned,
+            ``repaired`` locally, with ``invalid_json`` (no JSON object even
+            after repair); ``reprompts`` sent to the LLM and conversions that ``failed``
+    """
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def validate_locally(text: str, model: Type[BaseModel]) -> Optional[BaseModel]:
+    """Validate ``text`` as ``model`` after local repair; None if it cannot be.
+
+    Counts the conversion as valid or repaired, or as invalid JSON.
+    """
+    parsed, steps = repair_json(text)
+    _count(converted=1)
+    if parsed is None:
+        _count(invalid_json=1)
+        return None
+    try:
+        output = model.model_validate(parsed)
+    except ValidationError as e:
+        logger.info(f"{model.__name__} output does not match its schema: {e.error_count()} error(s)")
+        return None
+    if steps:
+        _count(repaired=1)
+        logger.info(f"{model.__name__} output repaired locally ({', '.join(steps)})")
+    else:
+        _count(valid=1)
+    return output
+
+
+class RepairingConverter(Converter):
+    """Converter that repairs task output locally before re-prompting the LLM.
+
+    Set as a task's ``converter_cls``. CrewAI's own conversion (an LLM call
+    with the output and the model's schema, retried up to ``max_attempts``)
+    only runs when local repair and validation fail; each of its calls is
+    counted as a re-prompt. If that fails too, the task keeps its raw output
+    instead of failing the run.
+    """
+
+    def to_pydantic(self, current_attempt: int = 1) -> Union[BaseModel, ConverterError]:
+        if current_attempt == 1:
+            output = validate_locally(self.text, self.model)
+            if output is not None:
+                return output
+        _count(reprompts=1)
+        try:
+            return super().to_pydantic(current_attempt)
+        except ConverterError as e:
+            if current_attempt > 1:
+                raise
+            return self._failed(e)
+
+    async def ato_pydantic(self, current_attempt: int = 1) -> Union[BaseModel, ConverterError]:
+        if current_attempt == 1:
+            output = validate_locally(self.text, self.model)
+            if output is not None:
+                return output
+        _count(reprompts=1)
+        try:
+            return await super().ato_pydantic(current_attempt)
+        except ConverterError as e:
+            if current_attempt > 1:
+                raise
+            return self._failed(e)
+
+    def to_json(self, current_attempt: int = 1) -> Union[str, ConverterError, Any]:
+        if current_attempt == 1:
+            output = validate_locally(self.text, self.model)
+            if output is not None:
+                return output.model_dump_json()
+        _count(reprompts=1)
+        result = super().to_json(current_attempt)
+        if current_attempt == 1 and isinstance(result, ConverterError):
+            return self._failed(result)
+        return result
+
+    def _failed(self, error: ConverterError) -> ConverterError:
+        _count(failed=1)
+        logger.warning(f"{self.model.__name__} conversion failed, keeping the raw output: {error}")
+        return error
@@ -2,61 +2,695 @@
 
 Provides web search and user interaction capabilities.
 """
-from crewai_tools import SerperDevTool
-from crewai.tools import tool
-from config import SERPER_API_KEY
+import os
+import threading
+from typing import Any, Dict, List, Optional, Type
+from crewai.tools import BaseTool, tool
+from pydantic import BaseModel, Field, PrivateAttr
+from answer_providers import AnswerProvider, ConsoleAnswerProvider
+from cache_store import DiskCache
+from cassette import Cassette, get_cassette, replaying
+from config import (
+    SERPER_API_KEY,
+    ASK_USER_TIMEOUT_SECONDS,
+    ASK_USER_DEFAULT_ANSWER,
+    SEARCH_CACHE_ENABLED,
+    SEARCH_CACHE_PATH,
+    SEARCH_CACHE_TTL_SECONDS,
+    SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_CACHE_MAX_BYTES,
+    SEARCH_BACKEND,
+    LOCAL_SEARCH_RESULTS,
+    SEARCH_COMPACTION_ENABLED,
+    SEARCH_TOKEN_BUDGET,
+    SEARCH_DEDUPE_THRESHOLD,
+    MULTI_SEARCH_ENABLED,
+    MULTI_SEARCH_MAX_QUERIES,
+    MULTI_SEARCH_RESULTS_PER_QUERY,
+    MULTI_SEARCH_MAX_RESULTS,
+    SERPER_URL,
+)
 from logger import get_logger
+from run_budget import TOOL_BUDGET_NOTICE, current_budget, tool_call_key, waiting_for_user
+from run_timing import mark, timed
 
 logger = get_logger(__name__)
 
-# Web search tool using Serper API
-try:
-    if not SERPER_API_KEY:
-        raise ValueError("SERPER_API_KEY not found in environment variables")
-    
-    search_tool = SerperDevTool(api_key=SERPER_API_KEY)
-    logger.info("Serper search tool initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Serper tool: {e}")
-    raise
-
-
-@tool("Ask User")
-def ask_user(question: str) -> str:
-    """Ask the human user a question in the console and return their exact answer.
-    
+# Lazily created search objects (see get_search_tool and __getattr__)
+_search_objects: Dict[str, Any] = {}
+_search_objects_lock = threading.RLock()
+
+
+def normalize_query(query: str) -> str:
+    """Reduce a search query to a canonical form for cache lookups.
+
+    Lowercases, strips the punctuation around words and collapses
+    whitespace. Word order and question words are kept: "flights from london
+    to new york" and "who founded apple" mean something else reordered or
+    reworded, so they must not share a cache entry.
+
     Args:
-        question: The question to ask the user
-        
+        query: Raw search query
+
     Returns:
-        str: The user's response
-        
+        str: Normalized query
+    """
+    words = [word.strip(".,;:!?\"'()[]") for word in query.lower().split()]
+    return " ".join(word for word in words if word)
+
+
+def is_search_result(result: Any) -> bool:
+    """Return True if ``result`` is a search payload worth caching.
+
+    Error and notice strings (e.g. a tool usage limit) and payloads that
+    report failed queries are not.
+    """
+    return isinstance(result, dict) and bool(result) and not result.get("error") and not result.get("errors")
+
+
+class CachedSearchTool(BaseTool):
+    """Search tool that serves repeated queries from a persistent cache.
+
+    Wraps another search tool (normally ``search_tool``) and exposes the same
+    name, description and argument schema, so agents use it as a drop-in
+    replacement. Results are keyed on the tool name, every normalized call
+    argument and the wrapped tool's search settings, so a multi-search's
+    query list or a local and a web search for the same query never share
+    an entry.
+    """
+
+    name: str = "Search the internet with Serper"
+    description: str = "Search the internet and return relevant results."
+    inner: Any = None
+    cache: Any = None
+
+    @classmethod
+    def wrap(cls, inner: BaseTool, cache: DiskCache) -> "CachedSearchTool":
+        """Create a caching wrapper around an existing search tool.
+
+        Args:
+            inner: Search tool that performs the actual request
+            cache: Store used for results
+
+        Returns:
+            CachedSearchTool: Tool that mirrors ``inner``'s interface
+        """
+        return cls(
+            name=inner.name,
+            description=inner.description,
+            args_schema=inner.args_schema,
+            inner=inner,
+            cache=cache,
+        )
+
+    def cache_key(self, **kwargs: Any) -> str:
+        """Build the cache key for a tool call and the wrapped tool's settings."""
+        arguments = {
+            "search_type": getattr(self.inner, "search_type", ""),
+            "n_results": getattr(self.inner, "n_results", ""),
+            "country": getattr(self.inner, "country", ""),
+            "location": getattr(self.inner, "location", ""),
+            "locale": getattr(self.inner, "locale", ""),
+        }
+        arguments.update(kwargs)
+        return "search:" + tool_call_key(self.name, arguments)
+
+    def _run(self, **kwargs: Any) -> Any:
+        search_query = kwargs.get("search_query") or kwargs.get("query") or kwargs.get("queries") or ""
+        key = self.cache_key(**kwargs)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"Search cache hit: {search_query}")
+            mark(cache_hit=True)
+            return cached
+
+        logger.info(f"Search cache miss: {search_query}")
+        mark(cache_hit=False)
+        result = self.inner.run(**kwargs)
+        if not is_search_result(result):
+            logger.info(f"Not caching unsuccessful search result for: {search_query}")
+            return result
+        try:
+            self.cache.set(key, result)
+        except Exception as e:
+            # A broken cache must never fail the search itself
+            logger.warning(f"Failed to store search result in cache: {e}")
+        return result
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this tool's cache."""
+        return self.cache.stats()
+
+
+class TimedTool(BaseTool):
+    """Tool wrapper that records each call in the current run's timeline.
+
+    Mirrors the wrapped tool's name, description and argument schema. Cache
+    layers underneath mark the recorded call as a hit or miss (see
+    ``run_timing.mark``). Outside ``run_timing.record_timeline`` it only
+    forwards calls.
+    """
+
+    name: str = "Timed tool"
+    description: str = "Run the wrapped tool."
+    inner: Any = None
+
+    @classmethod
+    def wrap(cls, inner: BaseTool) -> BaseTool:
+        """Create a timing wrapper around a tool (returned as-is if already wrapped)."""
+        if isinstance(inner, cls):
+            return inner
+        return cls(
+            name=inner.name,
+            description=inner.description,
+            args_schema=inner.args_schema,
+            inner=inner,
+        )
+
+    def _run(self, **kwargs: Any) -> Any:
+        with timed("tool", self.name):
+            return self.inner.run(**kwargs)
+
+
+class LoopGuardTool(BaseTool):
+    """Tool wrapper that enforces the run's loop budget (see run_budget.py).
+
+    A call that repeats an earlier call of the run gets the earlier result;
+    once the run's or the agent's budget is exhausted, calls return a notice
+    asking for the final answer instead of running. Outside
+    ``run_budget.enforce_budget`` it only forwards calls.
+    """
+
+    name: str = "Loop guard tool"
+    description: str = "Run the wrapped tool."
+    inner: Any = None
+    scope: Optional[str] = None
+
+    @classmethod
+    def wrap(cls, inner: BaseTool, scope: Optional[str] = None) -> BaseTool:
+        """Create a loop guard around a tool whose calls count against ``scope``.
+
+        ``scope`` is the using agent's ``run_budget.agent_scope`` (or role).
+        The tool is returned as-is if already wrapped.
+        """
+        if isinstance(inner, cls):
+            return inner
+        return cls(
+            name=inner.name,
+            description=inner.description,
+            args_schema=inner.args_schema,
+            inner=inner,
+            scope=scope,
+        )
+
+    def _run(self, **kwargs: Any) -> Any:
+        budget = current_budget()
+        if budget is None:
+            return self.inner.run(**kwargs)
+        reason = budget.exhausted(self.scope)
+        if reason:
+            logger.warning(f"Loop budget exhausted ({reason}), refusing {self.name} call")
+            return TOOL_BUDGET_NOTICE.format(reason=reason)
+        budget.add_tool_call(self.scope)
+        key = tool_call_key(self.name, kwargs)
+        earlier = budget.earlier_result(key)
+        if earlier is not None:
+            logger.info(f"Repeated {self.name} call answered with the earlier result: {kwargs}")
+            mark(repeated=True)
+            return earlier
+        result = self.inner.run(**kwargs)
+        budget.remember(key, result)
+        return result
+
+
+class CassetteTool(BaseTool):
+    """Tool wrapper that records calls to a cassette or replays them from it.
+
+    Calls are matched on the tool name and arguments. When the cassette is
+    replaying, the wrapped tool is never run, so searches make no request
+    and ask_user asks nobody (see cassette.py).
+    """
+
+    name: str = "Cassette tool"
+    description: str = "Run the wrapped tool."
+    inner: Any = None
+    cassette: Any = None
+
+    @classmethod
+    def wrap(cls, inner: BaseTool, cassette: Cassette) -> BaseTool:
+        """Create a record/replay wrapper around a tool (returned as-is if already wrapped)."""
+        if isinstance(inner, cls):
+            return inner
+        return cls(
+            name=inner.name,
+            description=inner.description,
+            args_schema=inner.args_schema,
+            inner=inner,
+            cassette=cassette,
+        )
+
+    def _run(self, **kwargs: Any) -> Any:
+        return self.cassette.play(
+            "tool", {"tool": self.name, "args": kwargs}, lambda: self.inner.run(**kwargs)
+        )
+
+
+def cassette_tool(inner: BaseTool) -> BaseTool:
+    """Wrap a tool in a CassetteTool for the active cassette, if there is one."""
+    cassette = get_cassette()
+    return inner if cassette is None else CassetteTool.wrap(inner, cassette)
+
+
+class PrefetchedSearchTool(BaseTool):
+    """Search tool that answers from the run's speculative searches when one fits.
+
+    Wraps the web search tool; queries without a close enough speculative
+    search (see prefetch.SearchPrefetcher) go to the wrapped tool.
+    """
+
+    name: str = "Search the internet with Serper"
+    description: str = "Search the internet and return relevant results."
+    inner: Any = None
+    prefetcher: Any = None
+
+    @classmethod
+    def wrap(cls, inner: BaseTool, prefetcher) -> "PrefetchedSearchTool":
+        """Create a wrapper that consults ``prefetcher`` before ``inner``."""
+        return cls(
+            name=inner.name,
+            description=inner.description,
+            args_schema=inner.args_schema,
+            inner=inner,
+            prefetcher=prefetcher,
+        )
+
+    def _run(self, **kwargs: Any) -> Any:
+        search_query = kwargs.get("search_query") or kwargs.get("query") or ""
+        result = self.prefetcher.take(search_query)
+        if result is not None:
+            mark(prefetched=True)
+            return result
+        return self.inner.run(**kwargs)
+
+
+class BudgetedSearchTool(BaseTool):
+    """Search tool that allows at most a fixed number of searches.
+
+    Once the budget is spent, further calls return a notice telling the agent
+    to answer with the evidence it already has instead of searching again.
+    """
+
+    name: str = "Search the internet with Serper"
+    description: str = "Search the internet and return relevant results."
+    inner: Any = None
+    max_calls: int = 3
+    calls: int = 0
+
+    @classmethod
+    def wrap(cls, inner: BaseTool, max_calls: int) -> "BudgetedSearchTool":
+        """Create a budgeted wrapper around an existing search tool.
+
+        Args:
+            inner: Search tool that performs the actual request
+            max_calls: Number of searches allowed
+
+        Returns:
+            BudgetedSearchTool: Tool that mirrors ``inner``'s interface
+        """
+        return cls(
+            name=inner.name,
+            description=inner.description,
+            args_schema=inner.args_schema,
+            inner=inner,
+            max_calls=max_calls,
+        )
+
+    def _run(self, **kwargs: Any) -> Any:
+        if self.calls >= self.max_calls:
+            logger.info(f"Search budget of {self.max_calls} exhausted")
+            return (
+                f"Search budget exhausted ({self.max_calls} searches). "
+                "Answer using the results you already have."
+            )
+        self.calls += 1
+        return self.inner.run(**kwargs)
+
+
+class CompactedSearchTool(BaseTool):
+    """Search tool that compacts results before they enter the agent's prompt.
+
+    Wraps another search tool and passes its output through
+    ``search_compaction.compact_results``: near-duplicate snippets are
+    dropped, the rest are reranked against the query (and the clarified
+    question, when known) and trimmed to a token budget.
+    """
+
+    name: str = "Search the internet with Serper"
+    description: str = "Search the internet and return relevant results."
+    inner: Any = None
+    token_budget: int = SEARCH_TOKEN_BUDGET
+    dedupe_threshold: float = SEARCH_DEDUPE_THRESHOLD
+    context: Optional[str] = None
+    totals: Dict[str, int] = Field(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def wrap(
+        cls,
+        inner: BaseTool,
+        context: Optional[str] = None,
+        token_budget: int = SEARCH_TOKEN_BUDGET,
+        dedupe_threshold: float = SEARCH_DEDUPE_THRESHOLD,
+    ) -> "CompactedSearchTool":
+        """Create a compacting wrapper around an existing search tool.
+
+        Args:
+            inner: Search tool that performs the actual request
+            context: Question the results are also ranked against
+            token_budget: Maximum estimated tokens per search result
+            dedupe_threshold: Similarity at which snippets count as duplicates
+
+        Returns:
+            CompactedSearchTool: Tool that mirrors ``inner``'s interface
+        """
+        return cls(
+            name=inner.name,
+            description=inner.description,
+            args_schema=inner.args_schema,
+            inner=inner,
+            context=context,
+            token_budget=token_budget,
+            dedupe_threshold=dedupe_threshold,
+        )
+
+    def _run(self, **kwargs: Any) -> Any:
+        from search_compaction import compact_results
+
+        search_query = (
+            kwargs.get("search_query")
+            or kwargs.get("query")
+            or " ".join(kwargs.get("queries") or [])
+        )
+        result = self.inner.run(**kwargs)
+        compacted, stats = compact_results(
+            result,
+            search_query,
+            self.token_budget,
+            dedupe_threshold=self.dedupe_threshold,
+            context=self.context,
+        )
+        with self._lock:
+            for key, value in stats.items():
+                self.totals[key] = self.totals.get(key, 0) + value
+        logger.info(
+            f"Search compaction removed {stats['tokens_removed']} of "
+            f"{stats['original_tokens']} tokens ({stats['items_kept']}/{stats['items_in']} "
+            f"results kept, {stats['duplicates_removed']} duplicates) for: {search_query}"
+        )
+        return compacted
+
+    def compaction_stats(self) -> Dict[str, int]:
+        """Return token and result counts accumulated over all searches."""
+        with self._lock:
+            return dict(self.totals)
+
+
+class LocalSearchSchema(BaseModel):
+    """Input for LocalSearchTool."""
+
+    search_query: str = Field(..., description="Query to search the local documents")
+
+
+class LocalSearchTool(BaseTool):
+    """Search the local document index with BM25.
+
+    Results use the same shape as Serper's organic results (title, link,
+    snippet, position) so downstream processing treats both backends alike.
+    The index is opened, and incrementally refreshed, on first use.
+    """
+
+    name: str = "Search local documents"
+    description: str = (
+        "Search the local document collection (internal knowledge base) and return "
+        "the most relevant passages with their file paths."
+    )
+    args_schema: Type[BaseModel] = LocalSearchSchema
+    top_k: int = LOCAL_SEARCH_RESULTS
+
+    def _run(self, search_query: str, **kwargs: Any) -> Any:
+        from local_index import get_local_index
+
+        results = get_local_index().search(search_query, top_k=self.top_k)
+        logger.info(f"Local search returned {len(results)} passages for: {search_query}")
+        return {
+            "searchParameters": {"q": search_query, "type": "local"},
+            "organic": [
+                {
+                    "title": os.path.basename(result["path"]),
+                    "link": result["path"],
+                    "snippet": result["snippet"][:500],
+                    "position": position,
+                    "score": result["score"],
+                }
+                for position, result in enumerate(results, start=1)
+            ],
+        }
+
+
+class MultiSearchSchema(BaseModel):
+    """Input for MultiSearchTool."""
+
+    queries: List[str] = Field(
+        ...,
+        description="Different search queries to run together, e.g. one per aspect of the question",
+    )
+
+
+class MultiSearchTool(BaseTool):
+    """Run several web searches in one tool call.
+
+    Queries run concurrently on the shared ``SerperClient`` connection pool
+    and their results are merged into one deduplicated, Serper-shaped
+    payload. Individual queries are served from the search cache when it
+    is enabled, and only the misses go to the network.
+    """
+
+    name: str = "Search the internet with several queries"
+    description: str = (
+        f"Run up to {MULTI_SEARCH_MAX_QUERIES} different web searches at once and return their merged, "
+        "deduplicated results. Prefer this over repeated single searches when a question "
+        "needs more than one query."
+    )
+    args_schema: Type[BaseModel] = MultiSearchSchema
+    max_queries: int = MULTI_SEARCH_MAX_QUERIES
+    results_per_query: int = MULTI_SEARCH_RESULTS_PER_QUERY
+    max_results: int = MULTI_SEARCH_MAX_RESULTS
+    client: Any = None
+    cache: Any = None
+
+    def cache_key(self, query: str) -> str:
+        """Build the cache key for one query of a multi-search."""
+        return f"multi:{self.results_per_query}|{normalize_query(query)}"
+
+    def _run(self, queries: List[str], **kwargs: Any) -> Any:
+        from serper_client import get_serper_client, merge_search_results, unique_queries
+
+        if isinstance(queries, str):
+            queries = [queries]
+        queries = unique_queries(queries)
+        if not queries:
+            raise ValueError("At least one search query is required")
+        if len(queries) > self.max_queries:
+            logger.info(f"Multi-search truncated {len(queries)} queries to {self.max_queries}")
+            queries = queries[: self.max_queries]
+
+        payloads: Dict[str, Any] = {}
+        if self.cache is not None:
+            for query in queries:
+                cached = self.cache.get(self.cache_key(query))
+                if cached is not None:
+                    payloads[query] = cached
+        misses = [query for query in queries if query not in payloads]
+        mark(cache_hits=len(queries) - len(misses), cache_misses=len(misses))
+
+        errors: Dict[str, str] = {}
+        if misses:
+            client = self.client or get_serper_client()
+            results, errors = client.search_each(misses, self.results_per_query)
+            for query, result in zip(misses, results):
+                payloads[query] = result
+                if result is not None and self.cache is not None:
+                    try:
+                        self.cache.set(self.cache_key(query), result)
+                    except Exception as e:
+                        logger.warning(f"Failed to store search result in cache: {e}")
+
+        merged = merge_search_results(
+            queries, [payloads[query] for query in queries], max_results=self.max_results
+        )
+        if errors:
+            merged["errors"] = errors
+        logger.info(
+            f"Multi-search ran {len(queries)} queries ({len(queries) - len(misses)} cached, "
+            f"{len(errors)} failed): {len(merged.get('organic', []))} unique results"
+        )
+        return merged
+
+
+def get_search_tool() -> BaseTool:
+    """Return the Serper web search tool, creating it on first use.
+
+    crewai_tools is imported here rather than at module level because it is
+    by far the slowest import in the project.
+
     Raises:
-        ValueError: If question is empty or None
-        EOFError: If input stream is closed
-    """
-    if not question or not question.strip():
-        logger.error("Attempted to ask user an empty question")
-        raise ValueError("Question cannot be empty")
-    
-    try:
-        logger.info(f"Asking user: {question}")
-        print("\n[ENGINE QUESTION]", question)
-        answer = input("[YOUR ANSWER] ")
-        
-        if not answer.strip():
-            logger.warning("User provided empty answer")
-            return "No answer provided"
+        ValueError: If SERPER_API_KEY is not set (unless searches are replayed
+            from a cassette)
+    """
+    with _search_objects_lock:
+        if "search_tool" not in _search_objects:
+            if not SERPER_API_KEY and not replaying():
+                logger.error("Failed to initialize Serper tool: SERPER_API_KEY not set")
+                raise ValueError("SERPER_API_KEY not found in environment variables")
+            from crewai_tools import SerperDevTool
+
+            # SerperDevTool appends the search type ("/search") to its base URL
+            _search_objects["search_tool"] = SerperDevTool(
+                api_key=SERPER_API_KEY, base_url=SERPER_URL.rsplit("/", 1)[0]
+            )
+            logger.info("Serper search tool initialized successfully")
+        return _search_objects["search_tool"]
+
+
+def get_search_cache() -> Optional[DiskCache]:
+    """Return the persistent search cache, or None if it is disabled."""
+    if not SEARCH_CACHE_ENABLED:
+        return None
+    with _search_objects_lock:
+        if "search_cache" not in _search_objects:
+            _search_objects["search_cache"] = DiskCache(
+                SEARCH_CACHE_PATH,
+                max_entries=SEARCH_CACHE_MAX_ENTRIES,
+                max_bytes=SEARCH_CACHE_MAX_BYTES,
+                default_ttl=SEARCH_CACHE_TTL_SECONDS,
+            )
+            logger.info(f"Search cache enabled at {SEARCH_CACHE_PATH}")
+        return _search_objects["search_cache"]
+
+
+def get_research_search_tool() -> BaseTool:
+    """Return the web search tool handed to the researcher (cached unless disabled)."""
+    with _search_objects_lock:
+        if "research_search_tool" not in _search_objects:
+            cache = get_search_cache()
+            search = get_search_tool()
+            _search_objects["research_search_tool"] = (
+                CachedSearchTool.wrap(search, cache) if cache is not None else search
+            )
+        return _search_objects["research_search_tool"]
+
+
+def make_research_search_tools(question: Optional[str] = None, prefetcher=None) -> List[BaseTool]:
+    """Create the search tools for a researcher.
+
+    Selects the backends configured by SEARCH_BACKEND, adds the multi-query
+    web search when enabled and, when compaction is enabled, wraps each one
+    so its results are compacted before the agent sees them.
+
+    Args:
+        question: Question the results are reranked against, when known
+        prefetcher: The run's prefetch.SearchPrefetcher, whose speculative
+            results the web search tool is served from
+
+    Returns:
+        list: Search tools to hand to the researcher
+    """
+    if SEARCH_BACKEND == "local":
+        tools = [LocalSearchTool()]
+    else:
+        web_search = get_research_search_tool()
+        if prefetcher is not None:
+            web_search = PrefetchedSearchTool.wrap(web_search, prefetcher)
+        tools = [web_search, LocalSearchTool()] if SEARCH_BACKEND == "both" else [web_search]
+    if MULTI_SEARCH_ENABLED and SEARCH_BACKEND != "local":
+        tools.append(MultiSearchTool(cache=get_search_cache()))
+    if SEARCH_COMPACTION_ENABLED:
+        tools = [CompactedSearchTool.wrap(search, context=question) for search in tools]
+    return tools
+
+
+def __getattr__(name: str) -> Any:
+    """Create the module-level search objects on first access.
+
+    Keeps ``from tools import search_tool`` working while importing this
+    module stays cheap and does not require SERPER_API_KEY.
+    """
+    if name == "search_tool":
+        return get_search_tool()
+    if name == "search_cache":
+        return get_search_cache()
+    if name == "research_search_tool":
+        return get_research_search_tool()
+    if name == "research_search_tools":
+        return make_research_search_tools()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def make_ask_user_tool(provider: AnswerProvider, prefetcher=None):
+    """Create an ask_user tool that gets its answers from a provider.
+
+    Args:
+        provider: Source of answers (console, scripted, deferred or automatic)
+        prefetcher: The run's prefetch.SearchPrefetcher, told when a question
+            goes out and what the answer was
+
+    Returns:
+        BaseTool: The "Ask User" tool bound to the provider
+    """
+
+    @tool("Ask User")
+    def ask_user(question: str) -> str:
+        """Ask the human user a question in the console and return their exact answer.
         
-        logger.info(f"User answered: {answer[:100]}...")  # Log first 100 chars
-        return answer
+        Args:
+            question: The question to ask the user
+            
+        Returns:
+            str: The user's response
+            
+        Raises:
+            ValueError: If question is empty or None
+            EOFError: If input stream is closed
+        """
+        if not question or not question.strip():
+            logger.error("Attempted to ask user an empty question")
+            raise ValueError("Question cannot be empty")
         
-    except EOFError as e:
-        logger.error("Input stream closed while waiting for user input")
-        raise EOFError("Cannot read user input: input stream closed") from e
-    except KeyboardInterrupt:
-        logger.warning("User interrupted input with Ctrl+C")
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error while asking user: {e}")
-        raise
+        try:
+            logger.info(f"Asking user: {question}")
+            if prefetcher is not None:
+                prefetcher.on_ask(question)
+            with waiting_for_user():
+                answer = provider.ask(question)
+            if prefetcher is not None and answer != provider.default:
+                prefetcher.on_answer(answer)
+            logger.info(f"User answered: {answer[:100]}...")  # Log first 100 chars
+            return answer
+            
+        except EOFError:
+            raise
+        except KeyboardInterrupt:
+            logger.warning("User interrupted input with Ctrl+C")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error while asking user: {e}")
+            raise
+
+    return ask_user
+
+
+# Default ask_user tool: interactive console with configurable timeout
+ask_user = make_ask_user_tool(
+    ConsoleAnswerProvider(timeout=ASK_USER_TIMEOUT_SECONDS, default=ASK_USER_DEFAULT_ANSWER)
+)
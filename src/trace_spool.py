@@ -0,0 +1,481 @@
+"""Durable on-disk spool between the Langfuse client and the Langfuse host.
+
+The Langfuse client is pointed at a ``SpoolReceiver`` on 127.0.0.1 instead
+of the real host. The receiver appends every export request (OTLP span
+batches and score ingestion batches) to a SQLite spool and answers at
+once, so exporting never waits on the network and spans flushed while the
+process exits are on disk before it is gone. A ``SpoolForwarder`` thread
+drains the spool to ``LANGFUSE_HOST`` a few records at a time, backs off
+while the host is unreachable and picks up whatever a previous process
+left behind.
+
+The receiver only accepts requests carrying a token generated per process
+(``SPOOL_TOKEN_HEADER``), which ``start_trace_spool`` hands to the Langfuse
+client, so other local processes cannot write into the spool.
+
+Usage:
+    python trace_spool.py status    # records waiting and their size
+    python trace_spool.py drain     # forward everything now and exit
+"""
+import argparse
+import base64
+import json
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import (
+    LANGFUSE_HOST,
+    LANGFUSE_PUBLIC_KEY,
+    LANGFUSE_SECRET_KEY,
+    TRACE_SPOOL_PATH,
+    TRACE_SPOOL_MAX_BYTES,
+    TRACE_SPOOL_MAX_AGE_SECONDS,
+    TRACE_SPOOL_BATCH_SIZE,
+    TRACE_SPOOL_TIMEOUT_SECONDS,
+    TRACE_SPOOL_BACKOFF_BASE_SECONDS,
+    TRACE_SPOOL_BACKOFF_MAX_SECONDS,
+)
+from logger import get_logger
+from rate_control import backoff_delay
+
+logger = get_logger(__name__)
+
+# Export endpoints of the Langfuse API that are spooled
+SPOOLED_PATHS = ("/api/public/otel/v1/traces", "/api/public/ingestion")
+# Request headers stored with each record (credentials are added when forwarding)
+KEPT_HEADERS = ("Content-Type", "Content-Encoding")
+# How long a claimed record is hidden from other forwarders
+CLAIM_SECONDS = 60
+# Header carrying the receiver's per-process token
+SPOOL_TOKEN_HEADER = "X-Trace-Spool-Token"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL
+)
+"""
+
+
+class TraceSpool:
+    """Append-only SQLite queue of export requests, shared between processes.
+
+    Args:
+        path: Location of the SQLite database file (directories are created)
+        max_bytes: Oldest records are dropped beyond this total size; 0 disables the limit
+        max_age: Records older than this many seconds are dropped unsent
+    """
+
+    def __init__(
+        self,
+        path: str = TRACE_SPOOL_PATH,
+        max_bytes: int = TRACE_SPOOL_MAX_BYTES,
+        max_age: float = TRACE_SPOOL_MAX_AGE_SECONDS,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+
+    def append(self, path: str, headers: Dict[str, str], body: bytes) -> None:
+        """Add an export request, dropping the oldest records if over the size limit."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO records (path, headers, body, size, created_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, json.dumps(headers), body, len(body), now, now),
+            )
+            if self.max_bytes:
+                self._trim()
+
+    def _trim(self) -> None:
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM records").fetchone()
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for record_id, size in self._conn.execute("SELECT id, size FROM records ORDER BY id"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((record_id,))
+            total -= size
+        self._conn.executemany("DELETE FROM records WHERE id = ?", doomed)
+        self.dropped += len(doomed)
+        logger.warning(f"Trace spool over {self.max_bytes} bytes; dropped {len(doomed)} oldest records")
+
+    def claim(self, limit: int) -> List[Tuple[int, str, Dict[str, str], bytes, int]]:
+        """Take up to ``limit`` due records, hiding them from other forwarders for a while.
+
+        Returns:
+            list: (id, path, headers, body, attempts) in the order they were spooled
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.max_age:
+                    expired = self._conn.execute(
+                        "DELETE FROM records WHERE created_at < ?", (now - self.max_age,)
+                    ).rowcount
+                    if expired > 0:
+                        self.dropped += expired
+                        logger.warning(f"Dropped {expired} spooled trace records older than {self.max_age}s")
+                rows = self._conn.execute(
+                    "SELECT id, path, headers, body, attempts FROM records "
+                    "WHERE next_attempt_at <= ? ORDER BY id LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE records SET next_attempt_at = ? WHERE id = ?",
+                    [(now + CLAIM_SECONDS, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(row[0], row[1], json.loads(row[2]), row[3], row[4]) for row in rows]
+
+    def delete(self, record_id: int) -> None:
+        """Remove a record that was delivered (or can never be)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM records WHERE id = ?", (record_id,))
+
+    def release(self, record_ids: List[int], delay: float = 0.0, failed: bool = False) -> None:
+        """Make claimed records due again after ``delay`` seconds, counting an attempt if failed."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE records SET next_attempt_at = ?, attempts = attempts + ? WHERE id = ?",
+                [(time.time() + delay, int(failed), record_id) for record_id in record_ids],
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number and size of spooled records and how many were dropped."""
+        with self._lock:
+            records, size, oldest = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(created_at) FROM records"
+            ).fetchone()
+        return {
+            "records": records,
+            "bytes": size,
+            "oldest_age_seconds": round(time.time() - oldest, 1) if oldest else None,
+            "dropped": self.dropped,
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class SpoolReceiver:
+    """Local HTTP endpoint that accepts Langfuse export requests into a spool.
+
+    Args:
+        spool: Spool the requests are appended to
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        on_append: Called after each request is spooled
+        token: Value of ``SPOOL_TOKEN_HEADER`` required on every request (None accepts any)
+    """
+
+    def __init__(
+        self,
+        spool: TraceSpool,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        on_append: Optional[Callable[[], None]] = None,
+        token: Optional[str] = None,
+    ):
+        self.spool = spool
+        self.on_append = on_append
+        self.token = token
+        self.received = 0
+        self.unauthorized = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if receiver.token is not None and not hmac.compare_digest(
+                    self.headers.get(SPOOL_TOKEN_HEADER, "").encode("utf-8"),
+                    receiver.token.encode("utf-8"),
+                ):
+                    receiver.unauthorized += 1
+                    self._send(401, b'{"message": "Invalid spool token"}', "application/json")
+                    return
+                path = self.path.split("?", 1)[0].rstrip("/")
+                if path not in SPOOLED_PATHS:
+                    self._send(404, b'{"message": "Not spooled"}', "application/json")
+                    return
+                headers = {name: self.headers[name] for name in KEPT_HEADERS if self.headers.get(name)}
+                try:
+                    receiver.spool.append(path, headers, body)
+                except Exception as e:
+                    logger.error(f"Could not spool trace export: {e}")
+                    self._send(503, b'{"message": "Spool unavailable"}', "application/json")
+                    return
+                receiver.received += 1
+                if receiver.on_append:
+                    receiver.on_append()
+                if path.endswith("/ingestion"):
+                    self._send(200, b'{"successes": [], "errors": []}', "application/json")
+                else:
+                    self._send(200, b"", "application/x-protobuf")
+
+            def _send(self, status, data, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "SpoolReceiver":
+        """Start serving on a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="trace-spool-receiver", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class SpoolForwarder:
+    """Background thread sending spooled records to the Langfuse host.
+
+    Records are sent oldest first. A record the host rejects as invalid
+    (4xx other than 408/429) is dropped; any other failure puts it back
+    and pauses forwarding with jittered exponential backoff.
+
+    Args:
+        spool: Spool to drain
+        host: Langfuse host the records are sent to
+        public_key: Langfuse public key
+        secret_key: Langfuse secret key
+        batch_size: Records claimed per pass, which bounds memory use
+        timeout: Per-request timeout in seconds
+    """
+
+    def __init__(
+        self,
+        spool: TraceSpool,
+        host: str = LANGFUSE_HOST,
+        public_key: Optional[str] = LANGFUSE_PUBLIC_KEY,
+        secret_key: Optional[str] = LANGFUSE_SECRET_KEY,
+        batch_size: int = TRACE_SPOOL_BATCH_SIZE,
+        timeout: float = TRACE_SPOOL_TIMEOUT_SECONDS,
+        backoff_base: float = TRACE_SPOOL_BACKOFF_BASE_SECONDS,
+        backoff_max: float = TRACE_SPOOL_BACKOFF_MAX_SECONDS,
+    ):
+        import requests
+
+        self.spool = spool
+        self.host = host.rstrip("/")
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sent = 0
+        self.rejected = 0
+        self.failures = 0
+        self._consecutive_failures = 0
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.session = requests.Session()
+        credentials = base64.b64encode(f"{public_key}:{secret_key}".encode("utf-8")).decode("ascii")
+        self.session.headers.update({
+            "Authorization": f"Basic {credentials}",
+            "x-langfuse-public-key": public_key or "",
+            "x-langfuse-sdk-name": "python",
+        })
+
+    def _send(self, path: str, headers: Dict[str, str], body: bytes) -> bool:
+        """POST one record; return True if it is done with (delivered or rejected)."""
+        response = self.session.post(
+            f"{self.host}{path}", data=body, headers=headers, timeout=self.timeout
+        )
+        if response.status_code < 300:
+            return True
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            self.rejected += 1
+            logger.warning(
+                f"Langfuse rejected spooled {path} ({response.status_code}): {response.text[:200]}"
+            )
+            return True
+        raise RuntimeError(f"Langfuse returned {response.status_code} for {path}")
+
+    def drain_once(self) -> Optional[int]:
+        """Forward one batch of due records.
+
+        Returns:
+            int or None: Records completed, or None if the host could not be reached
+        """
+        records = self.spool.claim(self.batch_size)
+        for index, (record_id, path, headers, body, attempts) in enumerate(records):
+            try:
+                self._send(path, headers, body)
+            except Exception as e:
+                self.failures += 1
+                self._consecutive_failures += 1
+                delay = max(
+                    self.backoff_base,
+                    backoff_delay(self._consecutive_failures - 1, self.backoff_base, self.backoff_max),
+                )
+                logger.warning(
+                    f"Trace export to {self.host} failed ({e}); retrying in {delay:.1f}s"
+                )
+                self.spool.release([record_id], delay, failed=True)
+                self.spool.release([rest[0] for rest in records[index + 1:]], delay)
+                return None
+            self.spool.delete(record_id)
+            self.sent += 1
+            self._consecutive_failures = 0
+        return len(records)
+
+    def drain(self, deadline: Optional[float] = None) -> bool:
+        """Forward records until the spool has none due; return False if the host failed."""
+        while deadline is None or time.monotonic() < deadline:
+            completed = self.drain_once()
+            if completed is None:
+                return False
+            if completed == 0:
+                return True
+        return True
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                ok = self.drain()
+            except Exception as e:
+                logger.error(f"Trace spool forwarder error: {e}")
+                ok = False
+            if self._stopped.is_set():
+                break
+            wait = self.backoff_base if ok else max(
+                self.backoff_base,
+                backoff_delay(self._consecutive_failures, self.backoff_base, self.backoff_max),
+            )
+            # New records wake the forwarder early unless the host is failing
+            if ok:
+                self._wake.wait(wait)
+                self._wake.clear()
+            else:
+                self._stopped.wait(wait)
+
+    def notify(self) -> None:
+        """Tell the forwarder that new records were spooled."""
+        self._wake.set()
+
+    def start(self) -> "SpoolForwarder":
+        """Start forwarding on a daemon thread; it does not delay interpreter exit."""
+        self._thread = threading.Thread(target=self._run, name="trace-spool-forwarder", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the forwarding thread after its current request."""
+        self._stopped.set()
+        self._wake.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return forwarding counters and the spool's backlog."""
+        return {
+            "sent": self.sent,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            **self.spool.stats(),
+        }
+
+
+_receiver: Optional[SpoolReceiver] = None
+_forwarder: Optional[SpoolForwarder] = None
+_spool_lock = threading.Lock()
+
+
+def start_trace_spool() -> Tuple[str, Dict[str, str]]:
+    """Start the process-wide spool receiver and forwarder.
+
+    Returns:
+        tuple: URL of the local receiver, to use as the Langfuse client's
+            host, and the headers the client must send with every request
+    """
+    global _receiver, _forwarder
+    with _spool_lock:
+        if _receiver is None:
+            spool = TraceSpool()
+            _forwarder = SpoolForwarder(spool).start()
+            _receiver = SpoolReceiver(
+                spool, on_append=_forwarder.notify, token=secrets.token_urlsafe(32)
+            ).start()
+            backlog = spool.stats()["records"]
+            logger.info(
+                f"Trace spool receiving on {_receiver.url}, forwarding to {LANGFUSE_HOST}"
+                + (f" ({backlog} records left from earlier runs)" if backlog else "")
+            )
+        return _receiver.url, {SPOOL_TOKEN_HEADER: _receiver.token}
+
+
+def trace_spool_metrics() -> Optional[Dict[str, Any]]:
+    """Return the forwarder's counters and backlog, or None if the spool is not running."""
+    if _forwarder is None:
+        return None
+    return {**_forwarder.metrics(), "unauthorized": _receiver.unauthorized}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or drain the Langfuse trace spool")
+    parser.add_argument("command", choices=("status", "drain"))
+    parser.add_argument("--timeout", type=float, default=60, help="Give up draining after this many seconds")
+    args = parser.parse_args(argv)
+
+    spool = TraceSpool()
+    if args.command == "drain":
+        forwarder = SpoolForwarder(spool)
+        ok = forwarder.drain(deadline=time.monotonic() + args.timeout)
+        print(json.dumps(forwarder.metrics(), indent=2))
+        raise SystemExit(0 if ok else 1)
+    print(json.dumps(spool.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Trace sampling and payload size limits for Langfuse export.
+
+Tracing every run at full detail costs export bandwidth and Langfuse
+storage for runs nobody looks at. ``should_sample`` makes a head-based
+decision before a run starts (``TRACE_SAMPLE_RATE``); ``keep_unsampled``
+decides afterwards whether an unsampled run failed or was slow enough to be
+recorded anyway, as a summary trace.
+
+``mask_payload`` is installed as the Langfuse client's mask function, so
+every input, output and metadata value is passed through it before export:
+JSON strings are re-serialized without whitespace and anything longer than
+``TRACE_MAX_PAYLOAD_CHARS`` keeps its head and tail around a marker.
+"""
+import json
+import random
+from typing import Any, Optional
+from config import (
+    TRACE_SAMPLE_RATE,
+    TRACE_ALWAYS_ON_ERRORS,
+    TRACE_SLOW_RUN_SECONDS,
+    TRACE_MAX_PAYLOAD_CHARS,
+)
+
+# Share of a truncated payload kept from its start; the rest comes from its end
+HEAD_SHARE = 2 / 3
+
+
+def should_sample(rate: float = TRACE_SAMPLE_RATE) -> bool:
+    """Decide up front whether a run is traced in full."""
+    return rate >= 1 or random.random() < rate
+
+
+def keep_unsampled(
+    duration_seconds: float,
+    error: Optional[BaseException] = None,
+    always_on_errors: bool = TRACE_ALWAYS_ON_ERRORS,
+    slow_run_seconds: float = TRACE_SLOW_RUN_SECONDS,
+) -> Optional[str]:
+    """Return why an unsampled run should still be recorded, or None to drop it.
+
+    Args:
+        duration_seconds: How long the run took
+        error: Exception the run failed with, if any
+        always_on_errors: Record every failed run
+        slow_run_seconds: Record runs at least this slow (0 disables)
+
+    Returns:
+        str or None: ``"error"``, ``"slow"`` or None
+    """
+    if error is not None and always_on_errors:
+        return "error"
+    if slow_run_seconds and duration_seconds >= slow_run_seconds:
+        return "slow"
+    return None
+
+
+def truncate_text(text: str, max_chars: int = TRACE_MAX_PAYLOAD_CHARS) -> str:
+    """Cut ``text`` to about ``max_chars``, keeping its head and tail."""
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    head = int(max_chars * HEAD_SHARE)
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n...[truncated {omitted} of {len(text)} chars]...\n{text[-tail:]}"
+
+
+def _compact_json(text: str) -> str:
+    stripped = text.strip()
+    if not stripped or stripped[0] not in "{[":
+        return text
+    try:
+        return json.dumps(json.loads(stripped), ensure_ascii=False, separators=(",", ":"))
+    except ValueError:
+        return text
+
+
+def mask_payload(*, data: Any, **kwargs: Any) -> Any:
+    """Langfuse mask function limiting the size of exported payloads.
+
+    Strings are compacted (if they hold JSON) and truncated; lists and
+    dicts are processed item by item. Other values are returned unchanged.
+    """
+    if isinstance(data, str):
+        return truncate_text(_compact_json(data))
+    if isinstance(data, dict):
+        return {key: mask_payload(data=value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [mask_payload(data=value) for value in data]
+    return data
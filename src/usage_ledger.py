@@ -0,0 +1,322 @@
+"""Token and cost accounting per run.
+
+While a run is bound to a ``UsageLedger`` (``record_usage``), every LLM call
+that reaches the provider is entered in it from CrewAI's LLM completion
+events: agent, task, model, prompt and completion tokens, and the call's
+cost from the price table (``LLM_PRICES``, USD per million tokens, plus
+the JSON object in the ``LLM_PRICES`` environment variable). Calls
+served from the response cache or a cassette are not billed and are not
+entered. The same events add the cost to the run's loop budget, which
+enforces ``RUN_MAX_COST_USD`` (see run_budget.py).
+
+At the end of a run the ledger is summarized per agent, task and model,
+with the costliest calls and the start of their prompts. The summary is
+appended to ``USAGE_LEDGER_PATH`` (one JSON line per run) and attached to the
+run's Langfuse trace; each generation observation also carries its cost.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from config import LLM_PRICES, LLM_PRICES_OVERRIDES, USAGE_LEDGER_PATH
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def load_prices(overrides: str = LLM_PRICES_OVERRIDES) -> Dict[str, Dict[str, float]]:
+    """Return the default price table updated with the ``LLM_PRICES`` JSON object.
+
+    A malformed value is logged and ignored (as is each malformed entry), so
+    a typo in the environment never stops the process.
+
+    Args:
+        overrides: JSON object mapping model IDs to ``{"input": ..., "output": ...}``
+
+    Returns:
+        dict: Input and output price per million tokens, by model ID
+    """
+    prices = dict(LLM_PRICES)
+    if not overrides.strip():
+        return prices
+    try:
+        entries = json.loads(overrides)
+    except ValueError as e:
+        logger.warning(f"Ignoring LLM_PRICES, it is not valid JSON: {e}")
+        return prices
+    if not isinstance(entries, dict):
+        logger.warning("Ignoring LLM_PRICES, it must be a JSON object keyed by model ID")
+        return prices
+    for model, price in entries.items():
+        try:
+            prices[model] = {"input": float(price["input"]), "output": float(price["output"])}
+        except (KeyError, TypeError, ValueError):
+            logger.warning(
+                f"Ignoring LLM_PRICES entry for '{model}', it needs numeric input and output prices"
+            )
+    return prices
+
+
+PRICES = load_prices()
+
+_current_ledger: contextvars.ContextVar[Optional["UsageLedger"]] = contextvars.ContextVar(
+    "usage_ledger", default=None
+)
+_handlers_registered = False
+_handlers_lock = threading.Lock()
+_unpriced_models = set()
+
+_totals = {"runs": 0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+_totals_lock = threading.Lock()
+
+
+def usage_totals() -> Dict[str, Any]:
+    """Return process-wide usage of the runs recorded so far.
+
+    Returns:
+        dict: ``runs``, their ``llm_calls``, ``prompt_tokens``,
+            ``completion_tokens`` and ``cost_usd``
+    """
+    with _totals_lock:
+        return {**_totals, "cost_usd": round(_totals["cost_usd"], 6)}
+
+
+def model_price(model: Optional[str]) -> Optional[Dict[str, float]]:
+    """Return the input and output price of ``model`` per million tokens, or None.
+
+    Provider prefixes ("bedrock/") and cross-region inference profile
+    prefixes ("us.", "eu.", "apac.") are ignored, so
+    "bedrock/us.amazon.nova-pro-v1:0" is priced as "amazon.nova-pro-v1:0".
+    """
+    if not model:
+        return None
+    name = model.split("/")[-1]
+    for prefix in ("us.", "eu.", "apac."):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    price = PRICES.get(model) or PRICES.get(name)
+    if price is None and model not in _unpriced_models:
+        _unpriced_models.add(model)
+        logger.warning(f"No price for model '{model}' in LLM_PRICES, its calls are counted as free")
+    return price
+
+
+def call_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> Dict[str, float]:
+    """Return the input, output and total cost in USD of one call to ``model``."""
+    price = model_price(model) or {}
+    cost = {
+        "input": prompt_tokens * price.get("input", 0.0) / 1_000_000,
+        "output": completion_tokens * price.get("output", 0.0) / 1_000_000,
+    }
+    cost["total"] = cost["input"] + cost["output"]
+    return cost
+
+
+def _text(content: Any) -> str:
+    """Text of a message's content, which may be a list of provider content blocks."""
+    if isinstance(content, list):
+        return " ".join(_text(block) for block in content)
+    if isinstance(content, dict):
+        if "text" in content:
+            return _text(content["text"])
+        return json.dumps(content, default=str)
+    return str(content or "")
+
+
+def _prompt_preview(messages: Any, limit: int = 200) -> str:
+    """Start of the last user turn of a call, to tell costly prompts apart."""
+    if isinstance(messages, list):
+        turns = [m for m in messages if isinstance(m, dict) and m.get("role") == "user"]
+        messages = turns[-1].get("content") if turns else messages[-1:]
+    text = " ".join(_text(messages).split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class UsageLedger:
+    """LLM calls billed during one run."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        model: Optional[str],
+        prompt_tokens: int,
+        completion_tokens: int,
+        agent: Optional[str] = None,
+        task: Optional[str] = None,
+        prompt: str = "",
+    ) -> float:
+        """Enter one call and return its cost in USD."""
+        cost = call_cost(model, prompt_tokens, completion_tokens)["total"]
+        with self._lock:
+            self.calls.append({
+                "model": model,
+                "agent": agent,
+                "task": task,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost_usd": cost,
+                "prompt": prompt,
+            })
+        return cost
+
+    @property
+    def cost_usd(self) -> float:
+        with self._lock:
+            return sum(call["cost_usd"] for call in self.calls)
+
+    def summary(self, costliest: int = 5) -> Dict[str, Any]:
+        """Aggregate the run's usage.
+
+        Args:
+            costliest: Number of costliest calls to list
+
+        Returns:
+            dict: Totals (calls, prompt and completion tokens, cost); the
+                same per agent, per task and per model; the costliest calls
+        """
+        with self._lock:
+            calls = list(self.calls)
+
+        def bucket():
+            return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+
+        totals = bucket()
+        groups = {"by_agent": defaultdict(bucket), "by_task": defaultdict(bucket), "by_model": defaultdict(bucket)}
+        for call in calls:
+            for group in (
+                totals,
+                groups["by_agent"][call["agent"] or "unknown"],
+                groups["by_task"][call["task"] or "unknown"],
+                groups["by_model"][call["model"] or "unknown"],
+            ):
+                group["calls"] += 1
+                group["prompt_tokens"] += call["prompt_tokens"]
+                group["completion_tokens"] += call["completion_tokens"]
+                group["cost_usd"] += call["cost_usd"]
+
+        def rounded(values):
+            return {**values, "cost_usd": round(values["cost_usd"], 6)}
+
+        top = sorted(calls, key=lambda call: call["cost_usd"], reverse=True)[:costliest]
+        return {
+            **rounded(totals),
+            **{name: {key: rounded(values) for key, values in group.items()} for name, group in groups.items()},
+            "costliest_calls": [rounded(call) for call in top],
+        }
+
+
+def current_ledger() -> Optional[UsageLedger]:
+    """Return the ledger bound to the running crew, if any."""
+    return _current_ledger.get()
+
+
+@contextmanager
+def record_usage() -> Iterator[UsageLedger]:
+    """Enter the LLM calls of runs started in this context into a new ledger."""
+    _register_handlers()
+    ledger = UsageLedger()
+    token = _current_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_ledger.reset(token)
+
+
+def _register_handlers() -> None:
+    """Subscribe to CrewAI's LLM completion events (once per process)."""
+    global _handlers_registered
+    with _handlers_lock:
+        if _handlers_registered:
+            return
+        from crewai.events.event_bus import crewai_event_bus
+        from crewai.events.types.llm_events import LLMCallCompletedEvent
+        from run_budget import current_budget
+        from run_timing import _usage_tokens
+
+        # Handlers run with a copy of the emitting context, so the ledger
+        # and the budget are those of the run that made the call
+
+        @crewai_event_bus.on(LLMCallCompletedEvent)
+        def on_llm_end(source, event):
+            ledger = _current_ledger.get()
+            if ledger is None:
+                return
+            tokens = _usage_tokens(event.usage)
+            agent = (event.agent_role or "").lower() or None
+            cost = ledger.add(
+                event.model, tokens["prompt_tokens"], tokens["completion_tokens"],
+                agent=agent, task=" ".join((event.task_name or "").split())[:80] or None,
+                prompt=_prompt_preview(event.messages),
+            )
+            budget = current_budget()
+            if budget is not None:
+                budget.add_cost(budget.agent_for(event.agent_id, agent), cost)
+
+        _handlers_registered = True
+
+
+def write_summary(
+    summary: Dict[str, Any], run_label: Optional[str] = None, path: str = USAGE_LEDGER_PATH
+) -> str:
+    """Append a run's usage summary to the usage ledger file.
+
+    Args:
+        summary: Output of ``UsageLedger.summary``
+        run_label: Trace or run ID the line is recorded under
+        path: JSON Lines file the summary is appended to
+
+    Returns:
+        str: Path of the ledger file
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    line = {"recorded_at": time.time(), "run": run_label, **summary}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(line, default=str) + "\n")
+    return path
+
+
+def finish_usage(
+    ledger: Optional[UsageLedger], run_label: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Summarize a run's ledger, append it to the ledger file and log the totals.
+
+    Accounting must never fail a run, so errors are logged and swallowed.
+
+    Args:
+        ledger: Ledger bound by ``record_usage`` (None if there is none)
+        run_label: Trace or run ID the summary is recorded under
+
+    Returns:
+        dict or None: The usage summary
+    """
+    if ledger is None:
+        return None
+    try:
+        summary = ledger.summary()
+        path = write_summary(summary, run_label)
+    except Exception as e:
+        logger.warning(f"Failed to record run usage: {e}")
+        return None
+    with _totals_lock:
+        _totals["runs"] += 1
+        _totals["llm_calls"] += summary["calls"]
+        _totals["prompt_tokens"] += summary["prompt_tokens"]
+        _totals["completion_tokens"] += summary["completion_tokens"]
+        _totals["cost_usd"] += summary["cost_usd"]
+    by_agent = ", ".join(
+        f"{agent} ${values['cost_usd']:.4f}" for agent, values in summary["by_agent"].items()
+    )
+    logger.info(
+        f"Run usage: {summary['calls']} LLM calls, {summary['prompt_tokens']}+"
+        f"{summary['completion_tokens']} tokens, ${summary['cost_usd']:.4f}"
+        f"{f' ({by_agent})' if by_agent else ''}. Ledger: {path}"
+    )
+    return summary
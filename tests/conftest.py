@@ -0,0 +1,40 @@
+"""Shared test setup: import the flat modules in src/ and keep state out of the repo."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+# config reads the environment at import, so this must run before any module under test
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="research-tests-"))
+
+
+@pytest.fixture
+def stub_llm():
+    """Build a CrewAI LLM that returns scripted replies and counts its calls."""
+    from crewai.llms.base_llm import BaseLLM
+
+    class StubLLM(BaseLLM):
+        replies: list = []
+        calls: list = []
+
+        def call(self, messages, tools=None, callbacks=None, available_functions=None,
+                 from_task=None, from_agent=None, response_model=None):
+            self.calls.append({"messages": messages, "tools": tools})
+            index = min(len(self.calls), len(self.replies)) - 1
+            return self.replies[index]
+
+        async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                        from_task=None, from_agent=None, response_model=None):
+            return self.call(messages, tools=tools)
+
+        def supports_function_calling(self):
+            return False
+
+    def build(*replies):
+        return StubLLM(model="stub-model", replies=list(replies) or ["stub answer"], calls=[])
+
+    return build
@@ -0,0 +1,116 @@
+"""Tests for the ask_user answer providers."""
+import asyncio
+import io
+import sys
+import threading
+
+from answer_providers import (
+    AutoAnswerProvider,
+    CachedAnswerProvider,
+    ConsoleAnswerProvider,
+    DeferredAnswerProvider,
+    ScriptedAnswerProvider,
+)
+
+
+class DictCache:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value):
+        self.store[key] = value
+
+
+def test_scripted_sequence_consumed_in_order_then_default():
+    provider = ScriptedAnswerProvider(["first", "second"], default="fallback")
+    assert [provider.ask("q") for _ in range(3)] == ["first", "second", "fallback"]
+
+
+def test_scripted_mapping_matches_substring_case_insensitively():
+    provider = ScriptedAnswerProvider({"Time Period": "the last decade"}, default="fallback")
+    assert provider.ask("Which time period should I cover?") == "the last decade"
+    assert provider.ask("Which region?") == "fallback"
+
+
+def test_scripted_blank_answer_replaced_by_default():
+    assert ScriptedAnswerProvider(["   "], default="fallback").ask("q") == "fallback"
+
+
+def test_auto_answer_returns_original_question():
+    provider = AutoAnswerProvider("What is BM25?")
+    assert provider.ask("Could you clarify?") == "What is BM25?"
+
+
+def test_cached_provider_normalized_repeat_not_asked_again():
+    inner = ScriptedAnswerProvider(["stored answer", "second answer"])
+    provider = CachedAnswerProvider(inner, DictCache())
+    assert provider.ask("Which  Region?") == "stored answer"
+    assert provider.ask("which region?") == "stored answer"
+    assert inner.ask("anything") == "second answer"
+
+
+def test_deferred_answer_from_another_thread_returned():
+    provider = DeferredAnswerProvider(timeout=5)
+
+    def answer_next():
+        request = provider.requests.get(timeout=5)
+        assert provider.answer(request.request_id, f"reply to {request.question}")
+
+    worker = threading.Thread(target=answer_next)
+    worker.start()
+    assert provider.ask("Which region?") == "reply to Which region?"
+    worker.join()
+    assert provider.pending() == []
+
+
+def test_deferred_timeout_returns_default():
+    provider = DeferredAnswerProvider(timeout=0.05, default="fallback")
+    assert provider.ask("Which region?") == "fallback"
+    assert provider.pending() == []
+
+
+def test_deferred_unknown_request_not_answered():
+    assert DeferredAnswerProvider(timeout=0.05).answer(42, "late") is False
+
+
+def test_deferred_subscribe_answered_from_event_loop():
+    provider = DeferredAnswerProvider(timeout=5)
+    answers = []
+
+    async def main():
+        requests = provider.subscribe()
+        loop = asyncio.get_running_loop()
+        asked = loop.run_in_executor(None, provider.ask, "Which region?")
+        request = await asyncio.wait_for(requests.get(), timeout=5)
+        assert provider.answer(request.request_id, "Europe")
+        answers.append(await asked)
+
+    asyncio.run(main())
+    assert answers == ["Europe"]
+
+
+def test_deferred_subscribe_pending_request_delivered():
+    provider = DeferredAnswerProvider(timeout=5)
+    asker = threading.Thread(target=provider.ask, args=("Which region?",))
+    asker.start()
+    provider.requests.get(timeout=5)
+
+    async def main():
+        requests = provider.subscribe()
+        request = requests.get_nowait()
+        request.fulfil("Europe")
+        return request.question
+
+    assert asyncio.run(main()) == "Which region?"
+    asker.join(timeout=5)
+    assert not asker.is_alive()
+
+
+def test_console_stdin_without_fileno_falls_back_to_thread(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "stdin", io.StringIO("Europe\n"))
+    provider = ConsoleAnswerProvider(timeout=5)
+    assert provider.ask("Which region?") == "Europe"
+    assert "Which region?" in capsys.readouterr().out
@@ -0,0 +1,66 @@
+"""Tests for the concurrent batch runner."""
+import time
+
+import pytest
+
+import batch
+
+
+class FakeLangfuse:
+    def __init__(self):
+        self.flushed = False
+
+    def flush(self):
+        self.flushed = True
+
+
+@pytest.fixture
+def fake_runs(monkeypatch):
+    """Run questions without a crew: the question text controls delay and failure."""
+    langfuse = FakeLangfuse()
+    monkeypatch.setattr(batch, "init_langfuse", lambda: langfuse)
+    monkeypatch.setattr(batch, "build_runner", lambda mode, question, llm_overrides: question)
+
+    def run_traced(crew, langfuse, question):
+        if question.startswith("fail"):
+            raise RuntimeError(f"{question} failed")
+        time.sleep(float(question.split()[-1]))
+        return f"answer to {question}", f"trace-{question}"
+
+    monkeypatch.setattr(batch, "run_traced", run_traced)
+    return langfuse
+
+
+def test_read_questions_blank_lines_skipped(tmp_path):
+    path = tmp_path / "questions.txt"
+    path.write_text("First question\n\n  Second question  \n", encoding="utf-8")
+    assert batch.read_questions(str(path)) == ["First question", "Second question"]
+
+
+def test_read_questions_empty_file_rejected(tmp_path):
+    path = tmp_path / "questions.txt"
+    path.write_text("\n \n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        batch.read_questions(str(path))
+
+
+def test_run_batch_results_in_input_order(fake_runs):
+    questions = ["slow 0.2", "fast 0.01", "medium 0.1"]
+    results = batch.run_batch(questions, max_concurrency=3)
+    assert [item["question"] for item in results] == questions
+    assert [item["index"] for item in results] == [0, 1, 2]
+    assert results[0]["result"] == "answer to slow 0.2"
+    assert results[1]["trace_id"] == "trace-fast 0.01"
+    assert fake_runs.flushed
+
+
+def test_run_batch_failure_reported_without_stopping_batch(fake_runs):
+    results = batch.run_batch(["fail 0", "works 0"], max_concurrency=2)
+    assert results[0]["status"] == "error"
+    assert results[0]["error"] == "fail 0 failed"
+    assert results[1]["status"] == "success"
+
+
+def test_run_batch_invalid_concurrency_rejected(fake_runs):
+    with pytest.raises(ValueError):
+        batch.run_batch(["works 0"], max_concurrency=-1)
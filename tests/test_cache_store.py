@@ -0,0 +1,109 @@
+"""Tests for the disk cache and the LLM response cache layer."""
+import asyncio
+import time
+
+import pytest
+
+from cache_store import DiskCache
+from llm_layers import CachedLLM
+
+
+@pytest.fixture
+def cache(tmp_path):
+    store = DiskCache(str(tmp_path / "cache" / "test.db"), max_entries=0)
+    yield store
+    store.close()
+
+
+def test_get_missing_key_returns_default(cache):
+    assert cache.get("missing", default="fallback") == "fallback"
+    assert cache.stats()["misses"] == 1
+
+
+def test_set_json_value_round_trips(cache):
+    cache.set("key", {"organic": [{"title": "A"}]})
+    assert cache.get("key") == {"organic": [{"title": "A"}]}
+    assert cache.stats()["hits"] == 1
+
+
+def test_get_after_ttl_expired_returns_default(cache):
+    cache.set("short", "value", ttl=0.05)
+    cache.set("long", "value", ttl=60)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    assert cache.get("long") == "value"
+    assert cache.stats()["expired"] == 1
+
+
+def test_default_ttl_applied_without_explicit_ttl(tmp_path):
+    store = DiskCache(str(tmp_path / "ttl.db"), default_ttl=0.05)
+    store.set("key", "value")
+    time.sleep(0.1)
+    assert store.get("key") is None
+    store.close()
+
+
+def test_set_over_max_entries_evicts_least_recently_used(tmp_path):
+    store = DiskCache(str(tmp_path / "lru.db"), max_entries=2)
+    store.set("a", 1)
+    store.set("b", 2)
+    assert store.get("a") == 1
+    store.set("c", 3)
+    assert store.get("b") is None
+    assert store.get("a") == 1
+    assert store.get("c") == 3
+    assert store.stats()["evictions"] == 1
+    store.close()
+
+
+def test_set_over_max_bytes_evicts_until_under_limit(tmp_path):
+    store = DiskCache(str(tmp_path / "bytes.db"), max_entries=0, max_bytes=25)
+    for key in "abc":
+        store.set(key, "x" * 8)
+    stats = store.stats()
+    assert stats["bytes"] <= 25
+    assert store.get("a") is None
+    assert store.get("c") == "x" * 8
+    store.close()
+
+
+def test_cached_llm_repeat_request_served_from_cache(cache, stub_llm):
+    inner = stub_llm("first reply", "second reply")
+    llm = CachedLLM(inner, cache)
+    messages = [{"role": "user", "content": "What is BM25?"}]
+    assert llm.call(messages) == "first reply"
+    assert llm.call(messages) == "first reply"
+    assert len(inner.calls) == 1
+
+
+def test_cached_llm_different_messages_not_shared(cache, stub_llm):
+    inner = stub_llm("first reply", "second reply")
+    llm = CachedLLM(inner, cache)
+    assert llm.call([{"role": "user", "content": "one"}]) == "first reply"
+    assert llm.call([{"role": "user", "content": "two"}]) == "second reply"
+
+
+def test_cached_llm_bypass_refreshes_stored_response(cache, stub_llm):
+    messages = [{"role": "user", "content": "What is BM25?"}]
+    CachedLLM(stub_llm("stale reply"), cache).call(messages)
+    inner = stub_llm("fresh reply")
+    assert CachedLLM(inner, cache, bypass=True).call(messages) == "fresh reply"
+    assert CachedLLM(stub_llm("unused"), cache).call(messages) == "fresh reply"
+
+
+def test_cached_llm_available_functions_never_cached(cache, stub_llm):
+    inner = stub_llm("first reply", "second reply")
+    llm = CachedLLM(inner, cache)
+    messages = [{"role": "user", "content": "search"}]
+    llm.call(messages, available_functions={"search": print})
+    assert llm.call(messages, available_functions={"search": print}) == "second reply"
+    assert cache.stats()["writes"] == 0
+
+
+def test_cached_llm_acall_shares_sync_entries(cache, stub_llm):
+    inner = stub_llm("first reply", "second reply")
+    llm = CachedLLM(inner, cache)
+    messages = [{"role": "user", "content": "What is BM25?"}]
+    llm.call(messages)
+    assert asyncio.run(llm.acall(messages)) == "first reply"
+    assert len(inner.calls) == 1
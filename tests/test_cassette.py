@@ -0,0 +1,79 @@
+"""Tests for recording and replaying cassettes."""
+import pytest
+from pydantic import BaseModel
+
+from cassette import Cassette, CassetteMismatch
+
+
+class Answer(BaseModel):
+    text: str
+
+
+def llm_request(content, model="bedrock/nova"):
+    return {"model": model, "temperature": 0.2, "messages": [{"role": "user", "content": content}]}
+
+
+def search_request(query):
+    return {"tool": "search", "args": {"search_query": query}}
+
+
+def unexpected_call():
+    raise AssertionError("replay must not make the real call")
+
+
+@pytest.fixture(params=["run.json", "run.json.gz"])
+def recorded(tmp_path, request):
+    path = str(tmp_path / request.param)
+    cassette = Cassette(path, mode="record")
+    cassette.play("llm", llm_request("Run 1234 started"), lambda: "first reply")
+    cassette.play("llm", llm_request("Run 1234 started"), lambda: "second reply")
+    cassette.play("tool", search_request("heat pumps"), lambda: {"organic": []})
+    cassette.play("llm", llm_request("Structure it"), lambda: Answer(text="done"))
+    return path
+
+
+def test_replay_strict_identical_requests_served_in_recorded_order(recorded):
+    cassette = Cassette(recorded, mode="replay")
+    assert cassette.play("llm", llm_request("Run 1234 started"), unexpected_call) == "first reply"
+    assert cassette.play("llm", llm_request("Run 1234 started"), unexpected_call) == "second reply"
+    assert cassette.play("tool", search_request("heat pumps"), unexpected_call) == {"organic": []}
+    assert cassette.play(
+        "llm", llm_request("Structure it"), unexpected_call, response_model=Answer
+    ) == Answer(text="done")
+    assert cassette.stats()["unplayed"] == 0
+
+
+def test_replay_strict_changed_request_raises_mismatch(recorded):
+    cassette = Cassette(recorded, mode="replay")
+    with pytest.raises(CassetteMismatch, match="Run 5678 started"):
+        cassette.play("llm", llm_request("Run 5678 started"), unexpected_call)
+
+
+def test_replay_strict_played_interaction_not_served_twice(recorded):
+    cassette = Cassette(recorded, mode="replay")
+    cassette.play("tool", search_request("heat pumps"), unexpected_call)
+    with pytest.raises(CassetteMismatch):
+        cassette.play("tool", search_request("heat pumps"), unexpected_call)
+
+
+def test_replay_fuzzy_numbers_and_whitespace_ignored(recorded):
+    cassette = Cassette(recorded, mode="replay", match="fuzzy")
+    assert cassette.play("llm", llm_request("run  5678 STARTED"), unexpected_call) == "first reply"
+    assert cassette.stats()["fuzzy_matches"] == 1
+
+
+def test_replay_fuzzy_unmatched_request_gets_next_of_same_kind(recorded):
+    cassette = Cassette(recorded, mode="replay", match="fuzzy")
+    assert cassette.play("tool", search_request("solar panels"), unexpected_call) == {"organic": []}
+    with pytest.raises(CassetteMismatch):
+        cassette.play("tool", search_request("wind turbines"), unexpected_call)
+
+
+def test_replay_missing_file_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Cassette not found"):
+        Cassette(str(tmp_path / "missing.json"), mode="replay")
+
+
+def test_unknown_match_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unknown cassette match"):
+        Cassette(str(tmp_path / "run.json"), mode="record", match="loose")
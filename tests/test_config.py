@@ -0,0 +1,29 @@
+"""Tests for configuration validation."""
+import pytest
+
+import config
+
+
+@pytest.fixture
+def configured(monkeypatch):
+    for name in ("SERPER_API_KEY", "LANGFUSE_SECRET_KEY", "LANGFUSE_PUBLIC_KEY"):
+        monkeypatch.setattr(config, name, "test-key")
+    return monkeypatch
+
+
+@pytest.mark.parametrize("backend", ["serper", "local", "both"])
+def test_validate_config_known_search_backend_accepted(configured, backend):
+    configured.setattr(config, "SEARCH_BACKEND", backend)
+    assert config.validate_config() is True
+
+
+def test_validate_config_unknown_search_backend_rejected(configured):
+    configured.setattr(config, "SEARCH_BACKEND", "Serper ")
+    with pytest.raises(ValueError, match="Invalid SEARCH_BACKEND"):
+        config.validate_config()
+
+
+def test_validate_config_missing_key_rejected(configured):
+    configured.setattr(config, "SERPER_API_KEY", None)
+    with pytest.raises(ValueError, match="SERPER_API_KEY"):
+        config.validate_config()
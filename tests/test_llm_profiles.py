@@ -0,0 +1,75 @@
+"""Tests for per-agent LLM profiles and run overrides."""
+import pytest
+
+import llm_profiles
+from llm_profiles import normalize_overrides, resolve_profile, size_max_tokens
+
+PROFILES = {
+    "researcher": {
+        "model": "bedrock/fast", "temperature": 0.5, "max_tokens": 0, "expected_output_tokens": 1600,
+    },
+    "reviewer": {
+        "model": "bedrock/large", "temperature": 0.5, "max_tokens": 3000, "expected_output_tokens": 1200,
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def profiles(monkeypatch):
+    monkeypatch.setattr(llm_profiles, "LLM_PROFILES", PROFILES)
+
+
+def test_size_max_tokens_rounded_up_and_capped():
+    assert size_max_tokens(1000, headroom=1.5, cap=4000) == 1536
+    assert size_max_tokens(10, headroom=1.5, cap=4000) == 256
+    assert size_max_tokens(5000, headroom=1.5, cap=4000) == 4000
+
+
+def test_normalize_overrides_role_value_wins_over_flat():
+    overrides = {"temperature": "0", "reviewer": {"temperature": 0.9, "model": "bedrock/premier"}}
+    assert normalize_overrides(overrides) == {
+        "researcher": {"temperature": 0.0},
+        "reviewer": {"temperature": 0.9, "model": "bedrock/premier"},
+    }
+
+
+def test_normalize_overrides_empty_returns_no_roles():
+    assert normalize_overrides(None) == {}
+    assert normalize_overrides({"researcher": {}}) == {}
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"top_k": 5}, "Unknown LLM setting 'top_k'"),
+    ({"reviewer": {"max_tokens": "many"}}, "Invalid value for LLM setting 'max_tokens'"),
+    ({"researcher": "fast"}, "must be a JSON object"),
+    (["temperature"], "must be a JSON object"),
+])
+def test_normalize_overrides_invalid_rejected(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        normalize_overrides(overrides)
+
+
+def test_resolve_profile_unset_max_tokens_sized_from_expected_output():
+    profile = resolve_profile("researcher")
+    assert profile == {
+        "model": "bedrock/fast", "temperature": 0.5, "max_tokens": size_max_tokens(1600),
+    }
+
+
+def test_resolve_profile_fixed_max_tokens_kept():
+    assert resolve_profile("reviewer")["max_tokens"] == 3000
+
+
+def test_resolve_profile_expected_output_override_resizes_fixed_max_tokens():
+    profile = resolve_profile("reviewer", {"reviewer": {"expected_output_tokens": 400}})
+    assert profile["max_tokens"] == size_max_tokens(400)
+
+
+def test_resolve_profile_explicit_max_tokens_override_wins():
+    overrides = {"max_tokens": 900, "expected_output_tokens": 400}
+    assert resolve_profile("researcher", overrides)["max_tokens"] == 900
+
+
+def test_resolve_profile_unknown_role_rejected():
+    with pytest.raises(ValueError, match="Unknown agent role"):
+        resolve_profile("editor")
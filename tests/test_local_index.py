@@ -0,0 +1,94 @@
+"""Tests for the local BM25 document index."""
+import os
+
+import pytest
+
+from local_index import LocalIndex, split_passages, tokenize
+
+
+def write_doc(directory, name, text, mtime=None):
+    path = directory / name
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def docs(tmp_path):
+    directory = tmp_path / "docs"
+    directory.mkdir()
+    write_doc(directory, "pumps.txt", "Heat pumps move heat using a refrigerant cycle.")
+    write_doc(directory, "solar.md", "Solar panels convert sunlight into electricity.")
+    write_doc(directory, "notes.pdf", "heat pumps heat pumps heat pumps")
+    return directory
+
+
+def make_index(tmp_path, docs, **kwargs):
+    return LocalIndex(index_dir=str(tmp_path / "index"), docs_dir=str(docs), **kwargs)
+
+
+def test_tokenize_stopwords_and_punctuation_dropped():
+    assert tokenize("The Heat-Pump is in the house!") == ["heat", "pump", "house"]
+
+
+def test_split_passages_word_count_respected():
+    text = "one two three four five"
+    assert [text[start:end] for start, end in split_passages(text, 2)] == [
+        "one two", "three four", "five",
+    ]
+
+
+def test_search_matching_passage_ranked_first(tmp_path, docs):
+    index = make_index(tmp_path, docs)
+    assert index.build() == {"added": 2, "updated": 0, "removed": 0, "unchanged": 0}
+    results = index.search("how do heat pumps work")
+    assert [result["path"] for result in results] == ["pumps.txt"]
+    assert results[0]["snippet"] == "Heat pumps move heat using a refrigerant cycle."
+    assert results[0]["score"] > 0
+
+
+def test_search_no_matching_terms_returns_empty(tmp_path, docs):
+    index = make_index(tmp_path, docs)
+    index.build()
+    assert index.search("the and of") == []
+    assert index.search("geothermal") == []
+
+
+def test_build_unchanged_files_not_reindexed(tmp_path, docs):
+    index = make_index(tmp_path, docs)
+    index.build()
+    assert index.build() == {"added": 0, "updated": 0, "removed": 0, "unchanged": 2}
+
+
+def test_build_changed_and_removed_files_tombstoned(tmp_path, docs):
+    index = make_index(tmp_path, docs)
+    index.build()
+    write_doc(docs, "solar.md", "Solar panels now also heat water on sunny roofs.", mtime=1)
+    os.remove(docs / "pumps.txt")
+    assert index.build() == {"added": 0, "updated": 1, "removed": 1, "unchanged": 0}
+    assert index.search("heat pumps")[0]["path"] == "solar.md"
+    assert index.search("refrigerant") == []
+    assert index.search("electricity") == []
+
+
+def test_reopened_index_searches_without_rebuild(tmp_path, docs):
+    make_index(tmp_path, docs).build()
+    reopened = LocalIndex(index_dir=str(tmp_path / "index"), docs_dir=None)
+    assert reopened.search("sunlight")[0]["path"] == "solar.md"
+
+
+def test_build_over_max_segments_merges_into_one(tmp_path, docs):
+    index = make_index(tmp_path, docs, max_segments=1)
+    index.build()
+    write_doc(docs, "wind.txt", "Wind turbines generate electricity from moving air.")
+    index.build()
+    segments = [name for name in os.listdir(tmp_path / "index") if name.startswith("seg_")]
+    assert len(segments) == 1
+    assert {result["path"] for result in index.search("electricity")} == {"solar.md", "wind.txt"}
+
+
+def test_build_missing_docs_dir_rejected(tmp_path):
+    index = LocalIndex(index_dir=str(tmp_path / "index"), docs_dir=str(tmp_path / "missing"))
+    with pytest.raises(ValueError):
+        index.build()
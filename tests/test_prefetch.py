@@ -0,0 +1,41 @@
+"""Tests for speculative searches in prefetch.py."""
+from prefetch import SearchPrefetcher
+
+
+def prefetcher(question="What drives battery storage costs?"):
+    searches = []
+
+    def search(query):
+        searches.append(query)
+        return {"organic": [{"title": query}]}
+
+    return SearchPrefetcher(search, question), searches
+
+
+def test_take_same_normalized_query_served_once():
+    speculative, searches = prefetcher()
+    speculative.on_ask("Which region do you mean?")
+    speculative.on_answer("Either one is fine.")
+    assert speculative.take("what drives battery storage costs") is not None
+    assert speculative.take("what drives battery storage costs") is None
+    assert searches == ["What drives battery storage costs"]
+
+
+def test_take_different_query_not_served():
+    speculative, _ = prefetcher()
+    speculative.on_ask("Which region do you mean?")
+    assert speculative.take("battery storage costs") is None
+    assert speculative.take("storage costs battery drives what") is None
+
+
+def test_on_answer_new_topic_discards_search():
+    speculative, _ = prefetcher()
+    speculative.on_ask("Which region do you mean?")
+    speculative.on_answer("Actually, tell me about heat pumps")
+    assert speculative.take("what drives battery storage costs") is None
+
+
+def test_on_ask_unknown_question_starts_nothing():
+    speculative, searches = prefetcher(question=None)
+    speculative.on_ask("What would you like to research?")
+    assert searches == []
@@ -0,0 +1,101 @@
+"""Tests for Bedrock error classification, the load controller's breaker and client retries."""
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+import agents_and_tasks_v05
+from llm_layers import ResilientLLM
+from rate_control import LoadController, is_throttling_error, is_transient_error
+from region_router import Endpoint
+
+
+def client_error(code, status):
+    return ClientError(
+        {"Error": {"Code": code, "Message": "message"}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        "Converse",
+    )
+
+
+def reraised(cause, error_type=RuntimeError):
+    """Wrap ``cause`` the way CrewAI's Bedrock provider re-raises ClientError."""
+    try:
+        raise error_type("Bedrock call failed") from cause
+    except Exception as e:
+        return e
+
+
+def test_is_throttling_error_throttling_code_detected():
+    error = reraised(client_error("ThrottlingException", 429))
+    assert is_throttling_error(error)
+    assert is_transient_error(error)
+
+
+def test_is_transient_error_unavailable_code_not_throttling():
+    error = reraised(client_error("ServiceUnavailableException", 503))
+    assert is_transient_error(error)
+    assert not is_throttling_error(error)
+
+
+def test_is_transient_error_validation_code_rejected():
+    assert not is_transient_error(reraised(client_error("ValidationException", 400), ValueError))
+
+
+def test_is_transient_error_status_numbers_in_message_ignored():
+    error = RuntimeError("Prompt has 4296 tokens; connection 503 retried")
+    assert not is_throttling_error(error)
+    assert not is_transient_error(error)
+
+
+@pytest.mark.parametrize("error", [
+    TimeoutError("read timed out"),
+    EndpointConnectionError(endpoint_url="https://bedrock.example"),
+    reraised(EndpointConnectionError(endpoint_url="https://bedrock.example"), ConnectionError),
+])
+def test_is_transient_error_timeouts_and_connection_errors_retried(error):
+    assert is_transient_error(error)
+    assert not is_throttling_error(error)
+
+
+def failing(error):
+    def call():
+        raise error
+    return call
+
+
+def test_call_throttling_does_not_open_circuit():
+    controller = LoadController(0, 0, max_retries=0, failure_threshold=1, reset_seconds=60)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            controller.call(failing(reraised(client_error("ThrottlingException", 429))))
+    metrics = controller.metrics()
+    assert metrics["circuit_state"] == "closed"
+    assert metrics["throttled"] == 3
+
+
+def test_call_transient_failures_open_circuit():
+    controller = LoadController(0, 0, max_retries=0, failure_threshold=2, reset_seconds=60)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            controller.call(failing(reraised(client_error("ServiceUnavailableException", 503))))
+    assert controller.metrics()["circuit_state"] == "open"
+
+
+SETTINGS = {"model": "bedrock/amazon.nova-pro-v1:0", "temperature": 0.2, "max_tokens": 256}
+
+
+@pytest.mark.parametrize("url", [None, "http://127.0.0.1:9/bedrock"])
+def test_endpoint_llm_load_control_botocore_retries_disabled(monkeypatch, url):
+    monkeypatch.setattr(agents_and_tasks_v05, "BEDROCK_LOAD_CONTROL_ENABLED", True)
+    llm = agents_and_tasks_v05._endpoint_llm(Endpoint("us-east-1", "us-east-1", url), SETTINGS)
+    assert isinstance(llm, ResilientLLM)
+    client = llm.inner._client
+    assert client.meta.config.retries["total_max_attempts"] == 1
+    assert client.meta.endpoint_url == (url or "https://bedrock-runtime.us-east-1.amazonaws.com")
+
+
+def test_endpoint_llm_without_load_control_keeps_provider_client(monkeypatch):
+    monkeypatch.setattr(agents_and_tasks_v05, "BEDROCK_LOAD_CONTROL_ENABLED", False)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    llm = agents_and_tasks_v05._endpoint_llm(Endpoint("us-east-1", "us-east-1"), SETTINGS)
+    assert not isinstance(llm, ResilientLLM)
+    assert llm._client.meta.config.retries["total_max_attempts"] > 1
@@ -0,0 +1,82 @@
+"""Tests for endpoint scoring, probing and hedging in region_router.py."""
+import time
+
+from region_router import EndpointRouter
+
+
+def router(names=("a", "b", "c"), **kwargs):
+    kwargs.setdefault("probe_seconds", 0)
+    kwargs.setdefault("error_half_life", 0)
+    return EndpointRouter(list(names), **kwargs)
+
+
+def test_ranked_lowest_latency_first():
+    routes = router()
+    for name, seconds in (("a", 0.5), ("b", 0.1), ("c", 0.3)):
+        routes._record(name, seconds, ok=True)
+    assert routes.ranked() == ["b", "c", "a"]
+
+
+def test_score_errors_penalized():
+    routes = router(("a", "b"), error_penalty=4)
+    routes._record("a", 0.1, ok=True)
+    routes._record("b", 0.2, ok=True)
+    routes._record("a", 0.1, ok=False)
+    assert routes.ranked() == ["b", "a"]
+
+
+def test_score_unmeasured_endpoint_not_ahead_after_failure():
+    routes = router(("dead", "live"))
+    routes._record("dead", 0.1, ok=False)
+    routes._record("live", 0.2, ok=True)
+    assert routes.ranked() == ["live", "dead"]
+
+
+def test_score_error_rate_decays_while_idle():
+    routes = router(("a",), error_half_life=0.05)
+    routes._record("a", 0.1, ok=False)
+    before = routes.stats["a"].current_error_rate(time.monotonic())
+    time.sleep(0.1)
+    assert routes.stats["a"].current_error_rate(time.monotonic()) < before / 2
+
+
+def test_ranked_never_called_endpoint_probed_once():
+    routes = router(("a", "b"), probe_seconds=60)
+    assert routes.ranked() == ["b", "a"]
+    assert routes.ranked() == ["a", "b"]
+    assert routes.probes == 1
+
+
+def test_ranked_idle_endpoint_probed_after_interval():
+    routes = router(("a", "b"), probe_seconds=0.05)
+    routes._record("a", 0.1, ok=True)
+    routes._record("b", 0.1, ok=False)
+    routes.ranked()
+    time.sleep(0.1)
+    routes._record("a", 0.1, ok=True)
+    assert routes.ranked()[0] == "b"
+
+
+def test_call_fails_over_on_transient_error():
+    routes = router(("a", "b"))
+
+    def request(name):
+        if name == "a":
+            raise TimeoutError("read timed out")
+        return name
+
+    assert routes.call(request, hedge=False) == "b"
+    assert routes.failovers == 1
+
+
+def test_call_slow_endpoint_hedged():
+    routes = router(("slow", "fast"), hedge_min_samples=1)
+    routes._record("slow", 0.01, ok=True)
+    routes._record("fast", 0.02, ok=True)
+
+    def request(name):
+        time.sleep(0.5 if name == "slow" else 0.01)
+        return name
+
+    assert routes.call(request, hedge=True) == "fast"
+    assert routes.stats["fast"].hedge_wins == 1
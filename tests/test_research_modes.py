@@ -0,0 +1,93 @@
+"""Tests for merging and assessing research outputs."""
+import json
+
+import pytest
+
+from research_modes import assess_research, local_final_answer, merge_research_outputs
+
+COMPLETE_ANSWER = (
+    "Heat pumps deliver three to four units of heat per unit of electricity, "
+    "so running costs are usually lower than gas boilers."
+)
+
+
+def test_merge_research_outputs_duplicate_links_kept_once():
+    outputs = [
+        json.dumps({
+            "search_query": "heat pump efficiency",
+            "search_results": [{"title": "A", "link": "https://example.com/a/"}],
+            "provisional_answer": "Heat pumps are efficient.",
+        }),
+        json.dumps({
+            "search_query": "heat pump cost",
+            "search_results": [
+                {"title": "A again", "link": "https://EXAMPLE.com/a"},
+                {"title": "B", "link": "https://example.com/b"},
+            ],
+            "provisional_answer": "They cost more up front.",
+        }),
+    ]
+    merged = merge_research_outputs("Are heat pumps worth it?", ["Efficiency?", "Cost?"], outputs)
+    assert merged["user_question"] == "Are heat pumps worth it?"
+    assert merged["search_query"] == "heat pump efficiency, heat pump cost"
+    assert [item["title"] for item in merged["search_results"]] == ["A", "B"]
+    assert merged["provisional_answer"] == (
+        "Efficiency?: Heat pumps are efficient.\n\nCost?: They cost more up front."
+    )
+
+
+def test_merge_research_outputs_failed_researcher_skipped():
+    output = json.dumps({"search_results": ["https://example.com/a fact", ""]})
+    merged = merge_research_outputs("Q", ["First?", "Second?"], [None, output])
+    assert merged["search_results"] == ["https://example.com/a fact"]
+    assert merged["provisional_answer"] == ""
+
+
+def test_merge_research_outputs_unparseable_output_kept_as_answer():
+    merged = merge_research_outputs("Q", ["First?"], ["  Plain prose findings.  "])
+    assert merged["search_results"] == []
+    assert merged["provisional_answer"] == "First?: Plain prose findings."
+
+
+def test_merge_research_outputs_fenced_legacy_fields_parsed():
+    output = '```json\n{"serper_query": "bm25", "serper_results": "1. https://a.org/x\\n2. https://a.org/x/"}\n```'
+    merged = merge_research_outputs("Q", ["Sub?"], [output])
+    assert merged["search_query"] == "bm25"
+    assert merged["search_results"] == ["https://a.org/x"]
+
+
+def test_assess_research_complete_output_needs_no_review():
+    research = {
+        "provisional_answer": COMPLETE_ANSWER,
+        "search_results": [{"title": "A", "link": "https://example.com/a"}],
+    }
+    assert assess_research(research) == []
+
+
+def test_assess_research_unparsed_output_needs_review():
+    assert assess_research(None) == ["research output is not valid JSON"]
+
+
+@pytest.mark.parametrize("research, issue", [
+    ({"search_results": ["fact"]}, "provisional answer is missing"),
+    ({"provisional_answer": "Yes.", "search_results": ["fact"]}, "provisional answer is too short"),
+    ({"provisional_answer": COMPLETE_ANSWER, "search_results": []}, "no search results were reported"),
+    (
+        {"provisional_answer": COMPLETE_ANSWER + " Sources are conflicting.", "serper_results": "- fact"},
+        "provisional answer signals missing or contradictory evidence",
+    ),
+])
+def test_assess_research_incomplete_output_reports_issue(research, issue):
+    assert assess_research(research) == [issue]
+
+
+def test_local_final_answer_sources_capped_and_user_source_added():
+    research = {
+        "provisional_answer": f"  {COMPLETE_ANSWER}  ",
+        "search_results": [{"link": f"https://example.com/{i}"} for i in range(4)],
+    }
+    output = local_final_answer(research, max_sources=2)
+    assert output["final_answer"] == COMPLETE_ANSWER
+    assert [source["detail"] for source in output["sources"]] == [
+        "https://example.com/0", "https://example.com/1", "User query",
+    ]
@@ -0,0 +1,176 @@
+"""Tests for run and per-agent loop budgets."""
+import pytest
+
+import run_budget
+from llm_layers import BudgetedLLM
+from run_budget import (
+    FINAL_ANSWER_PROMPT,
+    BudgetExhausted,
+    RunBudget,
+    agent_scope,
+    enforce_budget,
+    tool_call_key,
+    waiting_for_user,
+)
+
+SEARCH_TOOL = {"type": "function", "function": {"name": "search", "parameters": {}}}
+
+
+@pytest.fixture
+def bind_budget():
+    tokens = []
+
+    def bind(budget):
+        tokens.append(run_budget._current_budget.set(budget))
+        return budget
+
+    yield bind
+    for token in reversed(tokens):
+        run_budget._current_budget.reset(token)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_tool_call_key_normalized_arguments_match():
+    first = tool_call_key("search", {"search_query": "Battery storage costs?"})
+    second = tool_call_key("search", {"search_query": "battery  storage costs"})
+    assert first == second
+
+
+def test_tool_call_key_reordered_query_differs():
+    first = tool_call_key("search", {"search_query": "london to paris"})
+    second = tool_call_key("search", {"search_query": "paris to london"})
+    assert first != second
+
+
+def test_exhausted_agent_llm_calls_reported():
+    budget = RunBudget(agent_limits={"researcher": {"max_llm_calls": 2}})
+    budget.add_llm_call("researcher")
+    assert budget.exhausted("researcher") is None
+    budget.add_llm_call("researcher")
+    assert "researcher made 2 LLM calls" in budget.exhausted("researcher")
+    assert budget.exhausted("reviewer") is None
+
+
+def test_exhausted_run_limit_applies_to_every_agent():
+    budget = RunBudget(limits={"max_tool_calls": 1})
+    budget.add_tool_call("researcher")
+    assert budget.exhausted("reviewer") == "run made 1 tool calls"
+
+
+def test_agent_scope_each_instance_has_own_budget():
+    budget = RunBudget(agent_limits={"researcher": {"max_llm_calls": 1}})
+    first, second = agent_scope("Researcher"), agent_scope("Researcher")
+    budget.add_llm_call(first)
+    assert budget.exhausted(first)
+    assert budget.exhausted(second) is None
+    assert set(budget.summary()["agents"]) == {"researcher", "researcher-2"}
+
+
+def test_cost_exceeded_projected_and_spent_cost():
+    budget = RunBudget(limits={"max_cost_usd": 0.10})
+    assert budget.cost_exceeded("researcher", next_cost=0.05) is None
+    budget.add_cost("researcher", 0.08)
+    assert "next call up to $0.0500" in budget.cost_exceeded("researcher", next_cost=0.05)
+    assert budget.cost_exceeded("researcher") is None
+    budget.add_cost("researcher", 0.02)
+    assert budget.cost_exceeded("researcher") == "run spent $0.1000 of $0.1000"
+
+
+def test_cost_exceeded_no_ceiling_never_reported():
+    budget = RunBudget()
+    budget.add_cost("researcher", 100.0)
+    assert budget.cost_exceeded("researcher", next_cost=1.0) is None
+
+
+def test_earlier_result_repeat_counted():
+    budget = RunBudget()
+    key = tool_call_key("search", {"search_query": "heat pumps"})
+    assert budget.earlier_result(key) is None
+    budget.remember(key, {"organic": []})
+    assert budget.earlier_result(key) == {"organic": []}
+    assert budget.summary()["duplicate_tool_calls"] == 1
+
+
+def test_budgeted_llm_exhausted_tool_agent_gets_final_answer_call(stub_llm, bind_budget):
+    budget = bind_budget(RunBudget(agent_limits={"researcher": {"max_llm_calls": 1}}))
+    inner = stub_llm("searching", "final answer")
+    llm = BudgetedLLM(inner, scope="researcher")
+    messages = [{"role": "user", "content": "Research heat pumps"}]
+    llm.call(messages, tools=[SEARCH_TOOL])
+    assert llm.call(messages, tools=[SEARCH_TOOL]) == "final answer"
+    assert inner.calls[1]["tools"] is None
+    assert inner.calls[1]["messages"][-1]["content"].endswith(FINAL_ANSWER_PROMPT)
+    assert budget.summary()["final_answers_forced"][0]["agent"] == "researcher"
+    with pytest.raises(BudgetExhausted):
+        llm.call(messages, tools=[SEARCH_TOOL])
+    assert len(inner.calls) == 2
+
+
+def test_budgeted_llm_exhausted_toolless_agent_raises_after_final_call(stub_llm, bind_budget):
+    bind_budget(RunBudget(agent_limits={"reviewer": {"max_llm_calls": 1}}))
+    inner = stub_llm("review")
+    llm = BudgetedLLM(inner, scope="reviewer")
+    messages = [{"role": "user", "content": "Review the findings"}]
+    llm.call(messages)
+    llm.call(messages)
+    assert inner.calls[1]["messages"] == messages
+    with pytest.raises(BudgetExhausted):
+        llm.call(messages)
+    assert len(inner.calls) == 2
+
+
+def test_budgeted_llm_without_budget_only_forwards(stub_llm):
+    inner = stub_llm("reply")
+    llm = BudgetedLLM(inner, scope="reviewer")
+    for _ in range(5):
+        llm.call("Review the findings")
+    assert len(inner.calls) == 5
+
+
+def test_waiting_for_user_excluded_from_deadline(monkeypatch, bind_budget):
+    clock = FakeClock()
+    monkeypatch.setattr(run_budget.time, "monotonic", clock)
+    budget = bind_budget(RunBudget(limits={"deadline_seconds": 60}))
+    with waiting_for_user():
+        clock.now += 300
+    assert budget.exhausted() is None
+    clock.now += 60
+    assert budget.exhausted() == "run ran for 60s"
+
+
+def test_waiting_for_user_overlapping_waits_counted_once(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(run_budget.time, "monotonic", clock)
+    budget = RunBudget(limits={"deadline_seconds": 60})
+    with budget.waiting_for_user():
+        clock.now += 10
+        with budget.waiting_for_user():
+            clock.now += 10
+        clock.now += 10
+    assert budget.run.paused == 30
+
+
+def test_enforce_budget_disabled_binds_nothing(monkeypatch):
+    monkeypatch.setattr(run_budget, "RUN_BUDGET_ENABLED", False)
+    monkeypatch.setattr(run_budget, "RUN_MAX_COST_USD", 0)
+    with enforce_budget() as budget:
+        assert budget is None
+        assert run_budget.current_budget() is None
+
+
+def test_enforce_budget_disabled_keeps_cost_ceiling(monkeypatch):
+    monkeypatch.setattr(run_budget, "RUN_BUDGET_ENABLED", False)
+    monkeypatch.setattr(run_budget, "RUN_MAX_COST_USD", 0.5)
+    with enforce_budget() as budget:
+        assert run_budget.current_budget() is budget
+        assert budget.run.max_cost_usd == 0.5
+        assert budget.run.max_llm_calls == 0
+        assert budget.agent_limits == {}
+    assert run_budget.current_budget() is None
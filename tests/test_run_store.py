@@ -0,0 +1,66 @@
+"""Tests for the checkpoint run store."""
+import json
+import os
+
+import pytest
+
+from run_store import RUN_FILE, RunStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RunStore(str(tmp_path / "runs"))
+
+
+def test_load_created_run_attempts_incremented(store):
+    run = store.create("standard", question="What is BM25?")
+    store.record_task(run, "research", '{"provisional_answer": "A ranking function."}')
+    loaded = store.load(run["run_id"])
+    assert loaded["attempts"] == 2
+    assert loaded["question"] == "What is BM25?"
+    assert list(loaded["tasks"]) == ["research"]
+
+
+@pytest.mark.parametrize("run_id", ["", "../../etc", "ABCDEF123456", "abc", None])
+def test_load_malformed_run_id_rejected(store, run_id):
+    with pytest.raises(ValueError, match="Invalid run ID"):
+        store.load(run_id)
+
+
+def test_load_unknown_run_id_rejected(store):
+    with pytest.raises(ValueError, match="Unknown run ID"):
+        store.load("0123456789ab")
+
+
+def test_save_unserializable_record_keeps_previous_file(store):
+    run = store.create("standard")
+    path = os.path.join(store.root, run["run_id"], RUN_FILE)
+    run["tasks"]["research"] = {"output": object()}
+    with pytest.raises(TypeError):
+        store.save(run)
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["tasks"] == {}
+    assert os.listdir(os.path.dirname(path)) == [RUN_FILE]
+
+
+def test_save_no_temporary_file_left(store):
+    run = store.create("standard")
+    store.mark(run, "failed", error="reviewer timed out")
+    assert os.listdir(os.path.join(store.root, run["run_id"])) == [RUN_FILE]
+    assert store.load(run["run_id"])["error"] is None
+
+
+def test_list_runs_most_recent_first(store):
+    first = store.create("standard")
+    second = store.create("fast")
+    store.mark(first, "completed")
+    assert [run["run_id"] for run in store.list_runs()] == [first["run_id"], second["run_id"]]
+
+
+def test_discard_tool_cache_files_removed(store):
+    run = store.create("standard")
+    cache = store.tool_cache(run["run_id"])
+    cache.set("search:key", {"organic": []})
+    cache.close()
+    store.discard_tool_cache(run["run_id"])
+    assert os.listdir(os.path.join(store.root, run["run_id"])) == [RUN_FILE]
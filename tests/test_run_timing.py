@@ -0,0 +1,96 @@
+"""Tests for per-run timing summaries."""
+import json
+
+import pytest
+
+from run_timing import RunTimeline, mark, record_timeline, timed, write_summary
+
+
+def llm(start, end, task_id="t1", thread=1, **attrs):
+    return {"kind": "llm", "name": "bedrock/nova", "thread": thread, "task_id": task_id,
+            "start": start, "end": end, **attrs}
+
+
+def tool(start, end, task_id="t1", thread=1, **attrs):
+    return {"kind": "tool", "name": "search", "thread": thread, "task_id": task_id,
+            "start": start, "end": end, **attrs}
+
+
+@pytest.fixture
+def timeline():
+    timeline = RunTimeline()
+    timeline.started, timeline.ended = 100.0, 110.0
+    timeline.task_started("t1", "research", "Researcher", 100.5)
+    timeline.task_ended("t1", 108.0)
+    for record in (
+        llm(101.0, 102.0, prompt_tokens=300, completion_tokens=20),
+        tool(102.0, 102.5, cache_hits=2),
+        llm(103.0, 104.0, cache_hit=True, prompt_tokens=350, completion_tokens=80),
+    ):
+        timeline.add(record)
+    return timeline
+
+
+def test_summary_totals_split_between_llm_tools_and_other(timeline):
+    summary = timeline.summary()
+    assert summary["total_seconds"] == 10.0
+    assert summary["llm"] == {
+        "calls": 2, "seconds": 2.0, "cache_hits": 1, "prompt_tokens": 650, "completion_tokens": 100,
+    }
+    assert summary["tools"] == {"calls": 1, "seconds": 0.5, "cache_hits": 2}
+    assert summary["other_seconds"] == 7.5
+    assert summary["by_model"]["bedrock/nova"]["calls"] == 2
+    assert summary["by_tool"]["search"]["cache_hits"] == 2
+
+
+def test_summary_task_iterations_and_times(timeline):
+    (task,) = timeline.summary()["tasks"]
+    assert task == {
+        "task": "research", "agent": "Researcher", "seconds": 7.5, "iterations": 2,
+        "llm_seconds": 2.0, "tool_seconds": 0.5, "error": None,
+    }
+
+
+def test_structure_iteration_runs_until_next_llm_call(timeline):
+    (task,) = timeline.structure()
+    first, second = task["iterations"]
+    assert [record["name"] for record in first["tools"]] == ["search"]
+    assert (first["start"], first["end"]) == (101.0, 103.0)
+    assert (second["start"], second["end"]) == (103.0, 108.0)
+
+
+def test_summary_records_outside_tasks_grouped_separately():
+    timeline = RunTimeline()
+    timeline.started, timeline.ended = 0.0, 5.0
+    timeline.add(tool(1.0, 2.0, task_id=None, thread=7))
+    (task,) = timeline.summary()["tasks"]
+    assert task["task"] is None
+    assert task["iterations"] == 0
+    assert timeline.structure()[0]["children"][0]["name"] == "search"
+
+
+def test_timed_marks_and_errors_recorded():
+    with record_timeline() as timeline:
+        with timed("tool", "search"):
+            mark(cache_hit=True)
+        with pytest.raises(ValueError):
+            with timed("llm", "bedrock/nova", agent="Reviewer"):
+                raise ValueError("bad request")
+    cached, failed = timeline.records
+    assert cached["cache_hit"] is True
+    assert failed["agent"] == "Reviewer"
+    assert failed["error"] == "ValueError: bad request"
+    assert failed["end"] >= failed["start"]
+
+
+def test_timed_without_timeline_records_nothing():
+    with timed("tool", "search") as record:
+        mark(cache_hit=True)
+    assert record is None
+
+
+def test_write_summary_labelled_json_file(tmp_path, timeline):
+    path = write_summary(timeline.summary(), "trace-1", directory=str(tmp_path))
+    assert path.endswith("-trace-1.json")
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["llm"]["calls"] == 2
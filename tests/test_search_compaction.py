@@ -0,0 +1,59 @@
+"""Tests for search result compaction."""
+import json
+
+from search_compaction import compact_results, estimate_tokens, extract_items
+
+
+def organic(title, link, snippet):
+    return {"title": title, "link": link, "snippet": snippet}
+
+
+def test_extract_items_answer_box_first_and_extras_dropped():
+    payload = {
+        "answerBox": {"title": "Box", "answer": "42"},
+        "organic": [dict(organic("A", "https://a.org", "alpha"), sitelinks=[{"title": "x"}])],
+        "relatedSearches": [{"query": "beta"}],
+    }
+    assert extract_items(payload) == [
+        {"title": "Box", "link": "", "snippet": "42"},
+        organic("A", "https://a.org", "alpha"),
+    ]
+
+
+def test_extract_items_non_search_payload_returns_none():
+    assert extract_items("not json") is None
+    assert extract_items({"error": "quota exceeded"}) is None
+
+
+def test_compact_results_duplicates_removed_and_query_match_ranked_first():
+    payload = {"organic": [
+        organic("Solar", "https://a.org/solar", "Solar panels convert sunlight into electricity."),
+        organic("Pumps", "https://b.org/pumps", "Heat pumps move heat with a refrigerant."),
+        organic("Pumps copy", "https://b.org/pumps/", "A mirror of the same page."),
+        organic("Pumps", "https://c.org/pumps", "Heat pumps move heat with a refrigerant."),
+    ]}
+    compacted, stats = compact_results(json.dumps(payload), "heat pumps", token_budget=0)
+    assert compacted["query"] == "heat pumps"
+    assert [item["link"] for item in compacted["organic"]] == [
+        "https://b.org/pumps", "https://a.org/solar",
+    ]
+    assert stats["items_in"] == 4
+    assert stats["duplicates_removed"] == 2
+    assert stats["items_kept"] == 2
+
+
+def test_compact_results_over_budget_trimmed():
+    payload = {"organic": [
+        organic(f"Result {i}", f"https://example.com/{i}", "heat pump efficiency " * 20)
+        for i in range(10)
+    ]}
+    compacted, stats = compact_results(payload, "heat pump", token_budget=200, dedupe_threshold=1.1)
+    assert estimate_tokens(compacted) <= 200
+    assert 0 < stats["items_kept"] < 10
+    assert stats["tokens_removed"] == stats["original_tokens"] - stats["compacted_tokens"]
+
+
+def test_compact_results_non_search_payload_passed_through():
+    compacted, stats = compact_results("Search failed: timeout", "heat pumps", token_budget=100)
+    assert compacted == "Search failed: timeout"
+    assert stats["tokens_removed"] == 0
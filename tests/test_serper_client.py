@@ -0,0 +1,60 @@
+"""Tests for merging multi-query Serper results."""
+from serper_client import merge_search_results, unique_queries
+
+
+def result(link, title="Result"):
+    return {"title": title, "link": link, "snippet": f"About {link}"}
+
+
+def test_unique_queries_blank_and_repeated_dropped_in_order():
+    assert unique_queries([" cost ", "", "efficiency", "cost", "   "]) == ["cost", "efficiency"]
+
+
+def test_merge_search_results_interleaved_by_rank():
+    merged = merge_search_results(
+        ["cost", "efficiency"],
+        [
+            {"organic": [result("https://a.org/1"), result("https://a.org/2")]},
+            {"organic": [result("https://b.org/1")]},
+        ],
+    )
+    assert [(item["link"], item["query"], item["position"]) for item in merged["organic"]] == [
+        ("https://a.org/1", "cost", 1),
+        ("https://b.org/1", "efficiency", 2),
+        ("https://a.org/2", "cost", 3),
+    ]
+    assert merged["searchParameters"]["queries"] == ["cost", "efficiency"]
+
+
+def test_merge_search_results_shared_link_kept_once_for_first_query():
+    merged = merge_search_results(
+        ["cost", "efficiency"],
+        [
+            {"organic": [result("https://a.org/page/")]},
+            {"organic": [result("https://A.org/page#section"), result("https://b.org/1")]},
+        ],
+    )
+    assert [(item["link"], item["query"]) for item in merged["organic"]] == [
+        ("https://a.org/page/", "cost"),
+        ("https://b.org/1", "efficiency"),
+    ]
+
+
+def test_merge_search_results_failed_query_skipped_and_answer_box_taken_from_next():
+    merged = merge_search_results(
+        ["cost", "efficiency", "lifetime"],
+        [
+            None,
+            {"answerBox": {"answer": "300%"}, "organic": [result("https://b.org/1")]},
+            {"answerBox": {"answer": "20 years"}},
+        ],
+    )
+    assert merged["answerBox"] == {"answer": "300%"}
+    assert [item["link"] for item in merged["organic"]] == ["https://b.org/1"]
+    assert "news" not in merged
+
+
+def test_merge_search_results_max_results_per_section():
+    payloads = [{"organic": [result(f"https://a.org/{i}") for i in range(5)]}]
+    merged = merge_search_results(["cost"], payloads, max_results=2)
+    assert len(merged["organic"]) == 2
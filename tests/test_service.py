@@ -0,0 +1,73 @@
+"""Tests for request validation in service.py."""
+import asyncio
+import json
+import math
+
+import pytest
+
+from service import QueueFullError, ResearchService, create_app, parse_wait
+
+
+class IdleService(ResearchService):
+    """Service whose workers never start, so submitted jobs stay queued."""
+
+    def start(self):
+        pass
+
+
+@pytest.mark.parametrize("wait, expected", [
+    (None, None), (False, None), (0, None), (True, 30.0), (5, 5.0), (90, 30.0),
+])
+def test_parse_wait_valid_values(wait, expected):
+    assert parse_wait(wait, limit=30.0) == expected
+
+
+@pytest.mark.parametrize("wait", ["10", -1, math.nan, [5]])
+def test_parse_wait_invalid_values_rejected(wait):
+    with pytest.raises(ValueError):
+        parse_wait(wait, limit=30.0)
+
+
+def test_submit_invalid_requests_rejected():
+    service = IdleService()
+    with pytest.raises(ValueError):
+        service.submit("   ")
+    with pytest.raises(ValueError):
+        service.submit("What drives battery storage costs?", mode="unknown")
+
+
+def test_submit_full_queue_rejected():
+    service = IdleService(queue_size=1)
+    service.submit("First question")
+    with pytest.raises(QueueFullError):
+        service.submit("Second question")
+    assert service.health()["jobs_rejected"] == 1
+
+
+def post_job(app, payload):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps(payload).encode(), "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/jobs"}
+    asyncio.run(app(scope, receive, send))
+    return messages[0]["status"], json.loads(messages[1]["body"])
+
+
+def test_create_job_invalid_wait_rejected_before_queueing():
+    app = create_app(IdleService())
+    status, body = post_job(app, {"question": "What drives battery storage costs?", "wait": "soon"})
+    assert status == 400
+    assert "wait" in body["error"]
+    assert app.service.health()["queue_depth"] == 0
+
+
+def test_create_job_valid_request_queued():
+    app = create_app(IdleService())
+    status, body = post_job(app, {"question": "What drives battery storage costs?"})
+    assert status == 202
+    assert body["status"] == "queued"
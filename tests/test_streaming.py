@@ -0,0 +1,74 @@
+"""Tests for streaming run events to sinks and async consumers."""
+import asyncio
+import io
+
+import pytest
+
+import streaming
+from streaming import ConsoleStreamSink, astream_run
+
+
+def emitting_run(label, tokens=3, error=None):
+    """Workflow double that emits token events the way CrewAI's event handlers do."""
+    def run():
+        for i in range(tokens):
+            streaming._emit({"type": "token", "agent": label, "text": f"{label}{i}"})
+        if error:
+            raise error
+        return f"{label} result"
+    return run
+
+
+async def collect(run):
+    return [event async for event in astream_run(run)]
+
+
+def test_astream_run_events_in_order_then_result():
+    events = asyncio.run(collect(emitting_run("a")))
+    assert [event.get("text") for event in events[:-1]] == ["a0", "a1", "a2"]
+    assert events[-1] == {"type": "result", "result": "a result"}
+
+
+def test_astream_run_error_raised_after_earlier_events():
+    events = []
+
+    async def consume():
+        async for event in astream_run(emitting_run("a", tokens=2, error=RuntimeError("boom"))):
+            events.append(event)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(consume())
+    assert [event["text"] for event in events] == ["a0", "a1"]
+
+
+def test_astream_run_concurrent_runs_see_only_their_events():
+    async def main():
+        return await asyncio.gather(
+            collect(emitting_run("a", tokens=50)), collect(emitting_run("b", tokens=50))
+        )
+
+    first, second = asyncio.run(main())
+    assert {event["agent"] for event in first[:-1]} == {"a"}
+    assert {event["agent"] for event in second[:-1]} == {"b"}
+    assert len(first) == len(second) == 51
+
+
+def test_emit_failing_sink_does_not_break_run():
+    def broken_sink(event):
+        raise ValueError("consumer gone")
+
+    with streaming.stream_to(broken_sink):
+        assert emitting_run("a")() == "a result"
+
+
+def test_console_sink_agent_header_and_first_token_recorded():
+    out = io.StringIO()
+    sink = ConsoleStreamSink(out=out)
+    sink({"type": "token", "agent": "Researcher", "text": "Hello"})
+    sink({"type": "tool_start", "agent": "Researcher", "tool": "search", "args": {"q": "x"}})
+    sink({"type": "tool_end", "agent": "Researcher", "tool": "search", "from_cache": True})
+    sink({"type": "token", "agent": "Reviewer", "text": "Done"})
+    assert out.getvalue() == (
+        "\n\n[Researcher]\nHello\n  -> search: {'q': 'x'}\n  <- search (cached)\n\n\n[Reviewer]\nDone"
+    )
+    assert sink.first_token_seconds is not None
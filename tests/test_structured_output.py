@@ -0,0 +1,92 @@
+"""Tests for local JSON repair and typed task outputs."""
+import pytest
+
+import structured_output
+from structured_output import RepairingConverter, ResearchOutput, ReviewOutput, repair_json
+
+REVIEW_JSON = '{"final_answer": "Heat pumps are efficient.", "sources": []}'
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    counters = dict.fromkeys(structured_output.structured_output_metrics(), 0)
+    monkeypatch.setattr(structured_output, "_metrics", counters)
+    return counters
+
+
+def test_repair_json_valid_object_needs_no_repair():
+    assert repair_json(f"  {REVIEW_JSON}\n") == (
+        {"final_answer": "Heat pumps are efficient.", "sources": []}, [],
+    )
+
+
+def test_repair_json_code_fence_stripped():
+    parsed, steps = repair_json(f"Here you go:\n```json\n{REVIEW_JSON}\n```\nThanks!")
+    assert parsed["final_answer"] == "Heat pumps are efficient."
+    assert steps == ["strip_fences"]
+
+
+def test_repair_json_braces_inside_strings_kept_in_extracted_object():
+    text = 'Final answer: {"final_answer": "Use {braces} and \\"quotes\\" }", "sources": []} -- done {'
+    parsed, steps = repair_json(text)
+    assert parsed == {"final_answer": 'Use {braces} and "quotes" }', "sources": []}
+    assert steps == ["extract_object"]
+
+
+def test_repair_json_trailing_commas_dropped():
+    parsed, steps = repair_json('{"final_answer": "Yes", "sources": [{"type": "user", "detail": "q",},],}')
+    assert parsed == {"final_answer": "Yes", "sources": [{"type": "user", "detail": "q"}]}
+    assert steps == ["trailing_commas"]
+
+
+def test_repair_json_python_literal_read():
+    parsed, steps = repair_json("{'final_answer': 'Yes', 'verified': True, 'notes': None}")
+    assert parsed == {"final_answer": "Yes", "verified": True, "notes": None}
+    assert steps == ["python_literal"]
+
+
+@pytest.mark.parametrize("text", ["I could not find an answer.", '["a", "b"]', "{unclosed", "{'a': b}"])
+def test_repair_json_no_object_returns_none(text):
+    assert repair_json(text)[0] is None
+
+
+def test_review_output_plain_string_sources_accepted():
+    output = ReviewOutput.model_validate(
+        {"final_answer": "Yes", "sources": ["https://example.com", {"type": "user", "detail": "q"}]}
+    )
+    assert [(source.type, source.detail) for source in output.sources] == [
+        ("other", "https://example.com"), ("user", "q"),
+    ]
+    assert str(output).startswith('{"final_answer":"Yes"')
+
+
+def test_research_output_search_results_as_text_accepted():
+    output = ResearchOutput.model_validate(
+        {"user_question": "Q", "search_results": "- fact", "provisional_answer": "A"}
+    )
+    assert output.search_query == ""
+    assert output.search_results == "- fact"
+
+
+def test_converter_repaired_output_not_reprompted(metrics, stub_llm):
+    llm = stub_llm("unused")
+    converter = RepairingConverter(
+        text=f"```json\n{REVIEW_JSON}\n```", llm=llm, model=ReviewOutput,
+        instructions="Convert to JSON", max_attempts=1,
+    )
+    assert converter.to_pydantic().final_answer == "Heat pumps are efficient."
+    assert llm.calls == []
+    assert metrics["repaired"] == 1
+    assert metrics["reprompts"] == 0
+
+
+def test_converter_unrepairable_output_reprompted(metrics, stub_llm):
+    llm = stub_llm(REVIEW_JSON)
+    converter = RepairingConverter(
+        text="Heat pumps are efficient.", llm=llm, model=ReviewOutput,
+        instructions="Convert to JSON", max_attempts=1,
+    )
+    assert converter.to_pydantic().final_answer == "Heat pumps are efficient."
+    assert len(llm.calls) == 1
+    assert metrics["invalid_json"] == 1
+    assert metrics["reprompts"] == 1
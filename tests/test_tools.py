@@ -0,0 +1,63 @@
+"""Tests for search query normalization, result checks and the search cache in tools.py."""
+import json
+
+from crewai.tools import BaseTool
+
+from cache_store import DiskCache
+from tools import CachedSearchTool, is_search_result, normalize_query
+
+
+def test_normalize_query_case_punctuation_and_spacing_ignored():
+    assert normalize_query("  What drives  Battery storage costs? ") == "what drives battery storage costs"
+
+
+def test_normalize_query_word_order_kept():
+    assert normalize_query("flights from london to new york") != normalize_query(
+        "flights from new york to london"
+    )
+
+
+def test_normalize_query_question_words_kept():
+    assert normalize_query("who founded apple") != normalize_query("when founded apple")
+
+
+def test_is_search_result_results_accepted():
+    assert is_search_result({"organic": [{"title": "A", "link": "https://a.example"}]})
+
+
+def test_is_search_result_errors_and_empty_rejected():
+    assert not is_search_result({"error": "quota exceeded"})
+    assert not is_search_result({})
+    assert not is_search_result("Error: timeout")
+
+
+class EchoSearchTool(BaseTool):
+    """Search tool double that reports the arguments of each call it runs."""
+
+    name: str = "Search the internet with several queries"
+    description: str = "Echo the call arguments."
+    calls: int = 0
+
+    def _run(self, **kwargs):
+        self.calls += 1
+        return {"organic": [{"title": json.dumps(kwargs, sort_keys=True)}]}
+
+
+def test_cached_search_different_multi_searches_not_shared(tmp_path):
+    cache = DiskCache(str(tmp_path / "run.db"))
+    tool = CachedSearchTool.wrap(EchoSearchTool(), cache)
+    first = tool.run(queries=["heat pump cost", "heat pump efficiency"])
+    second = tool.run(queries=["solar panel cost"])
+    assert first != second
+    assert tool.run(queries=["Heat pump cost?", "heat  pump efficiency"]) == first
+    assert tool.inner.calls == 2
+
+
+def test_cached_search_same_query_other_tool_not_shared(tmp_path):
+    cache = DiskCache(str(tmp_path / "run.db"))
+    web = CachedSearchTool.wrap(EchoSearchTool(name="Search the internet with Serper"), cache)
+    local = CachedSearchTool.wrap(EchoSearchTool(name="Search local documents"), cache)
+    web.run(search_query="heat pumps")
+    local.run(search_query="heat pumps")
+    assert web.inner.calls == 1
+    assert local.inner.calls == 1
@@ -0,0 +1,120 @@
+"""Tests for the durable trace export spool."""
+import time
+
+import pytest
+import requests
+
+from trace_spool import SPOOL_TOKEN_HEADER, SpoolForwarder, SpoolReceiver, TraceSpool
+
+TRACES = "/api/public/otel/v1/traces"
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = f"status {status_code}"
+
+
+class FakeSession:
+    """Stands in for the forwarder's requests session, answering with scripted statuses."""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.bodies = []
+
+    def post(self, url, data, headers, timeout):
+        self.bodies.append(data)
+        return FakeResponse(self.statuses.pop(0))
+
+
+@pytest.fixture
+def spool(tmp_path):
+    store = TraceSpool(str(tmp_path / "spool.db"), max_bytes=0, max_age=0)
+    yield store
+    store.close()
+
+
+def make_forwarder(spool, statuses):
+    forwarder = SpoolForwarder(
+        spool, host="http://langfuse.invalid", public_key="pk", secret_key="sk",
+        batch_size=10, backoff_base=5, backoff_max=5,
+    )
+    forwarder.session = FakeSession(statuses)
+    return forwarder
+
+
+def test_claim_claimed_records_hidden_until_released(spool):
+    for body in (b"one", b"two"):
+        spool.append(TRACES, {"Content-Type": "application/x-protobuf"}, body)
+    claimed = spool.claim(10)
+    assert [record[3] for record in claimed] == [b"one", b"two"]
+    assert claimed[0][2] == {"Content-Type": "application/x-protobuf"}
+    assert spool.claim(10) == []
+    spool.release([claimed[0][0]], failed=True)
+    again = spool.claim(10)
+    assert [(record[3], record[4]) for record in again] == [(b"one", 1)]
+
+
+def test_release_with_delay_not_due_yet(spool):
+    spool.append(TRACES, {}, b"one")
+    record_id = spool.claim(1)[0][0]
+    spool.release([record_id], delay=60)
+    assert spool.claim(1) == []
+    assert spool.stats()["records"] == 1
+
+
+def test_append_over_max_bytes_oldest_dropped(tmp_path):
+    store = TraceSpool(str(tmp_path / "small.db"), max_bytes=8, max_age=0)
+    for body in (b"aaaa", b"bbbb", b"cccc"):
+        store.append(TRACES, {}, body)
+    assert [record[3] for record in store.claim(10)] == [b"bbbb", b"cccc"]
+    assert store.stats()["dropped"] == 1
+    store.close()
+
+
+def test_claim_records_older_than_max_age_dropped(tmp_path):
+    store = TraceSpool(str(tmp_path / "aged.db"), max_bytes=0, max_age=0.05)
+    store.append(TRACES, {}, b"stale")
+    time.sleep(0.1)
+    assert store.claim(10) == []
+    assert store.stats() == {"records": 0, "bytes": 0, "oldest_age_seconds": None, "dropped": 1}
+    store.close()
+
+
+def test_drain_once_rejected_record_dropped_and_rest_sent(spool):
+    for body in (b"invalid", b"valid"):
+        spool.append(TRACES, {}, body)
+    forwarder = make_forwarder(spool, [400, 200])
+    assert forwarder.drain_once() == 2
+    assert forwarder.metrics()["rejected"] == 1
+    assert forwarder.metrics()["sent"] == 2
+    assert spool.stats()["records"] == 0
+
+
+@pytest.mark.parametrize("status", [408, 429, 503])
+def test_drain_once_retryable_status_keeps_records_for_later(spool, status):
+    for body in (b"one", b"two"):
+        spool.append(TRACES, {}, body)
+    forwarder = make_forwarder(spool, [status])
+    assert forwarder.drain_once() is None
+    assert forwarder.session.bodies == [b"one"]
+    assert forwarder.failures == 1
+    assert spool.stats()["records"] == 2
+    assert spool.claim(10) == []
+
+
+def test_receiver_request_without_token_rejected(spool):
+    receiver = SpoolReceiver(spool, token="secret").start()
+    try:
+        denied = requests.post(receiver.url + TRACES, data=b"span", timeout=5)
+        accepted = requests.post(
+            receiver.url + TRACES, data=b"span", headers={SPOOL_TOKEN_HEADER: "secret"}, timeout=5
+        )
+        unknown = requests.post(
+            receiver.url + "/api/public/other", data=b"x", headers={SPOOL_TOKEN_HEADER: "secret"}, timeout=5
+        )
+    finally:
+        receiver.stop()
+    assert (denied.status_code, accepted.status_code, unknown.status_code) == (401, 200, 404)
+    assert receiver.unauthorized == 1
+    assert [record[3] for record in spool.claim(10)] == [b"span"]
@@ -0,0 +1,55 @@
+"""Tests for trace sampling and payload masking."""
+import pytest
+
+import tracing
+from tracing import keep_unsampled, mask_payload, should_sample, truncate_text
+
+
+def test_should_sample_full_rate_always_sampled(monkeypatch):
+    monkeypatch.setattr(tracing.random, "random", lambda: 0.999)
+    assert should_sample(1.0)
+
+
+@pytest.mark.parametrize("draw, sampled", [(0.09, True), (0.1, False), (0.5, False)])
+def test_should_sample_partial_rate_compared_with_draw(monkeypatch, draw, sampled):
+    monkeypatch.setattr(tracing.random, "random", lambda: draw)
+    assert should_sample(0.1) is sampled
+
+
+def test_should_sample_zero_rate_never_sampled(monkeypatch):
+    monkeypatch.setattr(tracing.random, "random", lambda: 0.0)
+    assert not should_sample(0.0)
+
+
+def test_keep_unsampled_failed_and_slow_runs_kept():
+    assert keep_unsampled(1.0, RuntimeError("boom"), always_on_errors=True) == "error"
+    assert keep_unsampled(1.0, RuntimeError("boom"), always_on_errors=False, slow_run_seconds=0) is None
+    assert keep_unsampled(200.0, slow_run_seconds=120) == "slow"
+    assert keep_unsampled(200.0, slow_run_seconds=0) is None
+
+
+def test_truncate_text_head_and_tail_kept():
+    text = "a" * 60 + "b" * 40
+    truncated = truncate_text(text, max_chars=30)
+    assert truncated.startswith("a" * 20)
+    assert truncated.endswith("b" * 10)
+    assert "[truncated 70 of 100 chars]" in truncated
+
+
+def test_truncate_text_short_or_unlimited_unchanged():
+    assert truncate_text("short", max_chars=30) == "short"
+    assert truncate_text("x" * 100, max_chars=0) == "x" * 100
+
+
+def test_mask_payload_json_string_compacted():
+    assert mask_payload(data='{\n  "answer": "yes",\n  "sources": [1, 2]\n}') == (
+        '{"answer":"yes","sources":[1,2]}'
+    )
+
+
+def test_mask_payload_nested_values_masked():
+    long_text = "x" * (tracing.TRACE_MAX_PAYLOAD_CHARS + 100)
+    masked = mask_payload(data={"messages": [{"content": long_text}], "count": 3, "raw": "{not json"})
+    assert "[truncated 100 of" in masked["messages"][0]["content"]
+    assert masked["count"] == 3
+    assert masked["raw"] == "{not json"
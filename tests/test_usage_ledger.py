@@ -0,0 +1,38 @@
+"""Tests for call pricing and the usage ledger."""
+import pytest
+
+from usage_ledger import UsageLedger, call_cost, load_prices
+
+
+def test_call_cost_prefixed_model_priced():
+    cost = call_cost("bedrock/us.amazon.nova-pro-v1:0", 1_000_000, 500_000)
+    assert cost["input"] == pytest.approx(0.80)
+    assert cost["output"] == pytest.approx(1.60)
+    assert cost["total"] == pytest.approx(2.40)
+
+
+def test_call_cost_unknown_model_free():
+    assert call_cost("bedrock/unknown-model", 1000, 1000)["total"] == 0.0
+
+
+def test_load_prices_override_applied():
+    prices = load_prices('{"amazon.nova-pro-v1:0": {"input": 1, "output": 2}, "custom": {"input": "0.5", "output": 1}}')
+    assert prices["amazon.nova-pro-v1:0"] == {"input": 1.0, "output": 2.0}
+    assert prices["custom"] == {"input": 0.5, "output": 1.0}
+
+
+@pytest.mark.parametrize("value", ["not json", "[1, 2]", '{"custom": {"input": 1}}'])
+def test_load_prices_malformed_value_ignored(value):
+    prices = load_prices(value)
+    assert "custom" not in prices
+    assert prices["amazon.nova-pro-v1:0"] == {"input": 0.80, "output": 3.20}
+
+
+def test_summary_grouped_by_agent_with_costliest_first():
+    ledger = UsageLedger()
+    ledger.add("amazon.nova-pro-v1:0", 1000, 100, agent="researcher", task="research", prompt="long")
+    ledger.add("amazon.nova-lite-v1:0", 1000, 100, agent="reviewer", task="review", prompt="short")
+    summary = ledger.summary()
+    assert summary["calls"] == 2
+    assert set(summary["by_agent"]) == {"researcher", "reviewer"}
+    assert summary["costliest_calls"][0]["agent"] == "researcher"